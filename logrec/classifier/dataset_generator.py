@@ -11,10 +11,14 @@ from logrec.dataprep import REPR_DIR, TRAIN_DIR, TEST_DIR, VALID_DIR, CLASSIFICA
 from logrec.dataprep.model.logging import is_positive_level
 from logrec.dataprep.model.placeholders import placeholders, logging_placeholders
 from logrec.dataprep.prepconfig import PrepConfig
-from logrec.util.files import get_dir_and_file, file_mapper
+from logrec.dataprep.reprbin import iter_repr_tokens, iter_repr_files
+from logrec.util.files import get_dir_and_file
 
 WORDS_IN_CONTEXT_LIMIT = 1000
 
+# suffix of the repr files of any of the formats (text or repr bin), replaced with the extensions of the output files
+REPR_FILE_SUFFIX = "parsed\\.repr(bin)?$"
+
 logger = logging.getLogger(__name__)
 
 
@@ -185,16 +189,14 @@ def remove_some_log_statements(list_of_words):
 def create_cases(case_creators, case_creators_picker, filename: str) -> Tuple[
     List[Optional[Tuple[List[str], List[str], bool]]], str]:
     rel_path = get_dir_and_file(filename)
-    with open(filename, 'r') as f:
-        res = []
-        for line in f:
-            list_of_words = line.rstrip('\n').split(" ")
-            list_of_words = remove_some_log_statements(list_of_words)
-            if placeholders['log_statement'] in list_of_words:
-                case_creator = case_creators_picker(case_creators)
-                res.append(case_creator.create_from(list_of_words))
-            else:
-                res.append(None)
+    res = []
+    for list_of_words in iter_repr_tokens(filename):
+        list_of_words = remove_some_log_statements(list_of_words)
+        if placeholders['log_statement'] in list_of_words:
+            case_creator = case_creators_picker(case_creators)
+            res.append(case_creator.create_from(list_of_words))
+        else:
+            res.append(None)
     return res, rel_path
 
 
@@ -244,16 +246,17 @@ def run(dataset: str, repr: str, classifier: str):
     os.makedirs(os.path.join(dest_dir, TEST_DIR), exist_ok=True)
     os.makedirs(os.path.join(dest_dir, VALID_DIR), exist_ok=True)
 
-    total_files = sum(file_mapper(full_src_dir, lambda f: 1, lambda fi: fi.endswith("parsed.repr")))
+    repr_files = list(iter_repr_files(full_src_dir))
+    total_files = len(repr_files)
     count = 0
 
     cases_creator = get_cases_creator(classifier)
-    for lines, rel_path in file_mapper(full_src_dir, cases_creator, lambda fi: fi.endswith("parsed.repr")):
+    for lines, rel_path in map(cases_creator, repr_files):
         count += 1
         logger.info(f"Processing {count} out of {total_files}")
-        forward_path = os.path.join(dest_dir, re.sub("parsed\\.repr", ContextsDataset.FW_CONTEXTS_FILE_EXT, rel_path))
-        backward_path = os.path.join(dest_dir, re.sub("parsed\\.repr", ContextsDataset.BW_CONTEXTS_FILE_EXT, rel_path))
-        label_path = os.path.join(dest_dir, re.sub("parsed\\.repr", ContextsDataset.LABEL_FILE_EXT, rel_path))
+        forward_path = os.path.join(dest_dir, re.sub(REPR_FILE_SUFFIX, ContextsDataset.FW_CONTEXTS_FILE_EXT, rel_path))
+        backward_path = os.path.join(dest_dir, re.sub(REPR_FILE_SUFFIX, ContextsDataset.BW_CONTEXTS_FILE_EXT, rel_path))
+        label_path = os.path.join(dest_dir, re.sub(REPR_FILE_SUFFIX, ContextsDataset.LABEL_FILE_EXT, rel_path))
         with open(forward_path, 'w') as f, open(backward_path, 'w') as b, open(label_path, 'w') as l:
             for line in lines:
                 if line:
@@ -0,0 +1,80 @@
+"""
+Large read-only artifacts (the non-english dictionary, bpe merges caches, splittings) shared between worker processes.
+
+Each artifact is built once into a file in the frozen format of `logrec.util.frozen` and memory-mapped by every
+process that uses it, so the workers share its pages through the page cache instead of holding a copy each.
+Workers only need the path of an artifact (attached collections are pickled as their paths), so this works
+with the `spawn` start method as well as with `fork`.
+
+Artifact files are named after a hash of their sources (paths, sizes and modification times of the files they are
+built from) and of the build parameters, so a changed source results in a new artifact. Bump `ARTIFACTS_VERSION`
+whenever the way an artifact is built changes.
+"""
+import hashlib
+import json
+import logging
+import os
+from typing import List, Callable, Dict, Any
+
+from logrec.dataprep.lang.langchecker import LanguageChecker
+from logrec.dataprep.util import read_dict_from_2_columns
+from logrec.util.frozen import FrozenCollection, SortedWordArray, FrozenStrMap, attach
+
+logger = logging.getLogger(__name__)
+
+ARTIFACTS_VERSION = 1
+EXTENSION = 'frozen'
+
+
+def get_sources_signature(sources: List[str]) -> List:
+    signature = []
+    for source in sources:
+        files = [os.path.join(source, f) for f in sorted(os.listdir(source))] if os.path.isdir(source) else [source]
+        for file in files:
+            st = os.stat(file)
+            signature.append([os.path.abspath(file), st.st_size, st.st_mtime_ns])
+    return signature
+
+
+def get_artifact_path(artifacts_dir: str, name: str, sources: List[str], params: Dict[str, Any]) -> str:
+    key = hashlib.sha1(json.dumps({'sources': get_sources_signature(sources),
+                                   'params': params,
+                                   'version': ARTIFACTS_VERSION}, sort_keys=True).encode()).hexdigest()
+    return os.path.join(artifacts_dir, f'{name}.{key}.{EXTENSION}')
+
+
+def get_or_build(artifacts_dir: str, name: str, sources: List[str], params: Dict[str, Any],
+                 build: Callable[[], FrozenCollection]) -> FrozenCollection:
+    """
+    Attaches the artifact, building it first if it does not exist yet. Call it in the parent process before
+    starting the workers, so that the artifact is built only once.
+    """
+    path = get_artifact_path(artifacts_dir, name, sources, params)
+    if not os.path.exists(path):
+        logger.info(f"Building artifact {path}")
+        os.makedirs(artifacts_dir, exist_ok=True)
+        # several processes can be building the same artifact, the last rename wins
+        tmp_path = f'{path}.{os.getpid()}'
+        build().save(tmp_path)
+        os.replace(tmp_path, path)
+    return attach(path)
+
+
+def get_non_eng_word_set(artifacts_dir: str, path_to_general_english_dict: str,
+                         path_to_non_eng_dicts: str) -> SortedWordArray:
+    def build():
+        return SortedWordArray(LanguageChecker(path_to_general_english_dict, path_to_non_eng_dicts).non_eng_word_set)
+
+    return get_or_build(artifacts_dir, 'non_eng_word_set', [path_to_general_english_dict, path_to_non_eng_dicts],
+                        {'min_chars': LanguageChecker.DEFAULT_MIN_CHARS_TO_BE_NON_ENG}, build)
+
+
+def get_word_splittings(artifacts_dir: str, path_to_file: str, delim: str = '\t') -> FrozenStrMap:
+    """
+    :return: splittings of words read from a 2-column file (merges cache or splittings file)
+    """
+    def build():
+        return FrozenStrMap(read_dict_from_2_columns(path_to_file, val_type=list, delim=delim))
+
+    name = os.path.splitext(os.path.basename(path_to_file))[0]
+    return get_or_build(artifacts_dir, name, [path_to_file], {'delim': delim}, build)
@@ -0,0 +1,264 @@
+"""
+Builds the corpus of a dataset in one streaming pass: raw files are preprocessed, converted to the requested repr and
+counted into the vocabulary without writing and re-reading intermediate files.
+Does the same as running `parse_projects.py`, `to_repr.py` and `vocabsize.py` one after another;
+.parsed and .repr files are written only if requested.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from multiprocessing.pool import Pool
+from typing import Optional
+
+import jsons
+from tqdm import tqdm
+
+from logrec.dataprep import TRAIN_DIR, METADATA_DIR, REPR_DIR, TEXT_FIELD_FILE, base_project_dir
+from logrec.dataprep.dedup import load_skip_list
+from logrec.dataprep.parse_cache import ParseCache, prune as prune_parse_cache, \
+    DEFAULT_MAX_SIZE_MB as DEFAULT_PARSE_CACHE_MAX_SIZE_MB
+from logrec.dataprep.parse_projects import read_ahead, preprocess_file, get_batch_file_path, split_into_batches, \
+    merge_batches, concat_batches, ProjectTask, EXTENSION as PARSED_EXTENSION, FILENAMES_EXTENSION, \
+    NOT_FINISHED_EXTENSION, DEFAULT_FILES_PER_BATCH, STATS_FILENAME, start_tracing_allocations, ParsedBatchWriter, \
+    get_parsed_extension, PARSED_FORMATS, PICKLE_FORMAT, keep_existing_parsed_file
+from logrec.dataprep.prepconfig import PrepConfig, PrepParam
+from logrec.dataprep.preprocessors.general import to_token_list
+from logrec.dataprep.preprocessors.preprocessor_list import pp_params
+from logrec.dataprep.to_repr import init_splitting_config, to_repr, get_repr_dir_name, REPR_EXTENSION, \
+    get_global_n_gramm_splitting_config, init_worker_splitting_config, flush_bpe_caches
+from logrec.dataprep.vocabsize import PartialVocab, VOCABSIZE_FILENAME, VOCAB_FILENAME
+from logrec.infrastructure.fs import FS
+from logrec.properties import DEFAULT_PARSE_CACHE_DIR, DEFAULT_ARTIFACTS_DIR, DEFAULT_BPE_CACHE_DIR
+from logrec.util.files import file_mapper
+from logrec.util.profiler import PipelineStats, get_memo_counters
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter(object):
+    """
+    Writes the batch to a separate file if the path is given, does nothing otherwise.
+    """
+    def __init__(self, path_to_file: Optional[str], batch_index: int, open_func, mode: str):
+        self.path_to_batch_file = get_batch_file_path(path_to_file, batch_index) if path_to_file else None
+        self.open_func = open_func
+        self.mode = mode
+
+    def __enter__(self):
+        self.handle = self.open_func(self.path_to_batch_file, self.mode) if self.path_to_batch_file else None
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.handle:
+            self.handle.close()
+
+    def write(self, line: str) -> None:
+        if self.handle:
+            self.handle.write(line)
+
+
+def build_batch(params):
+    """
+    Preprocesses a batch of files of one project, converts each file to the repr and, if the project is from
+    the train set, counts the words of the repr. The parsed and repr batches are written only if the paths are given.
+    """
+    project_key, dir_with_files_to_preprocess, path_to_parsed_file, path_to_repr_file, batch_index, files, \
+    preprocessing_param_dict, prep_config, count_vocab, parse_cache_dir = params
+    parse_cache = ParseCache(parse_cache_dir, pp_params["preprocessors"]) if parse_cache_dir else None
+    splitting_config = get_global_n_gramm_splitting_config()
+    stats = PipelineStats()
+    memo_counters_before = get_memo_counters()
+    filenames = []
+    partial_vocab = None
+    with ParsedBatchWriter(path_to_parsed_file, batch_index, preprocessing_param_dict) as parsed_writer, \
+            BatchWriter(path_to_repr_file, batch_index, open, 'w') as repr_writer:
+        for read_result in read_ahead(files):
+            if read_result is None:
+                continue
+            lines_from_file, file_path = read_result
+            parsed = preprocess_file(lines_from_file, parse_cache, stats)
+            parsed_writer.write(parsed)
+            start = time.perf_counter()
+            repr_list = to_repr(prep_config, parsed, splitting_config)
+            stats.record('to_repr', time.perf_counter() - start, len(parsed), len(repr_list))
+            repr_line = to_token_list(repr_list)
+            repr_writer.write(repr_line)
+            if count_vocab:
+                file_vocab = PartialVocab(Counter(repr_line.rstrip('\n').split(' ')), 0)
+                if partial_vocab is None:
+                    partial_vocab = file_vocab
+                else:
+                    partial_vocab.add_vocab(file_vocab)
+            filenames.append(os.path.relpath(file_path, start=dir_with_files_to_preprocess))
+    flush_bpe_caches()
+    stats.add_memo_counters(memo_counters_before, get_memo_counters())
+    return project_key, batch_index, filenames, partial_vocab, stats
+
+
+def init_worker(trace_allocations: bool, splitting_config_args: tuple) -> None:
+    if trace_allocations:
+        start_tracing_allocations()
+    init_worker_splitting_config(*splitting_config_args)
+
+
+def finish_project(project_task: ProjectTask, path_to_repr_file: Optional[str]) -> None:
+    if project_task.path_to_preprocessed_file:
+        merge_batches(project_task.path_to_preprocessed_file, project_task.path_to_filenames_file,
+                      project_task.filenames_by_batch)
+    if path_to_repr_file:
+        concat_batches(path_to_repr_file, len(project_task.filenames_by_batch))
+        os.rename(f'{path_to_repr_file}.{NOT_FINISHED_EXTENSION}', path_to_repr_file)
+    logger.info(f"[{os.path.join(project_task.train_test_valid, project_task.project)}] "
+                f"Processed {sum(map(len, project_task.filenames_by_batch))} files")
+
+
+def run(dataset: str, preprocessing_params: str, bpe_base_repr: Optional[str], bpe_n_merges: Optional[int],
+        splitting_file: Optional[str], merges_file: Optional[str], write_parsed: bool = False,
+        write_repr: bool = False, max_vocab_threshold: int = sys.maxsize,
+        files_per_batch: int = DEFAULT_FILES_PER_BATCH, parse_cache_dir: Optional[str] = None,
+        trace_allocations: bool = False, artifacts_dir: Optional[str] = None,
+        bpe_cache_dir: Optional[str] = None, parsed_format: str = PICKLE_FORMAT,
+        parse_cache_max_size_mb: int = DEFAULT_PARSE_CACHE_MAX_SIZE_MB) -> None:
+    fs = FS.for_parse_projects(dataset)
+
+    prep_config = PrepConfig.from_encoded_string(preprocessing_params)
+    splitting_config_args = (dataset, prep_config, bpe_base_repr, bpe_n_merges, splitting_file, merges_file,
+                             artifacts_dir, bpe_cache_dir)
+    init_splitting_config(*splitting_config_args)
+    repr_dir_name = get_repr_dir_name(str(prep_config), bpe_n_merges, merges_file)
+
+    full_repr_dir = os.path.join(fs.path_to_dataset, REPR_DIR, repr_dir_name)
+    full_metadata_dir = os.path.join(fs.path_to_dataset, METADATA_DIR, repr_dir_name)
+    if os.path.exists(os.path.join(full_metadata_dir, VOCABSIZE_FILENAME)):
+        logger.warning(f"File already exists: {os.path.join(full_metadata_dir, VOCABSIZE_FILENAME)}. Doing nothing.")
+        exit(0)
+    os.makedirs(full_metadata_dir, exist_ok=True)
+
+    logger.info(f"Getting files from {fs.path_to_raw_dataset}")
+    preprocessing_types_dict = {k: None for k in PrepParam}
+    if write_parsed:
+        logger.info(f"Writing preprocessed files to {fs.path_to_parsed_dataset}")
+        fs.save_pp_params(pp_params)
+        fs.save_preprocessing_types(preprocessing_types_dict)
+    if write_repr:
+        logger.info(f"Writing repr files to {full_repr_dir}")
+        os.makedirs(full_repr_dir, exist_ok=True)
+        with open(os.path.join(full_repr_dir, 'preprocessing_types.json'), "w") as f:
+            f.write(jsons.dumps(prep_config))
+    logger.info(f"Writing vocab to {full_metadata_dir}")
+
+    skip_list = load_skip_list(fs.path_to_dataset)
+    project_tasks = {}
+    repr_files = {}
+    planned_projects = []
+    for train_test_valid, project in fs.get_raw_projects():
+        dir_with_files_to_preprocess = os.path.join(fs.path_to_raw_dataset, train_test_valid, project)
+        files = [file for file in file_mapper(dir_with_files_to_preprocess, lambda path: path)
+                 if os.path.relpath(file, start=fs.path_to_raw_dataset) not in skip_list]
+        batches = split_into_batches(files, files_per_batch)
+
+        path_to_parsed_file, path_to_filenames_file, path_to_repr_file = None, None, None
+        if write_parsed:
+            full_parsed_dir = os.path.join(fs.path_to_parsed_dataset, train_test_valid)
+            os.makedirs(full_parsed_dir, exist_ok=True)
+            path_to_parsed_file = os.path.join(full_parsed_dir, f'{project}.{get_parsed_extension(parsed_format)}')
+            if keep_existing_parsed_file(path_to_parsed_file):
+                logger.warning(f"File {path_to_parsed_file} already exists! Not rewriting it.")
+                path_to_parsed_file = None
+            else:
+                path_to_filenames_file = os.path.join(full_parsed_dir, f'.{project}.{FILENAMES_EXTENSION}')
+        if write_repr:
+            os.makedirs(os.path.join(full_repr_dir, train_test_valid), exist_ok=True)
+            path_to_repr_file = os.path.join(full_repr_dir, train_test_valid,
+                                             f'{project}.{PARSED_EXTENSION}.{REPR_EXTENSION}')
+
+        project_key = (train_test_valid, project)
+        project_tasks[project_key] = ProjectTask(train_test_valid, project, path_to_parsed_file,
+                                                 path_to_filenames_file, len(batches))
+        repr_files[project_key] = path_to_repr_file
+        planned_projects.append([(project_key, dir_with_files_to_preprocess, path_to_parsed_file, path_to_repr_file,
+                                  batch_index, batch, preprocessing_types_dict, prep_config,
+                                  train_test_valid == TRAIN_DIR, parse_cache_dir)
+                                 for batch_index, batch in enumerate(batches)])
+
+    # biggest projects first, so that their batches do not end up in the tail of the run
+    planned_projects.sort(key=lambda batch_params: sum(len(p[5]) for p in batch_params), reverse=True)
+    params = [p for batch_params in planned_projects for p in batch_params]
+    logger.info(f"Projects to process: {len(project_tasks)}, batches: {len(params)}")
+
+    vocab = None
+    stats = PipelineStats()
+    with Pool(initializer=init_worker, initargs=(trace_allocations, splitting_config_args)) as pool:
+        it = pool.imap_unordered(build_batch, params)
+        for project_key, batch_index, filenames, partial_vocab, batch_stats in tqdm(it, total=len(params)):
+            stats.merge(batch_stats)
+            if partial_vocab is not None:
+                if vocab is None:
+                    vocab = partial_vocab
+                else:
+                    vocab.add_vocab(partial_vocab)
+            project_task = project_tasks[project_key]
+            if project_task.batch_done(batch_index, filenames):
+                finish_project(project_task, repr_files[project_key])
+    if parse_cache_dir:
+        prune_parse_cache(parse_cache_dir, parse_cache_max_size_mb)
+    stats.dump(os.path.join(full_metadata_dir, STATS_FILENAME))
+
+    if vocab is None:
+        logger.warning("No files found in the train set.")
+        exit(4)
+    vocab.limit_max_vocab(max_vocab_threshold)
+    vocab.write_stats(os.path.join(full_metadata_dir, VOCABSIZE_FILENAME))
+    vocab.write_vocab(os.path.join(full_metadata_dir, VOCAB_FILENAME))
+    vocab.write_field(os.path.join(full_metadata_dir, TEXT_FIELD_FILE))
+    logger.info(f"Vocab size: {len(vocab.merged_word_counts)}")
+
+
+if __name__ == '__main__':
+    from logrec.properties import DEFAULT_TO_REPR_ARGS
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dataset', action='store', help='dataset name')
+    parser.add_argument('repr', action='store', help='preprocessing params line, \n Example: 101011')
+    parser.add_argument('--merges-file', action='store')
+    parser.add_argument('--bpe-base-repr', action='store')
+    parser.add_argument('--bpe-n-merges', action='store', type=int)
+    parser.add_argument('--splitting-file', action='store', help='Full path to the file with sc split words',
+                        default=os.path.join(base_project_dir, 'splittings.txt'))
+    parser.add_argument('--write-parsed', action='store_true', help='write .parsed files as parse_projects.py does')
+    parser.add_argument('--parsed-format', choices=PARSED_FORMATS, default=PICKLE_FORMAT,
+                        help='with --write-parsed, write gzipped pickles (.parsed) or the parsed bin format '
+                             '(.parsedbin), which is faster to read')
+    parser.add_argument('--write-repr', action='store_true', help='write .repr files as to_repr.py does')
+    parser.add_argument('--max-vocab-threshold', action='store', type=int, default=sys.maxsize)
+    parser.add_argument('--files-per-batch', type=int, default=DEFAULT_FILES_PER_BATCH,
+                        help='big projects are split into batches of this many files which are processed in parallel')
+    parser.add_argument('--parse-cache-dir', default=DEFAULT_PARSE_CACHE_DIR,
+                        help='directory of the cache of preprocessed files shared between runs and datasets')
+    parser.add_argument('--no-cache', action='store_true', help='preprocess all the files without using the cache')
+    parser.add_argument('--parse-cache-max-size', type=int, default=DEFAULT_PARSE_CACHE_MAX_SIZE_MB,
+                        help='size of the parse cache in megabytes, the least recently used entries '
+                             'are removed after the run')
+    parser.add_argument('--trace-allocations', action='store_true',
+                        help='record memory allocated by each preprocessor (slows down preprocessing)')
+    parser.add_argument('--shared-artifacts', action='store_true',
+                        help='memory-map the merges cache and splittings shared by the workers instead of reading '
+                             'them into memory of each worker (less memory, but slower lookups)')
+    parser.add_argument('--artifacts-dir', action='store', default=DEFAULT_ARTIFACTS_DIR,
+                        help='with --shared-artifacts, directory with the merges caches and splittings')
+    parser.add_argument('--bpe-cache-dir', action='store', default=DEFAULT_BPE_CACHE_DIR,
+                        help='directory with the bpe encodings of the words not in the merges cache, '
+                             'shared by the workers and the runs')
+    parser.add_argument('--no-bpe-cache', action='store_true', help='encode the words without the persistent cache')
+
+    args = parser.parse_known_args(*DEFAULT_TO_REPR_ARGS)
+    args = args[0]
+
+    run(args.dataset, args.repr, args.bpe_base_repr, args.bpe_n_merges, args.splitting_file, args.merges_file,
+        args.write_parsed, args.write_repr, args.max_vocab_threshold, args.files_per_batch,
+        None if args.no_cache else args.parse_cache_dir, args.trace_allocations,
+        args.artifacts_dir if args.shared_artifacts else None, None if args.no_bpe_cache else args.bpe_cache_dir,
+        args.parsed_format, args.parse_cache_max_size)
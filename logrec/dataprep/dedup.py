@@ -0,0 +1,176 @@
+"""
+Finds exact and near duplicate files in a raw dataset and writes a skip list honored by `parse_projects`.
+
+Exact duplicates are found by the hash of the file bytes. Near duplicates are found with MinHash signatures of
+token shingles: the signatures are split into bands (LSH), files sharing at least one band are candidates,
+and candidates whose estimated Jaccard similarity reaches the threshold are merged into one duplicate group.
+Of each group only the file with the smallest path is kept, all the others are added to the skip list.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import zlib
+from multiprocessing.pool import Pool
+from typing import List, Optional, Tuple, Dict, Set
+
+import numpy as np
+import regex
+from tqdm import tqdm
+
+from logrec.util.files import file_mapper
+
+logger = logging.getLogger(__name__)
+
+SKIP_LIST_FILENAME = 'duplicates.skip'
+GROUPS_FILENAME = 'duplicates.json'
+
+DEFAULT_SHINGLE_SIZE = 5
+DEFAULT_THRESHOLD = 0.8
+N_PERMUTATIONS = 128
+N_BANDS = 16
+ROWS_PER_BAND = N_PERMUTATIONS // N_BANDS
+
+MERSENNE_PRIME = (1 << 31) - 1
+
+_random_state = np.random.RandomState(42)
+PERMUTATION_A = _random_state.randint(1, MERSENNE_PRIME, size=N_PERMUTATIONS).astype(np.uint64)
+PERMUTATION_B = _random_state.randint(0, MERSENNE_PRIME, size=N_PERMUTATIONS).astype(np.uint64)
+
+TOKEN_REGEX = regex.compile(r'\w+|[^\w\s]')
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_REGEX.findall(text)
+
+
+def get_shingle_hashes(tokens: List[str], shingle_size: int) -> np.ndarray:
+    shingles = {' '.join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)}
+    return np.fromiter((zlib.crc32(s.encode('utf-8', 'surrogatepass')) % MERSENNE_PRIME for s in shingles),
+                       dtype=np.uint64, count=len(shingles))
+
+
+def minhash(shingle_hashes: np.ndarray) -> np.ndarray:
+    # a * x + b < 2^62, so there is no overflow in uint64
+    permuted = (np.outer(shingle_hashes, PERMUTATION_A) + PERMUTATION_B) % MERSENNE_PRIME
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def fingerprint(params: Tuple[str, str, int]) -> Tuple[str, str, Optional[np.ndarray]]:
+    """
+    :return: path relative to the dataset, hash of the file bytes and MinHash signature
+    (None if the file is too short to contain a shingle)
+    """
+    path_to_dataset, file, shingle_size = params
+    with open(file, 'rb') as f:
+        content = f.read()
+    exact_hash = hashlib.sha1(content).hexdigest()
+    tokens = tokenize(content.decode('utf-8', errors='replace'))
+    signature = minhash(get_shingle_hashes(tokens, shingle_size)) if len(tokens) >= shingle_size else None
+    return os.path.relpath(file, start=path_to_dataset), exact_hash, signature
+
+
+class UnionFind(object):
+    def __init__(self, n: int):
+        self.parents = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parents[i] != i:
+            self.parents[i] = self.parents[self.parents[i]]
+            i = self.parents[i]
+        return i
+
+    def union(self, i: int, j: int) -> None:
+        root_i, root_j = self.find(i), self.find(j)
+        if root_i != root_j:
+            self.parents[max(root_i, root_j)] = min(root_i, root_j)
+
+
+def find_duplicate_groups(fingerprints: List[Tuple[str, str, Optional[np.ndarray]]],
+                          threshold: float = DEFAULT_THRESHOLD) -> List[List[str]]:
+    """
+    :return: groups of duplicate files, each group and the list of groups are sorted
+    """
+    fingerprints = sorted(fingerprints, key=lambda f: f[0])
+    union_find = UnionFind(len(fingerprints))
+
+    first_with_hash: Dict[str, int] = {}
+    for i, (_, exact_hash, _) in enumerate(fingerprints):
+        union_find.union(first_with_hash.setdefault(exact_hash, i), i)
+
+    buckets: Dict[Tuple[int, bytes], List[int]] = {}
+    for i, (_, _, signature) in enumerate(fingerprints):
+        if signature is None:
+            continue
+        for band in range(N_BANDS):
+            band_bytes = signature[band * ROWS_PER_BAND: (band + 1) * ROWS_PER_BAND].tobytes()
+            buckets.setdefault((band, band_bytes), []).append(i)
+
+    for bucket in buckets.values():
+        # each file is compared to one representative of each group found in the bucket so far
+        representatives = []
+        for i in bucket:
+            for representative in representatives:
+                if union_find.find(i) == union_find.find(representative) \
+                        or np.mean(fingerprints[i][2] == fingerprints[representative][2]) >= threshold:
+                    union_find.union(representative, i)
+                    break
+            else:
+                representatives.append(i)
+
+    groups: Dict[int, List[str]] = {}
+    for i, (path, _, _) in enumerate(fingerprints):
+        groups.setdefault(union_find.find(i), []).append(path)
+    return sorted(group for group in groups.values() if len(group) > 1)
+
+
+def get_skip_list(duplicate_groups: List[List[str]]) -> List[str]:
+    return [path for group in duplicate_groups for path in group[1:]]
+
+
+def load_skip_list(path_to_dataset: str) -> Set[str]:
+    path_to_skip_list = os.path.join(path_to_dataset, SKIP_LIST_FILENAME)
+    if not os.path.exists(path_to_skip_list):
+        return set()
+    with open(path_to_skip_list, 'r') as f:
+        return {line.rstrip('\n') for line in f}
+
+
+def run(dataset: str, shingle_size: int = DEFAULT_SHINGLE_SIZE, threshold: float = DEFAULT_THRESHOLD) -> Set[str]:
+    from logrec.infrastructure.fs import FS
+
+    fs = FS.for_parse_projects(dataset)
+    path_to_raw_dataset = fs.path_to_raw_dataset
+
+    logger.info(f"Fingerprinting files from {path_to_raw_dataset}")
+    params = []
+    for train_test_valid, project in fs.get_raw_projects():
+        for file in file_mapper(os.path.join(path_to_raw_dataset, train_test_valid, project), lambda path: path):
+            params.append((path_to_raw_dataset, file, shingle_size))
+
+    with Pool() as pool:
+        fingerprints = [f for f in tqdm(pool.imap_unordered(fingerprint, params, chunksize=64), total=len(params))]
+
+    duplicate_groups = find_duplicate_groups(fingerprints, threshold)
+    skip_list = get_skip_list(duplicate_groups)
+    logger.info(f"Found {len(duplicate_groups)} groups of duplicates, "
+                f"{len(skip_list)} out of {len(fingerprints)} files will be skipped")
+
+    with open(os.path.join(fs.path_to_dataset, GROUPS_FILENAME), 'w') as f:
+        json.dump(duplicate_groups, f, indent=2)
+    with open(os.path.join(fs.path_to_dataset, SKIP_LIST_FILENAME), 'w') as f:
+        for path in skip_list:
+            f.write(f'{path}\n')
+    return set(skip_list)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dataset', help='dataset name')
+    parser.add_argument('--shingle-size', type=int, default=DEFAULT_SHINGLE_SIZE, help='number of tokens in a shingle')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='minimum estimated jaccard similarity of near duplicates')
+    args = parser.parse_args()
+
+    run(args.dataset, args.shingle_size, args.threshold)
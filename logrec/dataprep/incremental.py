@@ -0,0 +1,235 @@
+"""
+Incremental preprocessing of a file which is being edited (e.g. in an IDE).
+
+The file is kept as a list of lines together with:
+ - the tokens each line is turned into by the token-local preprocessors, which come before the detection
+   of comments and string literals, so that only the changed lines are lexed again;
+ - checkpoints at the line boundaries where the stateful preprocessors (`java.process_comments_and_str_literals`,
+   `logs.mark` and `loggable.mark`) hold nothing back: no comment is open, no tokens are held back
+   as a possible log statement and no loggable block is open. A checkpoint keeps the state of `loggable.mark`
+   (the nestedness of class bodies) and the position in the output.
+
+After an edit, the stateful preprocessors are run again from the last checkpoint before the changed lines,
+block by block, until their state at a line boundary after the changed lines is the same as it was at this boundary
+before the edit; the rest of the output is then reused. If a stateful preprocessor gives up (unmatched quotes,
+comments or brackets), it leaves the whole file unprocessed, so in this case the whole file is processed again.
+
+The result is always the same as the result of `apply_preprocessors` on `from_file` of the whole text.
+"""
+import io
+import logging
+from typing import List, Optional, Tuple
+
+from logrec.dataprep.model.chars import NewLine
+from logrec.dataprep.model.containers import MultilineComment
+from logrec.dataprep.model.word import ParseableToken
+from logrec.dataprep.preprocessors import java, logs, loggable
+from logrec.dataprep.preprocessors.core import apply_preprocessors, resolve_preprocessors, get_iter_variant, \
+    get_preprocessor_name
+from logrec.dataprep.preprocessors.preprocessor_list import pp_params
+
+logger = logging.getLogger(__name__)
+
+STATEFUL_PREPROCESSORS = [java.process_comments_and_str_literals, logs.mark, loggable.mark]
+
+# number of lines processed at once after the changed lines, doubled for every next block
+INITIAL_BLOCK_SIZE = 32
+
+
+def split_lines(text: str) -> List[str]:
+    """
+    :return: lines of the text without line separators, split the same way as the files are read in `parse_projects`
+    """
+    return [line[:-1] if line.endswith('\n') else line for line in io.StringIO(text, newline=None)]
+
+
+class Checkpoint(object):
+    def __init__(self, loggable_state: loggable.State, block_nestedness: Tuple[int, ...], output_index: int):
+        self.loggable_state = loggable_state
+        self.block_nestedness = block_nestedness
+        self.output_index = output_index
+
+    def has_same_state(self, other: 'Checkpoint') -> bool:
+        return self.loggable_state is other.loggable_state and self.block_nestedness == other.block_nestedness
+
+    def shifted(self, shift: int) -> 'Checkpoint':
+        return Checkpoint(self.loggable_state, self.block_nestedness, self.output_index + shift)
+
+
+START_CHECKPOINT = Checkpoint(loggable.NON_LOGGABLE, (), 0)
+
+
+class StatefulPreprocessorFailed(Exception):
+    pass
+
+
+class IncrementalPreprocessor(object):
+    def __init__(self, preprocessors: List[str] = pp_params['preprocessors'], context: Optional[dict] = None):
+        """
+        :param preprocessors: must contain `STATEFUL_PREPROCESSORS` one after another,
+        all the other preprocessors must have a generator version, i.e. be token-local
+        """
+        self.preprocessors = resolve_preprocessors(preprocessors)
+        names = [get_preprocessor_name(pp) for pp in self.preprocessors]
+        try:
+            first_stateful = self.preprocessors.index(STATEFUL_PREPROCESSORS[0])
+        except ValueError:
+            raise ValueError(f"{get_preprocessor_name(STATEFUL_PREPROCESSORS[0])} is not in {names}")
+        if self.preprocessors[first_stateful:first_stateful + len(STATEFUL_PREPROCESSORS)] != STATEFUL_PREPROCESSORS:
+            raise ValueError(f"{[get_preprocessor_name(pp) for pp in STATEFUL_PREPROCESSORS]} "
+                             f"must come one after another in {names}")
+        self.before = self.preprocessors[:first_stateful]
+        self.after = self.preprocessors[first_stateful + len(STATEFUL_PREPROCESSORS):]
+        for preprocessor in self.before + self.after:
+            if get_iter_variant(preprocessor) is None:
+                raise ValueError(f"{get_preprocessor_name(preprocessor)} cannot be applied incrementally")
+        self.context = context if context is not None else {}
+
+        self.lines: List[str] = []
+        self.line_tokens: List[List] = []
+        # checkpoints[i] is at the beginning of the i-th line (None if the state there cannot be reused),
+        # the list itself is None if a stateful preprocessor gave up on the file
+        self.checkpoints: Optional[List[Optional[Checkpoint]]] = [START_CHECKPOINT]
+        self.token_list: List = []
+
+    def _lex(self, line: str) -> List:
+        return apply_preprocessors([ParseableToken(line)], self.before, self.context)
+
+    def _get_tokens(self, start_line: int, end_line: int) -> List:
+        tokens = []
+        for line_tokens in self.line_tokens[start_line:end_line]:
+            tokens.extend(line_tokens)
+            tokens.append(NewLine())
+        return tokens
+
+    def set_text(self, text: str) -> List:
+        return self.update(0, len(self.lines), text)
+
+    def update_text(self, text: str) -> List:
+        """
+        Replaces the whole text, only the lines between the common beginning and the common end
+        of the old and the new text are considered changed.
+        """
+        new_lines = split_lines(text)
+        max_common = min(len(self.lines), len(new_lines))
+        prefix = 0
+        while prefix < max_common and self.lines[prefix] == new_lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < max_common - prefix and self.lines[-1 - suffix] == new_lines[-1 - suffix]:
+            suffix += 1
+        return self._update(prefix, len(self.lines) - suffix, new_lines[prefix:len(new_lines) - suffix])
+
+    def update(self, start_line: int, end_line: int, text: str) -> List:
+        """
+        Replaces lines from `start_line` (inclusive) to `end_line` (exclusive) with the lines of `text`.
+
+        :return: the preprocessed tokens of the whole new text
+        """
+        if not 0 <= start_line <= end_line <= len(self.lines):
+            raise ValueError(f"Invalid line range: {start_line}-{end_line}, number of lines: {len(self.lines)}")
+        return self._update(start_line, end_line, split_lines(text))
+
+    def _update(self, start_line: int, end_line: int, new_lines: List[str]) -> List:
+        self.lines[start_line:end_line] = new_lines
+        self.line_tokens[start_line:end_line] = [self._lex(line) for line in new_lines]
+        delta = len(new_lines) - (end_line - start_line)
+        old_checkpoints = self.checkpoints
+        if old_checkpoints is None:
+            self._process_all()
+            return self.token_list
+
+        start = start_line
+        while old_checkpoints[start] is None:
+            start -= 1
+        try:
+            self._process_from(start, start_line + len(new_lines), old_checkpoints, delta)
+        except StatefulPreprocessorFailed:
+            self._process_all()
+        return self.token_list
+
+    def _process_all(self) -> None:
+        self.checkpoints = [START_CHECKPOINT]
+        self.token_list = []
+        try:
+            self._process_from(0, len(self.lines), None, 0)
+        except StatefulPreprocessorFailed:
+            # preprocessors which gave up leave their input as it is, and so does `apply_preprocessors`
+            self.token_list = apply_preprocessors(self._get_tokens(0, len(self.lines)),
+                                                  STATEFUL_PREPROCESSORS + self.after, self.context)
+            self.checkpoints = None
+
+    def _process_from(self, start: int, changed_end: int, old_checkpoints: Optional[List[Optional[Checkpoint]]],
+                      delta: int) -> None:
+        """
+        Processes the lines starting from the `start` checkpoint until the state after `changed_end`
+        is the same as at the corresponding old checkpoint, or until the end of the file.
+
+        :raises StatefulPreprocessorFailed: if a stateful preprocessor gave up on a block of lines
+        """
+        start_checkpoint = self.checkpoints[start]
+        n_lines = len(self.lines)
+        logs_marker = logs.LogStatementMarker()
+        loggable_state = start_checkpoint.loggable_state
+        block_nestedness = list(start_checkpoint.block_nestedness)
+        marked = []
+        output = []
+        # tokens marked since the last checkpoint, the output tokens before it are complete
+        n_complete_marked = 0
+        new_checkpoints = []
+
+        line = start
+        block_size = INITIAL_BLOCK_SIZE
+        while line < n_lines:
+            block_end = min(n_lines, max(line + block_size, changed_end))
+            tokens = self._get_tokens(line, block_end)
+            try:
+                segments, active_symbol, active_symbol_index = java.find_comment_string_literal_segments(tokens)
+            except ValueError:
+                raise StatefulPreprocessorFailed()
+            if active_symbol is not None and block_end < n_lines:
+                # a multiline comment goes on after the block
+                block_size *= 2
+                continue
+            # lines after a multiline comment which is never closed are not in a comment for the following blocks
+            open_comment_line = line + tokens[:active_symbol_index].count(java.NEW_LINE) \
+                if active_symbol is not None else n_lines
+
+            chunk = []
+            for token in java.replace_segments(tokens, segments):
+                chunk.append(token)
+                if isinstance(token, MultilineComment):
+                    for _ in range(sum(1 for t in token.get_subtokens() if isinstance(t, NewLine))):
+                        line += 1
+                        new_checkpoints.append(None)
+                if not isinstance(token, NewLine):
+                    continue
+
+                line += 1
+                try:
+                    loggable_state = loggable.mark_into(marked, logs_marker.mark_iter(chunk),
+                                                        loggable_state, block_nestedness)
+                except ValueError:
+                    raise StatefulPreprocessorFailed()
+                chunk = []
+                if line > open_comment_line or not logs_marker.is_clean() or loggable_state is loggable.LOGGABLE:
+                    new_checkpoints.append(None)
+                    continue
+                output.extend(apply_preprocessors(marked[n_complete_marked:], self.after, self.context))
+                n_complete_marked = len(marked)
+                checkpoint = Checkpoint(loggable_state, tuple(block_nestedness),
+                                        start_checkpoint.output_index + len(output))
+                new_checkpoints.append(checkpoint)
+                if old_checkpoints is not None and line >= changed_end:
+                    old_checkpoint = old_checkpoints[line - delta]
+                    if old_checkpoint is not None and old_checkpoint.has_same_state(checkpoint):
+                        shift = checkpoint.output_index - old_checkpoint.output_index
+                        self.token_list[start_checkpoint.output_index:old_checkpoint.output_index] = output
+                        self.checkpoints[start + 1:] = new_checkpoints + \
+                            [c.shifted(shift) if c is not None else None for c in old_checkpoints[line - delta + 1:]]
+                        return
+            block_size *= 2
+
+        output.extend(apply_preprocessors(marked[n_complete_marked:], self.after, self.context))
+        self.token_list[start_checkpoint.output_index:] = output
+        self.checkpoints[start + 1:] = new_checkpoints
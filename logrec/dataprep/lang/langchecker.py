@@ -7,6 +7,16 @@ from logrec.dataprep.split.samecase.splitter import load_english_dict
 
 logger = logging.getLogger(__name__)
 
+if hasattr(str, 'isascii'):
+    isascii = str.isascii
+else:  # python < 3.7
+    def isascii(s: str) -> bool:
+        try:
+            s.encode('ascii')
+            return True
+        except UnicodeEncodeError:
+            return False
+
 
 class LanguageChecker(object):
     DEFAULT_MIN_CHARS_TO_BE_NON_ENG = 4
@@ -18,11 +28,21 @@ class LanguageChecker(object):
         self.non_eng_word_set = self.__create_non_eng_word_set(path_to_non_eng_dicts, english_general_dict,
                                                                LanguageChecker.DEFAULT_MIN_CHARS_TO_BE_NON_ENG)
 
+    @classmethod
+    def with_word_set(cls, non_eng_word_set):
+        """
+        Creates a checker with an already built set of non-english words, e.g. one shared between processes
+        (see `logrec.dataprep.artifacts`), without loading the dictionaries.
+        """
+        language_checker = cls.__new__(cls)
+        language_checker.non_eng_word_set = non_eng_word_set
+        return language_checker
+
     def in_non_eng_word_set(self, word):
         return word in self.non_eng_word_set
 
     def is_non_eng(self, word):
-        return not self.__isascii(word) or self.in_non_eng_word_set(word.lower())
+        return not isascii(word) or word.lower() in self.non_eng_word_set
 
     def calc_lang_stats(self, word_list, include_sample=False):
         non_eng_unique = set()
@@ -55,10 +75,3 @@ class LanguageChecker(object):
                     if word not in english_dict and len(word) >= min_chars:
                         non_eng_words.add(word)
         return non_eng_words
-
-    def __isascii(self, str):
-        try:
-            str.encode('ascii')
-            return True
-        except UnicodeEncodeError:
-            return False
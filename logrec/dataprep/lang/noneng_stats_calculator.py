@@ -1,18 +1,18 @@
 import argparse
 import logging
 import os
-import gzip
-import pickle
 import re
 from functools import partial
 from multiprocessing.pool import Pool
 
-from logrec.dataprep import parse_projects, path_to_non_eng_dicts, path_to_eng_dicts, PARSED_DIR
+from logrec.dataprep import parse_projects, parsed_bin, path_to_non_eng_dicts, path_to_eng_dicts, PARSED_DIR, \
+    artifacts
 from logrec.dataprep.lang.dao import DAO
 from logrec.dataprep.lang.langchecker import LanguageChecker
+from logrec.dataprep.parsed_bin import iter_token_lists
 from logrec.dataprep.preprocessors.general import to_token_list
 from logrec.dataprep.prepconfig import PrepConfig
-from logrec.dataprep.to_repr import to_repr
+from logrec.dataprep.to_repr import to_reprs
 from logrec.dataprep.split.ngram import NgramSplitConfig
 from logrec.infrastructure.fractions_manager import included_in_fraction
 
@@ -20,7 +20,7 @@ logger = logging.getLogger(__name__)
 
 
 def get_project_name(file):
-    pattern = f'(.*).{parse_projects.EXTENSION}'
+    pattern = f'(.*)\\.(?:{parse_projects.EXTENSION}|{parsed_bin.EXTENSION})'
     match = re.fullmatch(pattern, file)
     if match is not None:
         return match[1]
@@ -28,47 +28,62 @@ def get_project_name(file):
         raise AssertionError(f'File {file} does not match the pattern {pattern}')
 
 
-def calc_stats_for_prepconfig(prepconfig, lang_checker, token_list, include_sample=False):
-    repr = to_token_list(to_repr(PrepConfig.from_encoded_string(prepconfig), token_list, NgramSplitConfig())).split(' ')
-    return lang_checker.calc_lang_stats(repr, include_sample=include_sample)
+# only code; code and strings; code, strings and comments
+STATS_PREP_CONFIGS = ['02110', '01110', '00110']
+
+# no splitting is done with these prep configs, the same config is used for all of them,
+# so that the renderings memoized in `to_repr` are reused
+NO_SPLITTING_CONFIG = NgramSplitConfig()
+
+
+def calc_stats_for_prepconfigs(prepconfigs, lang_checker, token_list):
+    """
+    :return: stats for each of the prep configs, a sample of the repr is included in the stats of the last one
+    """
+    reprs = to_reprs([PrepConfig.from_encoded_string(prepconfig) for prepconfig in prepconfigs], token_list,
+                     [NO_SPLITTING_CONFIG] * len(prepconfigs))
+    return [lang_checker.calc_lang_stats(to_token_list(repr).split(' '), include_sample=(i == len(reprs) - 1))
+            for i, repr in enumerate(reprs)]
 
 
 def calc_stats(lang_checker, path_to_dir_with_preprocessed_projects, train_test_valid, file):
     project_name = get_project_name(file)
     filenames_file = f'.{project_name}.{parse_projects.FILENAMES_EXTENSION}'
     file_stats = []
-    with gzip.GzipFile(os.path.join(path_to_dir_with_preprocessed_projects, train_test_valid, file), 'rb') as f, \
-            open(os.path.join(path_to_dir_with_preprocessed_projects, train_test_valid, filenames_file), 'r') as fn:
-        _ = pickle.load(f)  # preprocessing param dict
-        while True:
-            try:
-                token_list = pickle.load(f)
-
-                only_code_stats = calc_stats_for_prepconfig('02110', lang_checker, token_list)
-                code_str_stats = calc_stats_for_prepconfig('01110', lang_checker, token_list)
-                code_str_com_stats = calc_stats_for_prepconfig('00110', lang_checker, token_list, include_sample=True)
-
-                filename = fn.readline().rstrip('\n')
-                file_stats.append(
-                    (train_test_valid, project_name, filename, *only_code_stats, *code_str_stats, *code_str_com_stats))
-            except EOFError:
-                break
+    with open(os.path.join(path_to_dir_with_preprocessed_projects, train_test_valid, filenames_file), 'r') as fn:
+        for token_list in iter_token_lists(os.path.join(path_to_dir_with_preprocessed_projects, train_test_valid, file),
+                                           token_streams=True):
+            only_code_stats, code_str_stats, code_str_com_stats = \
+                calc_stats_for_prepconfigs(STATS_PREP_CONFIGS, lang_checker, token_list)
+
+            filename = fn.readline().rstrip('\n')
+            file_stats.append(
+                (train_test_valid, project_name, filename, *only_code_stats, *code_str_stats, *code_str_com_stats))
     return file_stats if file_stats else [[train_test_valid, project_name]]
 
 
 def parsed_files_generator(path_to_dir_with_preprocessed_projects, train_test_valid, percent, start_from, dao):
-    for file in os.listdir(os.path.join(path_to_dir_with_preprocessed_projects, train_test_valid)):
+    files = os.listdir(os.path.join(path_to_dir_with_preprocessed_projects, train_test_valid))
+    for file in files:
         if file.startswith(".") or get_project_name(file) in dao.processed_projects_cache:
             continue
+        if file.endswith(f'.{parse_projects.EXTENSION}') and os.path.basename(parsed_bin.get_bin_path(file)) in files:
+            continue
         if included_in_fraction(file, percent, start_from):
             yield file
 
 
 def run():
-    from logrec.properties import DEFAULT_PARSED_DATASETS_DIR, DEFAULT_PROJECT_LANGUAGE_CHECKER_ARGS
+    from logrec.properties import DEFAULT_PARSED_DATASETS_DIR, DEFAULT_PROJECT_LANGUAGE_CHECKER_ARGS, \
+        DEFAULT_ARTIFACTS_DIR
 
     parser = argparse.ArgumentParser()
     parser.add_argument('--base-dataset-dir', default=DEFAULT_PARSED_DATASETS_DIR)
+    parser.add_argument('--shared-artifacts', action='store_true',
+                        help='memory-map the non-english word set shared by the workers instead of building a set '
+                             'in each of them (less memory, but slower lookups)')
+    parser.add_argument('--artifacts-dir', default=DEFAULT_ARTIFACTS_DIR,
+                        help='with --shared-artifacts, directory with the non-english word set')
     parser.add_argument('dataset')
     parser.add_argument('train_test_valid')
     parser.add_argument('percent', type=float)
@@ -82,7 +97,12 @@ def run():
         logger.error(f"Path: {path_to_dir_with_preprocessed_projects} does not exist")
         exit(1)
 
-    language_checker = LanguageChecker(path_to_eng_dicts, path_to_non_eng_dicts)
+    if args.shared_artifacts:
+        # the word set is memory-mapped, so only its path is pickled to the workers with each task
+        language_checker = LanguageChecker.with_word_set(
+            artifacts.get_non_eng_word_set(args.artifacts_dir, path_to_eng_dicts, path_to_non_eng_dicts))
+    else:
+        language_checker = LanguageChecker(path_to_eng_dicts, path_to_non_eng_dicts)
     dao = DAO()
     ALWAYS_REWRITE = False
 
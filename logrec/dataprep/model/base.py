@@ -0,0 +1,78 @@
+from typing import Tuple
+
+CACHE_SLOT_SUFFIX = '_cache'
+
+# names of the slots of each model class including the slots of its bases, except for the cache slots
+_slot_names = {}
+
+
+def get_slot_names(cls) -> Tuple[str, ...]:
+    names = _slot_names.get(cls)
+    if names is None:
+        names = tuple(name for klass in reversed(cls.__mro__) for name in klass.__dict__.get('__slots__', ())
+                      if not name.endswith(CACHE_SLOT_SUFFIX))
+        _slot_names[cls] = names
+    return names
+
+
+class SlottedObject(object):
+    """
+    Base of the model classes. They declare `__slots__`, so that their instances do not carry a `__dict__`.
+
+    An instance is pickled as the tuple of the values of its slots, except for the slots whose names end
+    with `_cache`, which hold values computed from the other slots. Instances pickled before the classes had
+    `__slots__` have their `__dict__` as the pickled state, so `__setstate__` accepts a dict as well.
+    """
+    __slots__ = ()
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in get_slot_names(self.__class__))
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            for name, value in state.items():
+                object.__setattr__(self, name, value)
+        else:
+            for name, value in zip(get_slot_names(self.__class__), state):
+                object.__setattr__(self, name, value)
+
+
+class Immutable(SlottedObject):
+    """
+    Base of the model classes whose instances cannot be changed once they are created (their slots are set
+    with `object.__setattr__` in `__init__`). They are hashable and can cache values computed from their state
+    in `_cache` slots.
+    """
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+
+class Flyweight(Immutable):
+    """
+    Base of the classes without state: all the instances of such a class are the same object,
+    which is also what they are unpickled to.
+    """
+    __slots__ = ()
+
+    _instances = {}
+
+    def __new__(cls):
+        instance = Flyweight._instances.get(cls)
+        if instance is None:
+            instance = super().__new__(cls)
+            Flyweight._instances[cls] = instance
+        return instance
+
+    def __getstate__(self):
+        return None
+
+    def __eq__(self, other):
+        return other.__class__ == self.__class__
+
+    def __hash__(self):
+        return hash(self.__class__)
@@ -1,11 +1,11 @@
 from typing import List
 
+from logrec.dataprep.model.base import Flyweight
 from logrec.dataprep.preprocessors.repr import ReprConfig
 
 
-class SpecialChar(object):
-    def __eq__(self, other):
-        return other.__class__ == self.__class__
+class SpecialChar(Flyweight):
+    __slots__ = ()
 
     def __repr__(self):
         return f'<{self.__class__.__name__}>'
@@ -15,6 +15,8 @@ class SpecialChar(object):
 
 
 class NewLine(SpecialChar):
+    __slots__ = ()
+
     def non_preprocessed_repr(self, repr_config):
         return "\n"
 
@@ -23,6 +25,8 @@ class NewLine(SpecialChar):
 
 
 class Tab(SpecialChar):
+    __slots__ = ()
+
     def non_preprocessed_repr(self, repr_config):
         return "\t"
 
@@ -31,25 +35,35 @@ class Tab(SpecialChar):
 
 
 class Backslash(SpecialChar):
+    __slots__ = ()
+
     def non_preprocessed_repr(self, repr_config):
         return "\\"
 
 
 class Quote(SpecialChar):
+    __slots__ = ()
+
     def non_preprocessed_repr(self, repr_config):
         return "\""
 
 
 class MultilineCommentStart(SpecialChar):
+    __slots__ = ()
+
     def non_preprocessed_repr(self, repr_config):
         return "/*"
 
 
 class MultilineCommentEnd(SpecialChar):
+    __slots__ = ()
+
     def non_preprocessed_repr(self, repr_config):
         return "*/"
 
 
 class OneLineCommentStart(SpecialChar):
+    __slots__ = ()
+
     def non_preprocessed_repr(self, repr_config):
         return "//"
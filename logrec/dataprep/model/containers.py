@@ -1,15 +1,19 @@
 from typing import List
 
+from logrec.dataprep.model.base import SlottedObject, Immutable
 from logrec.dataprep.model.noneng import NonEng, NonEngContent
 from logrec.dataprep.model.placeholders import placeholders
 from logrec.dataprep.model.word import Word
 from logrec.dataprep.preprocessors.repr import torepr, ReprConfig
 
 
-class ProcessableTokenContainer(object):
+class ProcessableTokenContainer(SlottedObject):
+    __slots__ = ('subtokens',)
+
     def __init__(self, subtokens):
         if isinstance(subtokens, list):
-            self.subtokens = subtokens
+            # set this way for the immutable subclasses
+            object.__setattr__(self, 'subtokens', subtokens)
         else:
             raise AssertionError(f"Should be list but is: {subtokens}")
 
@@ -26,20 +30,42 @@ class ProcessableTokenContainer(object):
         return f'{self.__class__.__name__}{self.subtokens}'
 
 
-class SplitContainer(ProcessableTokenContainer):
+class SplitContainer(ProcessableTokenContainer, Immutable):
+    __slots__ = ('_str_cache', '_hash_cache')
+
     def __init__(self, subtokens):
-        super().__init__(subtokens)
+        # a copy, so that the cached string and hash do not change with the list of the caller
+        super().__init__(subtokens[:] if isinstance(subtokens, list) else subtokens)
+
+    def add(self, token):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
 
     def empty_repr(self):
         return self.subtokens
 
     def __str__(self):
-        return self.non_preprocessed_repr(ReprConfig.empty())
+        try:
+            return self._str_cache
+        except AttributeError:
+            s = "".join(map(lambda s: torepr(s, ReprConfig.empty())[0], self.subtokens))
+            object.__setattr__(self, '_str_cache', s)
+            return s
 
     def __repr__(self):
         return f'{self.__class__.__name__}{self.subtokens}'
 
+    def __hash__(self):
+        try:
+            return self._hash_cache
+        except AttributeError:
+            h = hash((self.__class__, tuple(self.subtokens)))
+            object.__setattr__(self, '_hash_cache', h)
+            return h
+
     def non_preprocessed_repr(self, repr_config):
+        if Word not in repr_config.types_to_be_repr and NonEng not in repr_config.types_to_be_repr:
+            # subtokens are represented as they are
+            return str(self)
         # TODO refactor
         return "".join(map(lambda s: torepr(s, repr_config)[0], self.subtokens))
         # return "".join(map(lambda s: s.non_preprocessed_repr(repr_config) if isinstance(s, NonEng) else str(s), self.subtokens))
@@ -60,6 +86,8 @@ class SplitContainer(ProcessableTokenContainer):
 
 
 class TextContainer(ProcessableTokenContainer):
+    __slots__ = ('non_eng_percent', 'non_eng_qty')
+
     def __str__(self):
         return " ".join([str(s) for s in self.non_preprocessed_repr(ReprConfig.empty())])
 
@@ -76,8 +104,12 @@ class TextContainer(ProcessableTokenContainer):
     def __repr__(self):
         return f'{self.__class__.__name__}{self.subtokens} %={self.non_eng_percent} N={self.non_eng_qty}'
 
+    @staticmethod
+    def is_non_eng_content(non_eng_percent, non_eng_qty):
+        return non_eng_percent > 0.2 and non_eng_qty >= 4
+
     def has_non_eng_content(self):
-        return self.non_eng_percent > 0.2 and self.non_eng_qty >= 4
+        return TextContainer.is_non_eng_content(self.non_eng_percent, self.non_eng_qty)
 
     def __eq__(self, other):
         return self.__class__ == other.__class__ and self.subtokens == other.subtokens and self.non_eng_percent == other.non_eng_percent and \
@@ -85,6 +117,8 @@ class TextContainer(ProcessableTokenContainer):
 
 
 class OneLineComment(TextContainer):
+    __slots__ = ()
+
     def __init__(self, tokens):
         super().__init__(tokens)
 
@@ -99,6 +133,8 @@ class OneLineComment(TextContainer):
 
 
 class MultilineComment(TextContainer):
+    __slots__ = ()
+
     def __init__(self, tokens):
         super().__init__(tokens)
 
@@ -113,6 +149,8 @@ class MultilineComment(TextContainer):
 
 
 class StringLiteral(TextContainer):
+    __slots__ = ()
+
     def __init__(self, tokens):
         super().__init__(tokens)
 
@@ -1,11 +1,14 @@
 from typing import List
 
+from logrec.dataprep.model.base import SlottedObject
 from logrec.dataprep.model.containers import ProcessableTokenContainer
 from logrec.dataprep.model.placeholders import placeholders
 from logrec.dataprep.preprocessors.repr import torepr
 
 
-class LogLevel(object):
+class LogLevel(SlottedObject):
+    __slots__ = ('_value', '_repr')
+
     def __init__(self, value, repr):
         self._value = value
         self._repr = repr
@@ -19,7 +22,7 @@ class LogLevel(object):
         return self._repr
 
     def __eq__(self, other):
-        return self.__class__ == other.__class__ and self.__dict__ == other.__dict__
+        return self.__class__ == other.__class__ and self._value == other._value and self._repr == other._repr
 
     def __repr__(self):
         return self._repr
@@ -41,7 +44,9 @@ def is_positive_level(level: str) -> bool:
     return level in [placeholders['trace'], placeholders['debug'], placeholders['info']]
 
 
-class LogStatement(object):
+class LogStatement(SlottedObject):
+    __slots__ = ('_object_name', '_method_name', '_level', '_log_content', '_tokens_before_final_semicolon')
+
     def __init__(self, object_name=None, method_name=None, level=None,
                  log_content_token_list=None, tokens_before_final_semicolon=None):
         self._object_name = object_name
@@ -54,6 +59,9 @@ class LogStatement(object):
     def get_log_content_tokens(self):
         return self._log_content.subtokens
 
+    def get_tokens_before_final_semicolon(self):
+        return self._tokens_before_final_semicolon
+
     def set_log_content(self, s):
         self._log_content = LogContent(s)
 
@@ -91,7 +99,10 @@ class LogStatement(object):
         return f'{self.__class__.__name__}({self.object_name}#{self.method_name}({self.level})){self._log_content}{self._tokens_before_final_semicolon}'
 
     def __eq__(self, other):
-        return self.__class__ == other.__class__ and self.__dict__ == other.__dict__
+        return self.__class__ == other.__class__ and self._object_name == other._object_name \
+               and self._method_name == other._method_name and self._level == other._level \
+               and self._log_content == other._log_content \
+               and self._tokens_before_final_semicolon == other._tokens_before_final_semicolon
 
     def __to_repr(self, repr_config) -> List[str]:
         return torepr(self._object_name, repr_config) + ['.'] + \
@@ -109,11 +120,15 @@ class LogStatement(object):
 
 
 class LogContent(ProcessableTokenContainer):
+    __slots__ = ()
+
     def __init__(self, log_content_token_list):
         super().__init__(log_content_token_list)
 
 
 class LoggableBlock(ProcessableTokenContainer):
+    __slots__ = ()
+
     def __init__(self, content):
         super().__init__(content)
 
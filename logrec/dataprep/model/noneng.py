@@ -1,16 +1,19 @@
 from typing import List
 
+from logrec.dataprep.model.base import Immutable
 from logrec.dataprep.model.placeholders import placeholders
 from logrec.dataprep.model.word import Word
 from logrec.dataprep.preprocessors.repr import torepr, ReprConfig
 
 
-class NonEng(object):
+class NonEng(Immutable):
+    __slots__ = ('processable_token',)
+
     def __init__(self, processable_token):
         if not isinstance(processable_token, Word):
             raise ValueError(f"NonEngFullWord excepts FullWord but {type(processable_token)} is passed")
 
-        self.processable_token = processable_token
+        object.__setattr__(self, 'processable_token', processable_token)
 
     def non_preprocessed_repr(self, repr_config):
         return torepr(self.processable_token, repr_config)
@@ -43,6 +46,9 @@ class NonEng(object):
     def __eq__(self, other):
         return self.__class__ == other.__class__ and self.processable_token == other.processable_token
 
+    def __hash__(self):
+        return hash((self.__class__, self.processable_token))
+
 
 class NonEngContent(object):
     pass
@@ -1,24 +1,33 @@
 from typing import List
 
+from logrec.dataprep.model.base import Immutable, Flyweight
 from logrec.dataprep.model.placeholders import placeholders
 from logrec.dataprep.preprocessors.repr import ReprConfig
 from logrec.dataprep.split.ngram import NgramSplittingType, do_ngram_splitting
 
 
-class Number(object):
+class Number(Immutable):
+    __slots__ = ('parts_of_number', '_str_cache')
+
     def __init__(self, parts_of_number):
         if not isinstance(parts_of_number, list):
             raise ValueError(f"Parts of number must be list but is {type(parts_of_number)}")
-        self.parts_of_number = parts_of_number
+        # a copy, so that the cached string does not change with the list of the caller
+        object.__setattr__(self, 'parts_of_number', parts_of_number[:])
 
     def __str__(self):
-        return self.non_preprocessed_repr(ReprConfig.empty())
+        try:
+            return self._str_cache
+        except AttributeError:
+            s = "".join([str(w) for w in self.parts_of_number])
+            object.__setattr__(self, '_str_cache', s)
+            return s
 
     def __repr__(self):
         return f'{self.__class__.__name__}{self.parts_of_number}'
 
     def non_preprocessed_repr(self, repr_config):
-        return "".join([str(w) for w in self.parts_of_number])
+        return str(self)
 
     def preprocessed_repr(self, repr_config) -> List[str]:
         if repr_config.ngram_split_config is None:
@@ -41,16 +50,20 @@ class Number(object):
     def __eq__(self, other):
         return self.__class__ == other.__class__ and self.parts_of_number == other.parts_of_number
 
+    def __hash__(self):
+        return hash((self.__class__, tuple(self.parts_of_number)))
+
+
+class SpecialNumberChar(Flyweight):
+    __slots__ = ()
 
-class SpecialNumberChar(object):
     def __repr__(self):
         return f'{self.__class__.__name__}'
 
-    def __eq__(self, other):
-        return self.__class__ == other.__class__
-
 
 class E(SpecialNumberChar):
+    __slots__ = ()
+
     def __str__(self):
         return self.non_preprocessed_repr(ReprConfig.empty())
 
@@ -59,6 +72,8 @@ class E(SpecialNumberChar):
 
 
 class L(SpecialNumberChar):
+    __slots__ = ()
+
     def __str__(self):
         return self.non_preprocessed_repr(ReprConfig.empty())
 
@@ -67,6 +82,8 @@ class L(SpecialNumberChar):
 
 
 class F(SpecialNumberChar):
+    __slots__ = ()
+
     def __str__(self):
         return self.non_preprocessed_repr(ReprConfig.empty())
 
@@ -75,6 +92,8 @@ class F(SpecialNumberChar):
 
 
 class D(SpecialNumberChar):
+    __slots__ = ()
+
     def __str__(self):
         return self.non_preprocessed_repr(ReprConfig.empty())
 
@@ -83,6 +102,8 @@ class D(SpecialNumberChar):
 
 
 class DecimalPoint(SpecialNumberChar):
+    __slots__ = ()
+
     def __str__(self):
         return self.non_preprocessed_repr(ReprConfig.empty())
 
@@ -91,6 +112,8 @@ class DecimalPoint(SpecialNumberChar):
 
 
 class HexStart(SpecialNumberChar):
+    __slots__ = ()
+
     def __str__(self):
         return self.non_preprocessed_repr(ReprConfig.empty())
 
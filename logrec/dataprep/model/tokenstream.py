@@ -0,0 +1,214 @@
+"""
+Struct-of-arrays representation of a token list, an alternative to the list of token objects.
+
+A token list is flattened the same way as in the parsed bin format (see `logrec.dataprep.parsed_bin`):
+each token becomes a (kind, value) pair, a container becomes its start kind, its flattened subtokens and `Kind.END`.
+The capitalization of a word is a part of its kind, the value is an id of an interned string for string-like tokens
+and a log level code for log statements. The arrays are numpy arrays, so bulk operations (counting,
+changing capitalization) are vectorized, and the representation can be rendered directly without building
+the token objects.
+"""
+from typing import List, Callable, Optional, Set
+
+import numpy as np
+
+from logrec.dataprep.model.containers import TextContainer, OneLineComment, MultilineComment, StringLiteral
+from logrec.dataprep.model.logging import LoggableBlock, LogStatement
+from logrec.dataprep.model.noneng import NonEngContent
+from logrec.dataprep.model.placeholders import placeholders
+from logrec.dataprep.model.word import Word
+from logrec.dataprep.parsed_bin import Kind, StringTable, encode_token_list, decode_token_list, \
+    KIND_TO_CONTAINER, LOG_LEVELS, KIND_TO_CAPITALIZATION
+from logrec.dataprep.preprocessors.repr import torepr, ReprConfig
+
+CONTAINER_KINDS = frozenset(KIND_TO_CONTAINER) | {Kind.LOG_STATEMENT}
+WORD_KINDS = [Kind.WORD_UNDEFINED, Kind.WORD_NONE, Kind.WORD_FIRST_LETTER, Kind.WORD_ALL]
+STRING_KINDS = [Kind.STR, Kind.PARSEABLE] + WORD_KINDS
+
+# class, prefix, suffix and representation of non-english content of text containers,
+# the same as in their `non_preprocessed_repr`
+TEXT_CONTAINERS = {
+    Kind.ONE_LINE_COMMENT: (OneLineComment, ["//"], [placeholders['olc_end']],
+                            ["//", placeholders['non_eng_content'], placeholders['olc_end']]),
+    Kind.MULTILINE_COMMENT: (MultilineComment, ["/*"], ["*/"], ["//", placeholders['non_eng_content']]),
+    Kind.STRING_LITERAL: (StringLiteral, ["\""], ["\""], ["\"", placeholders['non_eng_content'], "\""]),
+}
+
+
+class TokenStream(object):
+    def __init__(self, kinds: np.ndarray, values: np.ndarray, get_string: Callable[[int], str]):
+        """
+        :param kinds: `Kind` codes (uint8)
+        :param values: string ids, log level codes or zeros (uint32)
+        :param get_string: function returning a string by its id
+        """
+        if len(kinds) != len(values):
+            raise ValueError(f'Kinds and values must have the same length: {len(kinds)} != {len(values)}')
+        self.kinds = kinds
+        self.values = values
+        self.get_string = get_string
+        self._ends = None
+
+    @classmethod
+    def from_token_list(cls, token_list: List, string_table: Optional[StringTable] = None) -> 'TokenStream':
+        """
+        :param string_table: table to intern the strings into, can be shared by several streams
+        """
+        string_table = string_table or StringTable()
+        kinds, values = encode_token_list(token_list, string_table)
+        return cls(np.frombuffer(kinds, dtype=np.uint8), np.frombuffer(values, dtype=np.uint32),
+                   string_table.strings.__getitem__)
+
+    def to_token_list(self) -> List:
+        return decode_token_list(self.kinds.tolist(), self.values.tolist(), self.get_string)
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    @property
+    def ends(self) -> np.ndarray:
+        """
+        :return: for each entry the index of the `Kind.END` of the container it starts, for other entries their index
+        """
+        if self._ends is None:
+            ends = np.arange(len(self.kinds))
+            stack = []
+            for i, kind in enumerate(self.kinds.tolist()):
+                if kind in CONTAINER_KINDS:
+                    stack.append(i)
+                elif kind == Kind.END:
+                    ends[stack.pop()] = i
+            if stack:
+                raise ValueError(f'Unterminated containers: {[Kind(self.kinds[i]) for i in stack]}')
+            self._ends = ends
+        return self._ends
+
+    def depths(self) -> np.ndarray:
+        """
+        :return: number of containers each entry is in (an `END` entry is in the container it ends)
+        """
+        opens = np.isin(self.kinds, list(CONTAINER_KINDS)).astype(np.int64)
+        closes = (self.kinds == Kind.END).astype(np.int64)
+        return np.cumsum(opens - closes) - opens + closes
+
+    def top_level_mask(self) -> np.ndarray:
+        return (self.depths() == 0) & (self.kinds != Kind.END)
+
+    def count_kinds(self) -> np.ndarray:
+        """
+        :return: number of entries of each kind, indexed by the kind code
+        """
+        return np.bincount(self.kinds, minlength=max(Kind) + 1)
+
+    def count_strings(self, kinds: List[Kind] = WORD_KINDS) -> np.ndarray:
+        """
+        :return: number of occurrences of each string id in the entries of the given kinds
+        """
+        return np.bincount(self.values[np.isin(self.kinds, kinds)])
+
+    def words(self, lowercase: bool) -> Set[str]:
+        """
+        :return: distinct forms the words are split into subwords from when the stream is rendered
+        (see `Word.preprocessed_repr`): their canonic forms if the words are lowercased, otherwise
+        the forms with their capitalization
+        """
+        word_mask = np.isin(self.kinds, WORD_KINDS)
+        if lowercase:
+            return {self.get_string(value) for value in np.unique(self.values[word_mask]).tolist()}
+        keys = np.unique((self.kinds[word_mask].astype(np.uint64) << np.uint64(32)) |
+                         self.values[word_mask].astype(np.uint64))
+        return {str(Word(self.get_string(key & 0xFFFFFFFF), KIND_TO_CAPITALIZATION[key >> 32]))
+                for key in keys.tolist()}
+
+    def lowercased(self) -> 'TokenStream':
+        """
+        :return: the stream in which the words with the first letter or all the letters capitalized become lowercase
+        """
+        capitalized = (self.kinds == Kind.WORD_FIRST_LETTER) | (self.kinds == Kind.WORD_ALL)
+        return TokenStream(np.where(capitalized, np.uint8(Kind.WORD_NONE), self.kinds).astype(np.uint8),
+                           self.values, self.get_string)
+
+    def to_repr_list(self, repr_config: ReprConfig) -> List[str]:
+        """
+        :return: the same as `to_repr_list` of the token list, rendered without building the objects
+        of the containers with many subtokens. Other tokens are built once per distinct token
+        """
+        return _Renderer(self, repr_config).render(0, len(self.kinds))
+
+
+class _Renderer(object):
+    def __init__(self, token_stream: TokenStream, repr_config: ReprConfig):
+        self.token_stream = token_stream
+        self.kinds = token_stream.kinds.tolist()
+        self.values = token_stream.values.tolist()
+        self.ends = token_stream.ends.tolist()
+        self.repr_config = repr_config
+        # representations of the tokens rendered through their objects, by their flattened form
+        self.cache = {}
+
+    def render(self, start: int, end: int) -> List[str]:
+        result = []
+        kinds, ends = self.kinds, self.ends
+        types_to_be_repr = self.repr_config.types_to_be_repr
+        i = start
+        while i < end:
+            kind = kinds[i]
+            if kind in TEXT_CONTAINERS:
+                clazz, prefix, suffix, non_eng_content = TEXT_CONTAINERS[kind]
+                if clazz in types_to_be_repr:
+                    result.extend(clazz([]).preprocessed_repr(self.repr_config))
+                elif NonEngContent in types_to_be_repr and self._has_non_eng_content(i):
+                    result.extend(non_eng_content)
+                else:
+                    result.extend(prefix)
+                    result.extend(self.render(i + 1, ends[i]))
+                    result.extend(suffix)
+            elif kind == Kind.LOGGABLE_BLOCK:
+                if LoggableBlock in types_to_be_repr:
+                    result.append(placeholders['loggable_block'])
+                    result.extend(self.render(i + 1, ends[i]))
+                    result.append(placeholders['loggable_block_end'])
+                else:
+                    result.extend(self.render(i + 1, ends[i]))
+            elif kind == Kind.LOG_STATEMENT:
+                result.extend(self._render_log_statement(i))
+            else:
+                result.extend(self._render_through_object(i))
+            i = ends[i] + 1
+        return result
+
+    def _children(self, i: int) -> List[int]:
+        children = []
+        child = i + 1
+        while child < self.ends[i]:
+            children.append(child)
+            child = self.ends[child] + 1
+        return children
+
+    def _has_non_eng_content(self, i: int) -> bool:
+        children = self._children(i)
+        non_eng_qty = sum(1 for child in children if self.kinds[child] == Kind.NON_ENG)
+        non_eng_percent = float(non_eng_qty) / len(children) if children else 0.0
+        return TextContainer.is_non_eng_content(non_eng_percent, non_eng_qty)
+
+    def _render_log_statement(self, i: int) -> List[str]:
+        object_name, method_name, log_content, tail = self._children(i)
+        res = self._render_through_object(object_name) + ['.'] + \
+              self._render_through_object(method_name) + ['('] + \
+              self.render(log_content + 1, self.ends[log_content]) + [')'] + \
+              self.render(tail + 1, self.ends[tail]) + [';']
+        if LogStatement in self.repr_config.types_to_be_repr:
+            return [placeholders['log_statement'], str(LOG_LEVELS[self.values[i]])] + res + \
+                   [placeholders['log_statement_end']]
+        return res
+
+    def _render_through_object(self, i: int) -> List[str]:
+        end = self.ends[i] + 1
+        key = (self.kinds[i], self.values[i]) if end == i + 1 \
+            else (tuple(self.kinds[i:end]), tuple(self.values[i:end]))
+        res = self.cache.get(key)
+        if res is None:
+            token, = decode_token_list(self.kinds[i:end], self.values[i:end], self.token_stream.get_string)
+            res = torepr(token, self.repr_config)
+            self.cache[key] = res
+        return res
@@ -1,6 +1,7 @@
 from enum import Enum, auto
 from typing import List
 
+from logrec.dataprep.model.base import Immutable
 from logrec.dataprep.model.chars import SpecialChar
 from logrec.dataprep.model.placeholders import placeholders
 from logrec.dataprep.preprocessors.repr import ReprConfig
@@ -15,21 +16,24 @@ class Capitalization(Enum):
 
 
 class Underscore(SpecialChar):
+    __slots__ = ()
+
     def non_preprocessed_repr(self, repr_config):
         return "_"
 
 
-class Word(object):
+class Word(Immutable):
     """
     Invariants:
     str === str(Word.of(str))
     """
+    __slots__ = ('canonic_form', 'capitalization', '_str_cache')
 
     def __init__(self, canonic_form, capitalization=Capitalization.UNDEFINED):
         Word._check_canonic_form_is_valid(canonic_form)
 
-        self.canonic_form = canonic_form
-        self.capitalization = capitalization
+        object.__setattr__(self, 'canonic_form', canonic_form)
+        object.__setattr__(self, 'capitalization', capitalization)
 
     def get_canonic_form(self):
         return self.canonic_form
@@ -45,7 +49,12 @@ class Word(object):
             raise AssertionError(f"Bad canonic form: {canonic_form}")
 
     def __str__(self):
-        return self.non_preprocessed_repr(ReprConfig.empty())
+        try:
+            return self._str_cache
+        except AttributeError:
+            s = self.__with_preserved_case()
+            object.__setattr__(self, '_str_cache', s)
+            return s
 
     def __with_capitalization_prefixes(self, subwords: List[str]) -> List[str]:
         if self.capitalization == Capitalization.UNDEFINED or self.capitalization == Capitalization.NONE:
@@ -77,7 +86,7 @@ class Word(object):
             raise AssertionError(f"Unknown value: {self.capitalization}")
 
     def non_preprocessed_repr(self, repr_config):
-        return self.__with_preserved_case()
+        return str(self)
 
     def __repr__(self):
         return f'{self.__class__.__name__}({self.canonic_form, self.capitalization})'
@@ -86,6 +95,9 @@ class Word(object):
         return self.__class__ == other.__class__ and self.canonic_form == other.canonic_form \
                and self.capitalization == other.capitalization
 
+    def __hash__(self):
+        return hash((self.canonic_form, self.capitalization))
+
     @classmethod
     def from_(cls, s: str):
         if not s:
@@ -101,15 +113,16 @@ class Word(object):
             return cls(s, Capitalization.UNDEFINED)
 
 
-class ParseableToken(object):
+class ParseableToken(Immutable):
     """
     This class represents parts of input that still needs to be parsed
     """
+    __slots__ = ('val',)
 
     def __init__(self, val):
         if not isinstance(val, str):
             raise ValueError(f"val should be str but is {type(val)}")
-        self.val = val
+        object.__setattr__(self, 'val', val)
 
     def __str__(self):
         return self.val
@@ -119,3 +132,6 @@ class ParseableToken(object):
 
     def __eq__(self, other):
         return self.__class__ == other.__class__ and self.val == other.val
+
+    def __hash__(self):
+        return hash(self.val)
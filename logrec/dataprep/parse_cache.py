@@ -0,0 +1,131 @@
+"""
+Persistent content-addressed cache of preprocessed files.
+
+Entries are keyed by the hash of the file content and live in a directory named after the hash of the preprocessor
+list and of the source code of the preprocessors and the token model, so that the same file vendored into several
+projects or datasets, or unchanged between two snapshots of a dataset, is preprocessed only once, and the entries
+written by an older version of the preprocessors are not used. Bump `CACHE_VERSION` whenever the output
+of the preprocessors changes because of anything else (e.g. the dictionaries).
+
+The size of the cache is kept under a limit by `prune`, which removes the least recently used entries.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import pickle
+from functools import lru_cache
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+DATAPREP_DIR = os.path.dirname(os.path.realpath(__file__))
+
+# modules whose source code determines the output of the preprocessors, relative to `DATAPREP_DIR`
+PREPROCESSOR_SOURCES = ['preprocessors', 'model', os.path.join('lang', 'langchecker.py')]
+
+DEFAULT_MAX_SIZE_MB = 4096
+
+
+def hash_content(lines: List[str]) -> str:
+    h = hashlib.sha1()
+    for line in lines:
+        h.update(line.encode('utf-8', 'surrogatepass'))
+    return h.hexdigest()
+
+
+def hash_sources(base_dir: str, sources: List[str]) -> str:
+    """
+    :param sources: python files and dirs with python files, relative to `base_dir`
+    """
+    h = hashlib.sha1()
+    for source in sources:
+        path = os.path.join(base_dir, source)
+        files = [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith('.py')] \
+            if os.path.isdir(path) else [path]
+        for file in files:
+            h.update(os.path.relpath(file, base_dir).encode())
+            with open(file, 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def hash_preprocessor_sources() -> str:
+    return hash_sources(DATAPREP_DIR, PREPROCESSOR_SOURCES)
+
+
+def hash_preprocessors(preprocessors: List[str]) -> str:
+    return hashlib.sha1(json.dumps({'preprocessors': preprocessors, 'sources': hash_preprocessor_sources(),
+                                    'version': CACHE_VERSION}).encode()).hexdigest()
+
+
+def prune(cache_dir: str, max_size_mb: int = DEFAULT_MAX_SIZE_MB) -> None:
+    """
+    Removes the least recently used entries (of all the preprocessor lists and versions)
+    until the cache takes no more than `max_size_mb` megabytes.
+    """
+    entries = []
+    total_size = 0
+    for root, dirs, files in os.walk(cache_dir):
+        for file in files:
+            path = os.path.join(root, file)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total_size += st.st_size
+    max_size = max_size_mb << 20
+    if total_size <= max_size:
+        return
+    entries.sort()
+    n_removed = 0
+    for _, size, path in entries:
+        if total_size <= max_size:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_size -= size
+        n_removed += 1
+    logger.info(f"Removed {n_removed} least recently used entries from the parse cache {cache_dir}")
+
+
+class ParseCache(object):
+    def __init__(self, cache_dir: str, preprocessors: List[str]):
+        self.path = os.path.join(cache_dir, hash_preprocessors(preprocessors))
+        self.hits = 0
+        self.misses = 0
+
+    def _get_entry_path(self, content_hash: str) -> str:
+        return os.path.join(self.path, content_hash[:2], content_hash)
+
+    def get(self, content_hash: str) -> Optional[List]:
+        path_to_entry = self._get_entry_path(content_hash)
+        try:
+            with gzip.GzipFile(path_to_entry, 'rb') as f:
+                token_list = pickle.load(f)
+            # the modification time is the time of the last use for `prune`
+            os.utime(path_to_entry)
+            self.hits += 1
+            return token_list
+        except FileNotFoundError:
+            pass
+        except (OSError, EOFError, pickle.UnpicklingError) as ex:
+            logger.warning(f"Broken cache entry {path_to_entry}: {ex}")
+        self.misses += 1
+        return None
+
+    def put(self, content_hash: str, token_list: List) -> None:
+        path_to_entry = self._get_entry_path(content_hash)
+        os.makedirs(os.path.dirname(path_to_entry), exist_ok=True)
+        # several workers can be writing the same entry, the last rename wins
+        tmp_path = f'{path_to_entry}.{os.getpid()}'
+        with gzip.GzipFile(tmp_path, 'wb') as f:
+            pickle.dump(token_list, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path_to_entry)
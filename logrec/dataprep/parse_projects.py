@@ -1,78 +1,211 @@
 import argparse
+import codecs
 import gzip
+import io
 import logging
 import os
 import pickle
-import time
+import shutil
+import tracemalloc
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from multiprocessing.pool import Pool
 from pathlib import Path
+from typing import Optional, List
 
 from tqdm import tqdm
 
+from logrec.dataprep import parsed_bin
+from logrec.dataprep.dedup import load_skip_list, run as dedup_dataset
+from logrec.dataprep.parse_cache import ParseCache, hash_content, prune as prune_parse_cache, \
+    DEFAULT_MAX_SIZE_MB as DEFAULT_PARSE_CACHE_MAX_SIZE_MB
 from logrec.dataprep.preprocessors import apply_preprocessors
 from logrec.dataprep.preprocessors.general import from_file
 from logrec.dataprep.prepconfig import PrepParam
 from logrec.dataprep.preprocessors.preprocessor_list import pp_params
 from logrec.infrastructure.fs import FS
-from logrec.properties import DEFAULT_PARSE_PROJECTS_ARGS
+from logrec.properties import DEFAULT_PARSE_PROJECTS_ARGS, DEFAULT_PARSE_CACHE_DIR
 from logrec.util.files import file_mapper
+from logrec.util.profiler import PipelineStats, get_memo_counters
 
 logger = logging.getLogger(__name__)
 
 EXTENSION = "parsed"
 FILENAMES_EXTENSION = "filenames"
+NOT_FINISHED_EXTENSION = "part"
 
+DEFAULT_FILES_PER_BATCH = 500
 
-def read_file_with_encoding(file_path, encoding):
-    with open(file_path, 'r', encoding=encoding) as f:
-        return [line for line in f], file_path
+# formats of the parsed files: gzipped pickles (.parsed) or parsed bin (.parsedbin, see `logrec.dataprep.parsed_bin`)
+PICKLE_FORMAT = 'pickle'
+BIN_FORMAT = 'bin'
+PARSED_FORMATS = [PICKLE_FORMAT, BIN_FORMAT]
 
+STATS_FILENAME = 'preprocessing_stats.json'
 
-def read_file_contents(file_path):
+
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+DEFAULT_READ_AHEAD_THREADS = 4
+DEFAULT_READ_AHEAD_DEPTH = 32
+
+
+def decode_file_contents(content, file_path):
+    """
+    Decodes the bytes read from a file only once: files with a BOM are decoded with the encoding it denotes,
+    otherwise utf-8 is tried and ISO-8859-1 (which can decode any byte sequence) is the fallback.
+    Newlines are translated the same way as when the file is opened in text mode.
+    """
+    for bom, encoding in BOMS:
+        if content.startswith(bom):
+            break
+    else:
+        encoding = 'utf-8'
     try:
-        return read_file_with_encoding(file_path, 'utf-8')
+        text = content.decode(encoding)
     except UnicodeDecodeError:
-        logger.warning(f"Encoding is not utf-8, trying ISO-8859-1")
-        try:
-            return read_file_with_encoding(file_path, 'ISO-8859-1')
-        except UnicodeDecodeError:
-            logger.error(f"Unicode decode error in file: {file_path}")
+        logger.warning(f"Encoding of {file_path} is not {encoding}, trying ISO-8859-1")
+        text = content.decode('ISO-8859-1')
+    return [line for line in io.StringIO(text, newline=None)]
+
+
+def read_file_contents(file_path):
+    try:
+        with open(file_path, 'rb') as f:
+            content = f.read()
+    except OSError as ex:
+        logger.error(f"Cannot read file {file_path}: {ex}")
+        return None
+    return decode_file_contents(content, file_path), file_path
+
+
+def read_ahead(files, n_threads=DEFAULT_READ_AHEAD_THREADS, depth=DEFAULT_READ_AHEAD_DEPTH):
+    """
+    Reads files in background threads so that preprocessing does not wait for the disk.
+    At most `depth` files are read ahead, results are yielded in the order of `files`.
+    """
+    files = iter(files)
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        pending = deque(executor.submit(read_file_contents, file) for file in islice(files, depth))
+        while pending:
+            read_result = pending.popleft().result()
+            for file in islice(files, 1):
+                pending.append(executor.submit(read_file_contents, file))
+            yield read_result
+
 
+def get_batch_file_path(path_to_preprocessed_file, batch_index):
+    return f'{path_to_preprocessed_file}.{NOT_FINISHED_EXTENSION}.{batch_index}'
 
-def preprocess_and_write(params):
+
+def get_parsed_extension(parsed_format: str) -> str:
+    return parsed_bin.EXTENSION if parsed_format == BIN_FORMAT else EXTENSION
+
+
+def keep_existing_parsed_file(path_to_preprocessed_file: str) -> bool:
+    """
+    :return: True if the parsed file already exists and must not be rewritten (see `REWRITE_PARSED_FILE`)
+    """
     from logrec.properties import REWRITE_PARSED_FILE
 
-    src_dir, dest_dir, train_test_valid, project, preprocessing_param_dict = params
-    full_dest_dir = os.path.join(dest_dir, train_test_valid)
-    path_to_preprocessed_file = os.path.join(full_dest_dir, f'{project}.{EXTENSION}')
-    if not os.path.exists(full_dest_dir):
-        os.makedirs(full_dest_dir, exist_ok=True)
-    if not REWRITE_PARSED_FILE and os.path.exists(path_to_preprocessed_file):
-        logger.warning(f"File {path_to_preprocessed_file} already exists! Doing nothing.")
-        return
-    dir_with_files_to_preprocess = os.path.join(src_dir, train_test_valid, project)
-    if not os.path.exists(dir_with_files_to_preprocess):
-        logger.error(f"Path {dir_with_files_to_preprocess} does not exist")
-        exit(2)
-    filenames=[]
-    with gzip.GzipFile(f'{path_to_preprocessed_file}.part', 'wb') as f:
-        total_files = sum(f for f in file_mapper(dir_with_files_to_preprocess, lambda path: 1))
-        logger.info(f"Preprocessing java files from {dir_with_files_to_preprocess}. Files to process: {total_files}")
-        pickle.dump(preprocessing_param_dict, f, pickle.HIGHEST_PROTOCOL)
-        for ind, (lines_from_file, file_path) in enumerate(
-                file_mapper(dir_with_files_to_preprocess, read_file_contents)):
-            if (ind+1) % 100 == 0:
-                logger.info(
-                    f"[{os.path.join(train_test_valid, project)}] Parsed {ind+1} out of {total_files} files ({(ind+1)/float(total_files)*100:.2f}%)")
-            parsed = apply_preprocessors(from_file(lines_from_file), pp_params["preprocessors"], {
-                'interesting_context_words': []
-            })
-            pickle.dump(parsed, f, pickle.HIGHEST_PROTOCOL)
-            filename=os.path.relpath(file_path, start=dir_with_files_to_preprocess)
-            filenames.append(filename)
-
-
-    with open(os.path.join(full_dest_dir, f'.{project}.{FILENAMES_EXTENSION}'), "w") as f:
+    return not REWRITE_PARSED_FILE and os.path.exists(path_to_preprocessed_file)
+
+
+class ParsedBatchWriter(object):
+    """
+    Writes a batch of the preprocessed files of a project to a separate file, the batches are merged
+    in the original order afterwards by `merge_batches`. The format is given by the extension of the parsed file.
+    The first batch of a project in the pickle format also contains the preprocessing param dict,
+    each batch in the parsed bin format has it in the header. Does nothing if the path is not given.
+    """
+    def __init__(self, path_to_preprocessed_file: Optional[str], batch_index: int, preprocessing_param_dict):
+        self.path_to_preprocessed_file = path_to_preprocessed_file
+        self.batch_index = batch_index
+        self.preprocessing_param_dict = preprocessing_param_dict
+
+    def __enter__(self):
+        self.writer, self.handle = None, None
+        if not self.path_to_preprocessed_file:
+            return self
+        path_to_batch_file = get_batch_file_path(self.path_to_preprocessed_file, self.batch_index)
+        if self.path_to_preprocessed_file.endswith(f'.{parsed_bin.EXTENSION}'):
+            self.writer = parsed_bin.ParsedBinWriter(path_to_batch_file, self.preprocessing_param_dict).__enter__()
+        else:
+            self.handle = gzip.GzipFile(path_to_batch_file, 'wb')
+            if self.batch_index == 0:
+                pickle.dump(self.preprocessing_param_dict, self.handle, pickle.HIGHEST_PROTOCOL)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.writer:
+            self.writer.__exit__(exc_type, exc_val, exc_tb)
+        if self.handle:
+            self.handle.close()
+
+    def write(self, token_list: List) -> None:
+        if self.writer:
+            self.writer.write(token_list)
+        elif self.handle:
+            pickle.dump(token_list, self.handle, pickle.HIGHEST_PROTOCOL)
+
+
+def preprocess_batch(params):
+    """
+    Preprocesses a batch of files of one project and writes them to a separate file (see `ParsedBatchWriter`).
+    """
+    dir_with_files_to_preprocess, path_to_preprocessed_file, batch_index, files, preprocessing_param_dict, \
+    parse_cache_dir = params
+    parse_cache = ParseCache(parse_cache_dir, pp_params["preprocessors"]) if parse_cache_dir else None
+    stats = PipelineStats()
+    memo_counters_before = get_memo_counters()
+    filenames = []
+    with ParsedBatchWriter(path_to_preprocessed_file, batch_index, preprocessing_param_dict) as writer:
+        for read_result in read_ahead(files):
+            if read_result is None:
+                continue
+            lines_from_file, file_path = read_result
+            parsed = preprocess_file(lines_from_file, parse_cache, stats)
+            writer.write(parsed)
+            filenames.append(os.path.relpath(file_path, start=dir_with_files_to_preprocess))
+    if parse_cache:
+        logger.debug(f"Batch {batch_index} of {path_to_preprocessed_file}: "
+                     f"{parse_cache.hits} files taken from cache, {parse_cache.misses} preprocessed")
+    stats.add_memo_counters(memo_counters_before, get_memo_counters())
+    return path_to_preprocessed_file, batch_index, filenames, stats
+
+
+def preprocess_file(lines_from_file, parse_cache, stats=None):
+    if stats is not None:
+        stats.counters['files'] += 1
+        stats.counters['lines'] += len(lines_from_file)
+    if parse_cache:
+        content_hash = hash_content(lines_from_file)
+        parsed = parse_cache.get(content_hash)
+        if parsed is not None:
+            if stats is not None:
+                stats.counters['files_from_cache'] += 1
+            return parsed
+    parsed = apply_preprocessors(from_file(lines_from_file), pp_params["preprocessors"], {
+        'interesting_context_words': []
+    }, stats, streaming=True)
+    if parse_cache:
+        parse_cache.put(content_hash, parsed)
+    return parsed
+
+
+def start_tracing_allocations():
+    tracemalloc.start()
+
+
+def write_filenames(path_to_filenames_file, filenames):
+    with open(path_to_filenames_file, "w") as f:
         for filename in filenames:
             try:
                 f.write(f"{filename}\n")
@@ -80,8 +213,79 @@ def preprocess_and_write(params):
                 f.write("<bad encoding>\n")
                 logger.warning("Filename has bad encoding")
 
+
+def concat_batches(path_to_file, n_batches):
+    # gzip members can be concatenated byte-wise, readers see a single stream
+    with open(f'{path_to_file}.{NOT_FINISHED_EXTENSION}', 'wb') as out:
+        for batch_index in range(n_batches):
+            batch_file = get_batch_file_path(path_to_file, batch_index)
+            with open(batch_file, 'rb') as f:
+                shutil.copyfileobj(f, out)
+            os.remove(batch_file)
+
+
+def merge_batches(path_to_preprocessed_file, path_to_filenames_file, filenames_by_batch):
+    write_filenames(path_to_filenames_file, [filename for filenames in filenames_by_batch for filename in filenames])
+
+    if path_to_preprocessed_file.endswith(f'.{parsed_bin.EXTENSION}'):
+        batch_files = [get_batch_file_path(path_to_preprocessed_file, batch_index)
+                       for batch_index in range(len(filenames_by_batch))]
+        if len(batch_files) == 1:
+            os.rename(batch_files[0], path_to_preprocessed_file)
+        else:
+            # the merged file is renamed when it is complete
+            parsed_bin.merge(batch_files, path_to_preprocessed_file)
+            for batch_file in batch_files:
+                os.remove(batch_file)
+        return
+
+    concat_batches(path_to_preprocessed_file, len(filenames_by_batch))
     # remove .part to show that all raw files in this project have been preprocessed
-    os.rename(f'{path_to_preprocessed_file}.part', path_to_preprocessed_file)
+    os.rename(f'{path_to_preprocessed_file}.{NOT_FINISHED_EXTENSION}', path_to_preprocessed_file)
+
+
+class ProjectTask(object):
+    def __init__(self, train_test_valid, project, path_to_preprocessed_file, path_to_filenames_file, n_batches):
+        self.train_test_valid = train_test_valid
+        self.project = project
+        self.path_to_preprocessed_file = path_to_preprocessed_file
+        self.path_to_filenames_file = path_to_filenames_file
+        self.filenames_by_batch = [None] * n_batches
+        self.batches_left = n_batches
+
+    def batch_done(self, batch_index, filenames):
+        self.filenames_by_batch[batch_index] = filenames
+        self.batches_left -= 1
+        return self.batches_left == 0
+
+
+def split_into_batches(files, files_per_batch):
+    if not files:
+        return [[]]
+    return [files[i:i + files_per_batch] for i in range(0, len(files), files_per_batch)]
+
+
+def plan_project(src_dir, dest_dir, train_test_valid, project, preprocessing_param_dict, files_per_batch,
+                 parse_cache_dir, skip_list=frozenset(), parsed_format=PICKLE_FORMAT):
+    full_dest_dir = os.path.join(dest_dir, train_test_valid)
+    path_to_preprocessed_file = os.path.join(full_dest_dir, f'{project}.{get_parsed_extension(parsed_format)}')
+    if not os.path.exists(full_dest_dir):
+        os.makedirs(full_dest_dir, exist_ok=True)
+    if keep_existing_parsed_file(path_to_preprocessed_file):
+        logger.warning(f"File {path_to_preprocessed_file} already exists! Doing nothing.")
+        return None, []
+    dir_with_files_to_preprocess = os.path.join(src_dir, train_test_valid, project)
+    if not os.path.exists(dir_with_files_to_preprocess):
+        logger.error(f"Path {dir_with_files_to_preprocess} does not exist")
+        exit(2)
+    files = [file for file in file_mapper(dir_with_files_to_preprocess, lambda path: path)
+             if os.path.relpath(file, start=src_dir) not in skip_list]
+    batches = split_into_batches(files, files_per_batch)
+    project_task = ProjectTask(train_test_valid, project, path_to_preprocessed_file,
+                               os.path.join(full_dest_dir, f'.{project}.{FILENAMES_EXTENSION}'), len(batches))
+    batch_params = [(dir_with_files_to_preprocess, path_to_preprocessed_file, batch_index, batch,
+                     preprocessing_param_dict, parse_cache_dir) for batch_index, batch in enumerate(batches)]
+    return project_task, batch_params
 
 
 def split_two_last_levels(root):
@@ -89,35 +293,84 @@ def split_two_last_levels(root):
     return os.path.dirname(os.path.dirname(os.path.dirname(root))), Path(root).parts[-2], Path(root).parts[-1]
 
 
-def run(dataset):
+def run(dataset, files_per_batch=DEFAULT_FILES_PER_BATCH, parse_cache_dir=None, dedup=False,
+        trace_allocations=False, parsed_format=PICKLE_FORMAT, parse_cache_max_size_mb=DEFAULT_PARSE_CACHE_MAX_SIZE_MB):
+    """
+    :param parsed_format: one of `PARSED_FORMATS`, the format the preprocessed files are written in
+    :param parse_cache_max_size_mb: the parse cache is pruned to this size after the run
+    """
     fs = FS.for_parse_projects(dataset)
 
+    skip_list = dedup_dataset(dataset) if dedup else load_skip_list(fs.path_to_dataset)
+    if skip_list:
+        logger.info(f"{len(skip_list)} duplicate files will not be preprocessed")
+
     logger.info(f"Getting files from {fs.path_to_raw_dataset}")
     logger.info(f"Writing preprocessed files to {fs.path_to_parsed_dataset}")
+    if parse_cache_dir:
+        logger.info(f"Using parse cache at {parse_cache_dir}")
     preprocessing_types_dict = {k: None for k in PrepParam}
 
     fs.save_pp_params(pp_params)
     fs.save_preprocessing_types(preprocessing_types_dict)
 
-    params = []
-
+    project_tasks = {}
+    planned_projects = []
     for train_test_valid, project in fs.get_raw_projects():
-        params.append(
-            (fs.path_to_raw_dataset, fs.path_to_parsed_dataset, train_test_valid, project, preprocessing_types_dict))
+        project_task, batch_params = plan_project(fs.path_to_raw_dataset, fs.path_to_parsed_dataset,
+                                                  train_test_valid, project, preprocessing_types_dict,
+                                                  files_per_batch, parse_cache_dir, skip_list, parsed_format)
+        if project_task is not None:
+            project_tasks[project_task.path_to_preprocessed_file] = project_task
+            planned_projects.append(batch_params)
+
+    # biggest projects first, so that their batches do not end up in the tail of the run
+    planned_projects.sort(key=lambda batch_params: sum(len(p[3]) for p in batch_params), reverse=True)
+    params = [p for batch_params in planned_projects for p in batch_params]
+    logger.info(f"Projects to preprocess: {len(project_tasks)}, batches: {len(params)}")
+
+    stats = PipelineStats()
+    with Pool(initializer=start_tracing_allocations if trace_allocations else None) as pool:
+        it = pool.imap_unordered(preprocess_batch, params)
+        for path_to_preprocessed_file, batch_index, filenames, batch_stats in tqdm(it, total=len(params)):
+            stats.merge(batch_stats)
+            project_task = project_tasks[path_to_preprocessed_file]
+            if project_task.batch_done(batch_index, filenames):
+                merge_batches(project_task.path_to_preprocessed_file, project_task.path_to_filenames_file,
+                              project_task.filenames_by_batch)
+                logger.info(f"[{os.path.join(project_task.train_test_valid, project_task.project)}] "
+                            f"Preprocessed {sum(map(len, project_task.filenames_by_batch))} files")
+    if parse_cache_dir:
+        prune_parse_cache(parse_cache_dir, parse_cache_max_size_mb)
 
-    files_total = len(params)
-    with Pool() as pool:
-        it = pool.imap_unordered(preprocess_and_write, params)
-        for _ in tqdm(it, total=files_total):
-            pass
+    path_to_stats_file = os.path.join(fs.path_to_parsed_dataset, STATS_FILENAME)
+    stats.dump(path_to_stats_file)
+    logger.info(f"Preprocessing stats are written to {path_to_stats_file}")
 
 
 if __name__ == '__main__':
 
     parser = argparse.ArgumentParser()
     parser.add_argument('dataset', help='dataset name')
+    parser.add_argument('--files-per-batch', type=int, default=DEFAULT_FILES_PER_BATCH,
+                        help='big projects are split into batches of this many files which are preprocessed in parallel')
+    parser.add_argument('--parse-cache-dir', default=DEFAULT_PARSE_CACHE_DIR,
+                        help='directory of the cache of preprocessed files shared between runs and datasets')
+    parser.add_argument('--no-cache', action='store_true', help='preprocess all the files without using the cache')
+    parser.add_argument('--parse-cache-max-size', type=int, default=DEFAULT_PARSE_CACHE_MAX_SIZE_MB,
+                        help='size of the parse cache in megabytes, the least recently used entries '
+                             'are removed after the run')
+    parser.add_argument('--dedup', action='store_true',
+                        help='find duplicate files and write the skip list before preprocessing, '
+                             'otherwise the existing skip list is used if any')
+    parser.add_argument('--trace-allocations', action='store_true',
+                        help='record memory allocated by each preprocessor (slows down preprocessing)')
+    parser.add_argument('--parsed-format', choices=PARSED_FORMATS, default=PICKLE_FORMAT,
+                        help='write gzipped pickles (.parsed) or the parsed bin format (.parsedbin), '
+                             'which is faster to read')
 
     args = parser.parse_known_args(*DEFAULT_PARSE_PROJECTS_ARGS)
     args = args[0]
 
-    run(args.dataset)
+    run(args.dataset, args.files_per_batch, None if args.no_cache else args.parse_cache_dir, args.dedup,
+        args.trace_allocations, args.parsed_format, args.parse_cache_max_size)
@@ -0,0 +1,549 @@
+"""
+Compact, random-access format of parsed projects, an alternative to the gzipped stream of pickled token lists
+written by `parse_projects`.
+
+Every token of a token list is flattened into a (kind, value) pair, containers are written as their start kind,
+the flattened subtokens and an `END` kind. The value is an id in the interned string table for string-like tokens,
+a log level code for log statements and zero otherwise.
+
+File layout (native byte order, which is recorded in the header):
+
+    header
+    for each file: kinds (uint8 * n_tokens), padding to 4 bytes, values (uint32 * n_tokens)
+    string table: utf-8 blob, offsets (uint64 * (n_strings + 1))
+    file index: (kinds offset, values offset, n_tokens) (uint64 * 3 * n_files)
+    pickled preprocessing param dict
+
+The file can be mmap-ed: `ParsedBinReader.token_arrays(k)` gives access to the arrays of file k
+without decoding anything, `ParsedBinReader.token_list(k)` rebuilds the token objects.
+"""
+import argparse
+import gzip
+import logging
+import mmap
+import os
+import pickle
+import struct
+import sys
+from array import array
+from enum import IntEnum
+from multiprocessing.pool import Pool
+from typing import List, Tuple, Optional
+
+import numpy as np
+from tqdm import tqdm
+
+from logrec.dataprep import PARSED_DIR
+from logrec.dataprep.model.chars import NewLine, Tab, Backslash, Quote, MultilineCommentStart, \
+    MultilineCommentEnd, OneLineCommentStart
+from logrec.dataprep.model.containers import SplitContainer, StringLiteral, OneLineComment, MultilineComment
+from logrec.dataprep.model.logging import LogStatement, LoggableBlock, TRACE, DEBUG, INFO, WARN, ERROR, FATAL, \
+    UNKNOWN
+from logrec.dataprep.model.noneng import NonEng
+from logrec.dataprep.model.numeric import Number, HexStart, L, F, D, E, DecimalPoint
+from logrec.dataprep.model.word import Word, ParseableToken, Underscore, Capitalization
+
+logger = logging.getLogger(__name__)
+
+PARSED_EXTENSION = "parsed"
+EXTENSION = "parsedbin"
+NOT_FINISHED_EXTENSION = "part"
+
+MAGIC = b'LRPB'
+VERSION = 1
+
+# magic, version, byteorder, n_files, n_strings,
+# string blob offset, string offsets offset, file index offset, params offset, params length
+HEADER = struct.Struct('<4sIBxxxIIQQQQQ')
+
+
+class Kind(IntEnum):
+    END = 0
+    NONE = 1
+    STR = 2
+    PARSEABLE = 3
+
+    WORD_UNDEFINED = 4
+    WORD_NONE = 5
+    WORD_FIRST_LETTER = 6
+    WORD_ALL = 7
+
+    NEW_LINE = 10
+    TAB = 11
+    BACKSLASH = 12
+    QUOTE = 13
+    MULTILINE_COMMENT_START = 14
+    MULTILINE_COMMENT_END = 15
+    ONE_LINE_COMMENT_START = 16
+    UNDERSCORE = 17
+    HEX_START = 18
+    L = 19
+    F = 20
+    D = 21
+    E = 22
+    DECIMAL_POINT = 23
+
+    # containers, followed by their subtokens and END
+    SPLIT_CONTAINER = 30
+    NUMBER = 31
+    NON_ENG = 32
+    STRING_LITERAL = 33
+    ONE_LINE_COMMENT = 34
+    MULTILINE_COMMENT = 35
+    LOGGABLE_BLOCK = 36
+    LOG_STATEMENT = 37
+    LOG_CONTENT = 38
+    LOG_TAIL = 39
+
+
+CAPITALIZATION_TO_KIND = {
+    Capitalization.UNDEFINED: Kind.WORD_UNDEFINED,
+    Capitalization.NONE: Kind.WORD_NONE,
+    Capitalization.FIRST_LETTER: Kind.WORD_FIRST_LETTER,
+    Capitalization.ALL: Kind.WORD_ALL,
+}
+KIND_TO_CAPITALIZATION = {v: k for k, v in CAPITALIZATION_TO_KIND.items()}
+
+# kinds whose values are ids in the string table
+STRING_KINDS = [Kind.STR, Kind.PARSEABLE] + list(KIND_TO_CAPITALIZATION)
+
+SPECIAL_CHAR_TO_KIND = {
+    NewLine: Kind.NEW_LINE,
+    Tab: Kind.TAB,
+    Backslash: Kind.BACKSLASH,
+    Quote: Kind.QUOTE,
+    MultilineCommentStart: Kind.MULTILINE_COMMENT_START,
+    MultilineCommentEnd: Kind.MULTILINE_COMMENT_END,
+    OneLineCommentStart: Kind.ONE_LINE_COMMENT_START,
+    Underscore: Kind.UNDERSCORE,
+    HexStart: Kind.HEX_START,
+    L: Kind.L,
+    F: Kind.F,
+    D: Kind.D,
+    E: Kind.E,
+    DecimalPoint: Kind.DECIMAL_POINT,
+}
+KIND_TO_SPECIAL_CHAR = {v: k for k, v in SPECIAL_CHAR_TO_KIND.items()}
+
+CONTAINER_TO_KIND = {
+    SplitContainer: (Kind.SPLIT_CONTAINER, lambda t: t.get_subtokens()),
+    Number: (Kind.NUMBER, lambda t: t.parts_of_number),
+    NonEng: (Kind.NON_ENG, lambda t: [t.processable_token]),
+    StringLiteral: (Kind.STRING_LITERAL, lambda t: t.get_subtokens()),
+    OneLineComment: (Kind.ONE_LINE_COMMENT, lambda t: t.get_subtokens()),
+    MultilineComment: (Kind.MULTILINE_COMMENT, lambda t: t.get_subtokens()),
+    LoggableBlock: (Kind.LOGGABLE_BLOCK, lambda t: t.get_subtokens()),
+}
+KIND_TO_CONTAINER = {
+    Kind.SPLIT_CONTAINER: SplitContainer,
+    Kind.NUMBER: Number,
+    Kind.NON_ENG: lambda subtokens: NonEng(subtokens[0]),
+    Kind.STRING_LITERAL: StringLiteral,
+    Kind.ONE_LINE_COMMENT: OneLineComment,
+    Kind.MULTILINE_COMMENT: MultilineComment,
+    Kind.LOGGABLE_BLOCK: LoggableBlock,
+    Kind.LOG_CONTENT: lambda subtokens: subtokens,
+    Kind.LOG_TAIL: lambda subtokens: subtokens,
+}
+
+LOG_LEVELS = [None, TRACE, DEBUG, INFO, WARN, ERROR, FATAL, UNKNOWN]
+
+
+def _level_to_code(level) -> int:
+    for code, lvl in enumerate(LOG_LEVELS):
+        if lvl == level:
+            return code
+    raise ValueError(f'Unknown log level: {level}')
+
+
+class StringTable(object):
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def intern(self, s: str) -> int:
+        string_id = self.ids.get(s)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.ids[s] = string_id
+            self.strings.append(s)
+        return string_id
+
+
+def encode_token(token, kinds: array, values: array, string_table: StringTable) -> None:
+    clazz = type(token)
+    if clazz == str:
+        kinds.append(Kind.STR)
+        values.append(string_table.intern(token))
+    elif clazz == Word:
+        kinds.append(CAPITALIZATION_TO_KIND[token.capitalization])
+        values.append(string_table.intern(token.canonic_form))
+    elif clazz in SPECIAL_CHAR_TO_KIND:
+        kinds.append(SPECIAL_CHAR_TO_KIND[clazz])
+        values.append(0)
+    elif clazz in CONTAINER_TO_KIND:
+        kind, get_subtokens = CONTAINER_TO_KIND[clazz]
+        kinds.append(kind)
+        values.append(0)
+        for subtoken in get_subtokens(token):
+            encode_token(subtoken, kinds, values, string_table)
+        kinds.append(Kind.END)
+        values.append(0)
+    elif clazz == LogStatement:
+        kinds.append(Kind.LOG_STATEMENT)
+        values.append(_level_to_code(token.level))
+        encode_token(token.object_name, kinds, values, string_table)
+        encode_token(token.method_name, kinds, values, string_table)
+        for kind, subtokens in [(Kind.LOG_CONTENT, token.get_log_content_tokens()),
+                                (Kind.LOG_TAIL, token.get_tokens_before_final_semicolon())]:
+            kinds.append(kind)
+            values.append(0)
+            for subtoken in subtokens:
+                encode_token(subtoken, kinds, values, string_table)
+            kinds.append(Kind.END)
+            values.append(0)
+        kinds.append(Kind.END)
+        values.append(0)
+    elif token is None:
+        kinds.append(Kind.NONE)
+        values.append(0)
+    elif clazz == ParseableToken:
+        kinds.append(Kind.PARSEABLE)
+        values.append(string_table.intern(str(token)))
+    else:
+        raise ValueError(f"Don't know how to encode token of type {clazz}: {token}")
+
+
+def encode_token_list(token_list: List, string_table: StringTable) -> Tuple[array, array]:
+    kinds = array('B')
+    values = array('I')
+    for token in token_list:
+        encode_token(token, kinds, values, string_table)
+    return kinds, values
+
+
+def decode_token_list(kinds, values, get_string) -> List:
+    """
+    :param get_string: function returning a string by its id
+    """
+    result = []
+    # each entry: (kind, value, subtokens of the container being built)
+    stack = []
+    current = result
+    for kind, value in zip(kinds, values):
+        if kind == Kind.STR:
+            current.append(get_string(value))
+        elif kind in KIND_TO_CAPITALIZATION:
+            current.append(Word(get_string(value), KIND_TO_CAPITALIZATION[kind]))
+        elif kind in KIND_TO_SPECIAL_CHAR:
+            current.append(KIND_TO_SPECIAL_CHAR[kind]())
+        elif kind == Kind.END:
+            container_kind, container_value, subtokens = stack.pop()
+            current = stack[-1][2] if stack else result
+            if container_kind == Kind.LOG_STATEMENT:
+                object_name, method_name, log_content, tail = subtokens
+                current.append(LogStatement(object_name, method_name, LOG_LEVELS[container_value],
+                                            log_content, tail))
+            else:
+                current.append(KIND_TO_CONTAINER[container_kind](subtokens))
+        elif kind in KIND_TO_CONTAINER or kind == Kind.LOG_STATEMENT:
+            stack.append((kind, value, []))
+            current = stack[-1][2]
+        elif kind == Kind.NONE:
+            current.append(None)
+        elif kind == Kind.PARSEABLE:
+            current.append(ParseableToken(get_string(value)))
+        else:
+            raise ValueError(f'Unknown token kind: {kind}')
+    if stack:
+        raise ValueError(f'Unterminated containers: {[Kind(k) for k, _, _ in stack]}')
+    return result
+
+
+class ParsedBinWriter(object):
+    def __init__(self, dest_file: str, preprocessing_param_dict):
+        self.dest_file = dest_file
+        self.preprocessing_param_dict = preprocessing_param_dict
+        self.string_table = StringTable()
+        self.file_index = array('Q')
+
+    def __enter__(self):
+        self.handle = open(f'{self.dest_file}.{NOT_FINISHED_EXTENSION}', 'wb')
+        self.handle.write(bytes(HEADER.size))
+        return self
+
+    def write(self, token_list: List) -> None:
+        kinds, values = encode_token_list(token_list, self.string_table)
+        self._write_arrays(kinds.tobytes(), values.tobytes(), len(kinds))
+
+    def write_arrays(self, kinds: np.ndarray, values: np.ndarray) -> None:
+        """
+        Writes a token list given as kinds and values whose string ids are already in the string table of the writer
+        """
+        self._write_arrays(kinds.astype(np.uint8).tobytes(), values.astype(np.uint32).tobytes(), len(kinds))
+
+    def _write_arrays(self, kinds: bytes, values: bytes, n_tokens: int) -> None:
+        kinds_offset = self.handle.tell()
+        self.handle.write(kinds)
+        self._align(4)
+        values_offset = self.handle.tell()
+        self.handle.write(values)
+        self.file_index.extend([kinds_offset, values_offset, n_tokens])
+
+    def _align(self, n: int) -> None:
+        padding = -self.handle.tell() % n
+        if padding:
+            self.handle.write(bytes(padding))
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.handle.close()
+            return
+
+        encoded_strings = [s.encode('utf-8', 'surrogatepass') for s in self.string_table.strings]
+        string_offsets = array('Q', [0])
+        for s in encoded_strings:
+            string_offsets.append(string_offsets[-1] + len(s))
+        strings_offset = self.handle.tell()
+        self.handle.write(b''.join(encoded_strings))
+        self._align(string_offsets.itemsize)
+        string_offsets_offset = self.handle.tell()
+        self.handle.write(string_offsets.tobytes())
+        file_index_offset = self.handle.tell()
+        self.handle.write(self.file_index.tobytes())
+        params_offset = self.handle.tell()
+        params = pickle.dumps(self.preprocessing_param_dict, pickle.HIGHEST_PROTOCOL)
+        self.handle.write(params)
+
+        self.handle.seek(0)
+        self.handle.write(HEADER.pack(MAGIC, VERSION, _byteorder_code(), len(self.file_index) // 3,
+                                      len(encoded_strings), strings_offset, string_offsets_offset,
+                                      file_index_offset, params_offset, len(params)))
+        self.handle.close()
+        os.rename(f'{self.dest_file}.{NOT_FINISHED_EXTENSION}', self.dest_file)
+
+
+def _byteorder_code() -> int:
+    return 0 if sys.byteorder == 'little' else 1
+
+
+class ParsedBinReader(object):
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buf = memoryview(self._mm)
+
+        magic, version, byteorder, self.n_files, self.n_strings, strings_offset, string_offsets_offset, \
+        file_index_offset, params_offset, params_length = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a parsed bin file')
+        if version != VERSION:
+            raise ValueError(f'Unsupported version of {path}: {version}, expected: {VERSION}')
+        if byteorder != _byteorder_code():
+            raise ValueError(f'{path} was written on a machine with a different byte order')
+
+        self._strings = self._buf[strings_offset:string_offsets_offset]
+        self._string_offsets = self._buf[string_offsets_offset:
+                                         string_offsets_offset + 8 * (self.n_strings + 1)].cast('Q')
+        self._file_index = self._buf[file_index_offset:file_index_offset + 8 * 3 * self.n_files].cast('Q')
+        self._params = self._buf[params_offset:params_offset + params_length]
+        self._string_cache = {}
+        # token streams which look up strings in the mapped file, it is unmapped when the reader is closed
+        # and all of them are garbage collected
+        self._n_streams = 0
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        self._closed = True
+        if self._n_streams == 0:
+            self._release()
+
+    def _release_stream(self) -> None:
+        self._n_streams -= 1
+        if self._closed and self._n_streams == 0:
+            self._release()
+
+    def _release(self) -> None:
+        for view in [self._strings, self._string_offsets, self._file_index, self._params, self._buf]:
+            view.release()
+        try:
+            self._mm.close()
+        except BufferError:
+            # views returned by `token_arrays()` are still alive,
+            # the file gets unmapped when they are garbage collected
+            pass
+
+    def __len__(self) -> int:
+        return self.n_files
+
+    @property
+    def preprocessing_param_dict(self):
+        return pickle.loads(self._params)
+
+    def string(self, string_id: int) -> str:
+        s = self._string_cache.get(string_id)
+        if s is None:
+            s = bytes(self._strings[self._string_offsets[string_id]:self._string_offsets[string_id + 1]]) \
+                .decode('utf-8', 'surrogatepass')
+            self._string_cache[string_id] = s
+        return s
+
+    def token_arrays(self, k: int) -> Tuple[memoryview, memoryview]:
+        """
+        :return: kinds (uint8) and values (uint32) of the k-th file as views into the mapped file
+        """
+        if not 0 <= k < self.n_files:
+            raise IndexError(f'File index out of range: {k}, number of files: {self.n_files}')
+        kinds_offset, values_offset, n_tokens = self._file_index[3 * k: 3 * k + 3]
+        return self._buf[kinds_offset:kinds_offset + n_tokens], \
+               self._buf[values_offset:values_offset + 4 * n_tokens].cast('I')
+
+    def token_list(self, k: int) -> List:
+        kinds, values = self.token_arrays(k)
+        return decode_token_list(kinds, values, self.string)
+
+    def token_stream(self, k: int):
+        """
+        :return: `TokenStream` of the k-th file backed by the mapped file
+        """
+        from logrec.dataprep.model.tokenstream import TokenStream
+
+        kinds, values = self.token_arrays(k)
+        return TokenStream(np.frombuffer(kinds, dtype=np.uint8), np.frombuffer(values, dtype=np.uint32),
+                           _StreamStrings(self).string)
+
+    def __iter__(self):
+        for k in range(self.n_files):
+            yield self.token_list(k)
+
+
+class _StreamStrings(object):
+    """
+    String lookup of a token stream, keeps the reader from being unmapped until the stream is garbage collected
+    """
+    def __init__(self, reader: ParsedBinReader):
+        self.reader = reader
+        reader._n_streams += 1
+
+    def string(self, string_id: int) -> str:
+        return self.reader.string(string_id)
+
+    def __del__(self):
+        self.reader._release_stream()
+
+
+def iter_token_lists(path_to_parsed_file: str, token_streams: bool = False, start: int = 0,
+                     end: Optional[int] = None):
+    """
+    Yields token lists from a parsed file of any of the supported formats (gzipped pickles or parsed bin)
+
+    :param token_streams: if True, token lists from parsed bin files are yielded as `TokenStream`s
+    backed by the mapped file, without building the token objects
+    :param start: index of the first token list to yield. Parsed bin files are accessed at this index directly,
+    the token lists before it in gzipped pickles have to be read
+    :param end: index after the last token list to yield, None to read until the end of the file
+    """
+    if path_to_parsed_file.endswith(f'.{EXTENSION}'):
+        with ParsedBinReader(path_to_parsed_file) as reader:
+            for k in range(start, len(reader) if end is None else min(end, len(reader))):
+                yield reader.token_stream(k) if token_streams else reader.token_list(k)
+    else:
+        with gzip.GzipFile(path_to_parsed_file, 'rb') as f:
+            pickle.load(f)  # preprocessing param dict
+            k = 0
+            while end is None or k < end:
+                try:
+                    token_list = pickle.load(f)
+                except EOFError:
+                    break
+                if k >= start:
+                    yield token_list
+                k += 1
+
+
+def count_token_lists(path_to_parsed_file: str) -> Optional[int]:
+    """
+    :return: number of token lists in a parsed bin file, None for gzipped pickles, which have to be read to count them
+    """
+    if path_to_parsed_file.endswith(f'.{EXTENSION}'):
+        with ParsedBinReader(path_to_parsed_file) as reader:
+            return len(reader)
+    return None
+
+
+def merge(src_paths: List[str], dest_path: str) -> None:
+    """
+    Writes the token lists of the files one after another into a single file with a common string table,
+    the preprocessing param dict is taken from the first file
+    """
+    with ParsedBinReader(src_paths[0]) as reader:
+        preprocessing_param_dict = reader.preprocessing_param_dict
+    with ParsedBinWriter(dest_path, preprocessing_param_dict) as writer:
+        for src_path in src_paths:
+            with ParsedBinReader(src_path) as reader:
+                mapping = np.array([writer.string_table.intern(reader.string(i)) for i in range(reader.n_strings)],
+                                   dtype=np.uint32)
+                for k in range(len(reader)):
+                    kinds, values = reader.token_arrays(k)
+                    kinds = np.frombuffer(kinds, dtype=np.uint8)
+                    values = np.frombuffer(values, dtype=np.uint32).copy()
+                    string_mask = np.isin(kinds, STRING_KINDS)
+                    values[string_mask] = mapping[values[string_mask]]
+                    writer.write_arrays(kinds, values)
+
+
+def get_bin_path(path_to_parsed_file: str) -> str:
+    return f'{os.path.splitext(path_to_parsed_file)[0]}.{EXTENSION}'
+
+
+def convert(path_to_parsed_file: str) -> str:
+    path_to_bin_file = get_bin_path(path_to_parsed_file)
+    if os.path.exists(path_to_bin_file):
+        logger.warning(f"File {path_to_bin_file} already exists! Doing nothing.")
+        return path_to_bin_file
+    with gzip.GzipFile(path_to_parsed_file, 'rb') as f:
+        preprocessing_param_dict = pickle.load(f)
+        with ParsedBinWriter(path_to_bin_file, preprocessing_param_dict) as writer:
+            while True:
+                try:
+                    writer.write(pickle.load(f))
+                except EOFError:
+                    break
+    return path_to_bin_file
+
+
+def run(dataset: str) -> None:
+    from logrec.properties import DEFAULT_PARSED_DATASETS_DIR
+
+    full_src_dir = os.path.join(DEFAULT_PARSED_DATASETS_DIR, dataset, PARSED_DIR)
+    if not os.path.exists(full_src_dir):
+        logger.error(f"Dir does not exist: {full_src_dir}")
+        exit(3)
+
+    params = []
+    for root, dirs, files in os.walk(full_src_dir):
+        for file in files:
+            if file.endswith(f".{PARSED_EXTENSION}"):
+                params.append(os.path.join(root, file))
+
+    logger.info(f"Converting {len(params)} parsed files from {full_src_dir}")
+    with Pool() as pool:
+        it = pool.imap_unordered(convert, params)
+        for _ in tqdm(it, total=len(params)):
+            pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Converts gzipped .parsed files into the parsed bin format')
+    parser.add_argument('dataset', action='store', help=f'dataset name')
+
+    args = parser.parse_args()
+
+    run(args.dataset)
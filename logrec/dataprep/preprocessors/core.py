@@ -1,9 +1,19 @@
 import importlib
 import logging
+import sys
 import time
+import tracemalloc
+from typing import Optional
+
+from logrec.util.profiler import PipelineStats
 
 logger = logging.getLogger(__name__)
 
+ITER_SUFFIX = '_iter'
+
+resolved_preprocessors = {}
+
+
 def names_to_functions(pp_names):
     pps = []
     for name in pp_names:
@@ -14,21 +24,120 @@ def names_to_functions(pp_names):
     return pps
 
 
-def apply_preprocessors(to_be_processed, preprocessors, context={}):
+def resolve_preprocessors(preprocessors):
+    """
+    Resolves the names of preprocessors only once per process.
+    """
+    if not isinstance(next(iter(preprocessors)), str):
+        return preprocessors
+    key = tuple(preprocessors)
+    if key not in resolved_preprocessors:
+        resolved_preprocessors[key] = names_to_functions(preprocessors)
+    return resolved_preprocessors[key]
+
+
+def get_iter_variant(preprocessor):
+    """
+    :return: the generator version of the preprocessor, which consumes and produces tokens one by one,
+    or None if the preprocessor needs the whole token list at once
+    """
+    return getattr(sys.modules[preprocessor.__module__], preprocessor.__name__ + ITER_SUFFIX, None)
+
+
+def get_preprocessor_name(preprocessor):
+    return f'{preprocessor.__module__.split(".")[-1]}.{preprocessor.__name__}'
+
+
+class TimedIterator(object):
+    """
+    Measures the time spent in producing the items of the wrapped iterator
+    (including the time spent in the iterators it consumes) and counts them.
+    """
+    def __init__(self, it):
+        self.it = it
+        self.elapsed = 0.0
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            item = next(self.it)
+        finally:
+            self.elapsed += time.perf_counter() - start
+        self.count += 1
+        return item
+
+
+def apply_stream(to_be_processed, preprocessors, context, stats: Optional[PipelineStats]):
+    """
+    Chains the generator versions of preprocessors, so that no intermediate token lists are created.
+    """
+    if stats is None:
+        it = iter(to_be_processed)
+        for preprocessor in preprocessors:
+            it = get_iter_variant(preprocessor)(it, context)
+        return list(it)
+
+    timed_iterators = [TimedIterator(iter(to_be_processed))]
+    for preprocessor in preprocessors:
+        timed_iterators.append(TimedIterator(get_iter_variant(preprocessor)(timed_iterators[-1], context)))
+    result = list(timed_iterators[-1])
+    for preprocessor, upstream, timed_iterator in zip(preprocessors, timed_iterators, timed_iterators[1:]):
+        stats.record(get_preprocessor_name(preprocessor), timed_iterator.elapsed - upstream.elapsed,
+                     upstream.count, timed_iterator.count)
+    return result
+
+
+def apply_preprocessor(to_be_processed, preprocessor, context, stats: Optional[PipelineStats]):
+    tokens_in = len(to_be_processed) if stats is not None else 0
+    trace_allocations = stats is not None and tracemalloc.is_tracing()
+    if trace_allocations:
+        allocated_before, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    preprocessor_output = preprocessor(to_be_processed, context)
+    if isinstance(preprocessor_output, tuple):
+        to_be_processed, add_to_context = preprocessor_output
+        for (k,v) in add_to_context:
+            context[k] = v
+    else:
+        to_be_processed = preprocessor_output
+    elapsed = time.perf_counter() - start
+    if stats is not None:
+        allocated = tracemalloc.get_traced_memory()[0] - allocated_before if trace_allocations else None
+        stats.record(get_preprocessor_name(preprocessor), elapsed, tokens_in, len(to_be_processed), allocated)
+    if elapsed >= 1:
+        logger.debug(f"{preprocessor}: {elapsed:.3f}s")
+    return to_be_processed
+
+
+def apply_preprocessors(to_be_processed, preprocessors, context={}, stats: Optional[PipelineStats] = None,
+                        streaming: bool = False):
+    """
+    :param stats: if given, time, number of tokens before and after and, if tracemalloc is tracing,
+    allocated memory are recorded for each preprocessor
+    :param streaming: if True, consecutive preprocessors that have a generator version (`<name>_iter`)
+    are chained without materializing intermediate lists; allocations are not recorded for them
+    """
     if not preprocessors:
         return to_be_processed
-    if isinstance(next(iter(preprocessors)), str):
-        preprocessors = names_to_functions(preprocessors)
+    preprocessors = resolve_preprocessors(preprocessors)
+    if not streaming:
+        for preprocessor in preprocessors:
+            to_be_processed = apply_preprocessor(to_be_processed, preprocessor, context, stats)
+        return to_be_processed
+
+    chain = []
     for preprocessor in preprocessors:
-        start = time.time()
-        preprocessor_output = preprocessor(to_be_processed, context)
-        if isinstance(preprocessor_output, tuple):
-            to_be_processed, add_to_context = preprocessor_output
-            for (k,v) in add_to_context:
-                context[k] = v
-        else:
-            to_be_processed = preprocessor_output
-        t = int(time.time() - start)
-        if t > 0:
-            logger.debug(f"{preprocessor}: {t}s")
-    return to_be_processed
\ No newline at end of file
+        if get_iter_variant(preprocessor):
+            chain.append(preprocessor)
+            continue
+        if chain:
+            to_be_processed = apply_stream(to_be_processed, chain, context, stats)
+            chain = []
+        to_be_processed = apply_preprocessor(to_be_processed, preprocessor, context, stats)
+    if chain:
+        to_be_processed = apply_stream(to_be_processed, chain, context, stats)
+    return to_be_processed
@@ -1,4 +1,3 @@
-import itertools
 import logging
 import re
 
@@ -9,7 +8,6 @@ from logrec.dataprep.preprocessors import java
 from logrec.dataprep.model.chars import NewLine, MultilineCommentEnd, MultilineCommentStart, \
     OneLineCommentStart, Quote, Backslash, Tab
 from logrec.dataprep.model.placeholders import placeholders
-from logrec.dataprep.util import create_regex_from_token_list
 
 logger = logging.getLogger(__name__)
 
@@ -28,18 +26,22 @@ def from_list(lst):
 ###############   Multitoken list level   ###########
 
 
-def replace_4whitespaces_with_tabs(token_list, context):
-    result = []
+FOUR_WHITESPACES_REGEX = re.compile("( {4})")
+
+
+def replace_4whitespaces_with_tabs_iter(token_list, context):
     for token in token_list:
         if isinstance(token, ParseableToken):
-            split_line = re.split("( {4})", str(token))
-            result.extend([(Tab() if w == " " * 4 else ParseableToken(w)) for w in split_line])
+            for w in FOUR_WHITESPACES_REGEX.split(str(token)):
+                yield Tab() if w == " " * 4 else ParseableToken(w)
         elif isinstance(token, ProcessableTokenContainer):
-            for subtoken in token.get_subtokens():
-                result.extend(replace_4whitespaces_with_tabs(subtoken))
+            yield from replace_4whitespaces_with_tabs_iter(token.get_subtokens(), context)
         else:
-            result.append(token)
-    return result
+            yield token
+
+
+def replace_4whitespaces_with_tabs(token_list, context):
+    return list(replace_4whitespaces_with_tabs_iter(token_list, context))
 
 
 def to_token_list(tokens):
@@ -49,70 +51,67 @@ def to_human_readable(tokens, context):
     return " ".join(map(lambda t : str(t),tokens)) + "\n"
 
 
-def spl(token_list, multiline_comments_tokens, two_char_delimiters, one_char_delimiters):
-    multiline_comments_regex = create_regex_from_token_list(multiline_comments_tokens)
-    two_char_regex = create_regex_from_token_list(two_char_delimiters)
-    one_char_regex = create_regex_from_token_list(one_char_delimiters)
+characters = set(java.multiline_comments_tokens + java.two_character_tokens + java.two_char_verbose + java.one_character_tokens + java.one_char_verbose)
 
-    split_nested_list = list(map(
-        lambda token: split_to_key_words_and_identifiers(token, multiline_comments_regex,
-                                                         two_char_regex, one_char_regex,
-                                                         java.delimiters_to_drop_verbose), token_list))
-    return [w for lst in split_nested_list for w in lst]
+raw_str_to_special_char = {
+    "/*": MultilineCommentStart,
+    "*/": MultilineCommentEnd,
+    "//": OneLineCommentStart,
+    "\"": Quote,
+    "\\": Backslash,
+    "\t": Tab,
+}
 
-def spl_verbose(token_list, context):
+
+def create_master_lexer():
     '''
-    doesn't remove such tokens as tabs, newlines, brackets
+    Builds a single regex which splits a line the same way as the cascade of splits in `legacy.spl`
+    with the verbose delimiters:
+    multiline comment tokens are split off first, so the two-char tokens that end with the first char of
+    a comment token (`//*`, `**/`) must give way to it; spaces are dropped (the group does not match)
+    and all the other chars form identifiers.
     '''
-    return spl(token_list,
-               java.multiline_comments_tokens,
-               java.two_character_tokens + java.two_char_verbose,
-               java.one_character_tokens + java.one_char_verbose)
+    one_char_tokens = java.one_character_tokens + java.one_char_verbose
+    two_char_tokens = [re.escape(t) + ('(?![*])' if t == '//' else '(?!/)' if t == '**' else '')
+                       for t in java.two_character_tokens]
+    not_identifier_chars = ''.join(map(re.escape, sorted(set(one_char_tokens + java.two_char_verbose + [" "]))))
+    return re.compile('(' + '|'.join(list(map(re.escape, java.multiline_comments_tokens))
+                                     + two_char_tokens
+                                     + list(map(re.escape, java.two_char_verbose))
+                                     + [f'[{"".join(map(re.escape, sorted(set(one_char_tokens))))}]',
+                                        f'[^{not_identifier_chars}]+'])
+                      + ')| +')
 
-characters = set(java.multiline_comments_tokens + java.two_character_tokens + java.two_char_verbose + java.one_character_tokens + java.one_char_verbose)
+
+master_lexer = create_master_lexer()
 
 
-def split_to_key_words_and_identifiers(token, multiline_comments_regex,
-                                       two_char_regex, one_char_regex, to_drop):
-    if isinstance(token, ParseableToken):
-        raw_result = []
-        result = []
-        comment_tokens_separated = re.split(multiline_comments_regex, str(token))
-        for st in comment_tokens_separated:
-            if re.fullmatch(multiline_comments_regex, st):
-                raw_result.append(st)
-            else:
-                two_char_tokens_separated = re.split(two_char_regex, st)
-                for st in two_char_tokens_separated:
-                    if re.fullmatch(two_char_regex, st):
-                        raw_result.append(st)
-                    else:
-                        one_char_token_separated = re.split(one_char_regex, st)
-                        raw_result.extend(list(filter(None, itertools.chain.from_iterable(
-                            [re.split(to_drop, st) for st in one_char_token_separated]
-                        ))))
-        for raw_str in raw_result:
-            if not raw_str in characters:
-                result.append(ParseableToken(raw_str))
-            elif raw_str == "/*":
-                result.append(MultilineCommentStart())
-            elif raw_str == "*/":
-                result.append(MultilineCommentEnd())
-            elif raw_str == "//":
-                result.append(OneLineCommentStart())
-            elif raw_str == "\"":
-                result.append(Quote())
-            elif raw_str == "\\":
-                result.append(Backslash())
-            elif raw_str == "\t":
-                result.append(Tab())
-            else:
-                result.append(raw_str)
-        return result
-    elif isinstance(token, ProcessableTokenContainer):
-        res = []
-        for subtoken in token.get_subtokens():
-            res.extend(split_to_key_words_and_identifiers(subtoken, multiline_comments_regex, two_char_regex, one_char_regex, to_drop))
-        return res
-    else:
-        return [token]
\ No newline at end of file
+def split_line(line):
+    result = []
+    for raw_str in master_lexer.findall(line):
+        if not raw_str:
+            continue
+        if raw_str not in characters:
+            result.append(ParseableToken(raw_str))
+        elif raw_str in raw_str_to_special_char:
+            result.append(raw_str_to_special_char[raw_str]())
+        else:
+            result.append(raw_str)
+    return result
+
+
+def spl_verbose_iter(token_list, context):
+    for token in token_list:
+        if isinstance(token, ParseableToken):
+            yield from split_line(str(token))
+        elif isinstance(token, ProcessableTokenContainer):
+            yield from spl_verbose_iter(token.get_subtokens(), context)
+        else:
+            yield token
+
+
+def spl_verbose(token_list, context):
+    '''
+    doesn't remove such tokens as tabs, newlines, brackets
+    '''
+    return list(spl_verbose_iter(token_list, context))
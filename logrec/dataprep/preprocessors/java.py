@@ -8,6 +8,7 @@ from logrec.dataprep.model.containers import MultilineComment, OneLineComment, S
 from logrec.dataprep.model.numeric import Number, D, F, L, DecimalPoint, HexStart, E
 from logrec.dataprep.model.placeholders import placeholders
 from logrec.dataprep.model.word import ParseableToken
+from logrec.util.profiler import memoized
 
 logger = logging.getLogger(__name__)
 
@@ -161,7 +162,16 @@ def replace_segments(token_list, segments_to_remove):
         new_token_list.extend(token_list[curr_ind:])
     return new_token_list
 
-def process_comments_and_str_literals(token_list, context):
+def _get_misplaced_symbol_message(token_list, index):
+    return f"{repr(' '.join(list(map(lambda t: str(t),token_list[index-100:index+1]))))}, index: {index}"
+
+
+def find_comment_string_literal_segments(token_list):
+    """
+    :return: segments (start index, end index, container class) of comments and string literals,
+    and the symbol still open at the end of `token_list` with its index (None and -1 if no symbol is open)
+    :raises ValueError: if a string literal is not closed on its line or a multiline comment end has no start
+    """
     comment_string_literal_symbols_locations = find_all_comment_string_literal_symbols(token_list)
     active_symbol, active_symbol_index = None, -1
     segments_to_remove = []
@@ -169,18 +179,14 @@ def process_comments_and_str_literals(token_list, context):
     for index, symbol in comment_string_literal_symbols_locations:
         if active_symbol is None:
             if symbol == END_MULTILINE_COMMENT:
-                logger.warning(
-                    f"{repr(' '.join(list(map(lambda t: str(t),token_list[index-100:index+1]))))}, index: {index}")
-                return token_list
+                raise ValueError(_get_misplaced_symbol_message(token_list, index))
             elif symbol == NEW_LINE:
                 pass
             else:
                 active_symbol, active_symbol_index = symbol, index
         elif active_symbol == QUOTE:
             if symbol == NEW_LINE:
-                logger.warning(
-                    f"{repr(' '.join(list(map(lambda t: str(t),token_list[index-100:index+1]))))}, index: {index}")
-                return token_list
+                raise ValueError(_get_misplaced_symbol_message(token_list, index))
             elif symbol == QUOTE:
                 segments_to_remove.append((active_symbol_index, index, StringLiteral))
                 active_symbol, active_symbol_index = None, -1
@@ -194,6 +200,15 @@ def process_comments_and_str_literals(token_list, context):
                 active_symbol, active_symbol_index = None, -1
         else:
             raise AssertionError(f"Unknown symbol: {active_symbol}")
+    return segments_to_remove, active_symbol, active_symbol_index
+
+
+def process_comments_and_str_literals(token_list, context):
+    try:
+        segments_to_remove, _, _ = find_comment_string_literal_segments(token_list)
+    except ValueError as ex:
+        logger.warning(str(ex))
+        return token_list
     token_list = replace_segments(token_list, segments_to_remove)
     return token_list
 
@@ -219,7 +234,14 @@ def strip_off_identifiers(token_list, context):
     return result
 
 
-def process_number_literal(possible_number):
+NUMBER_LITERAL_CACHE_SIZE = 1 << 14
+
+
+@memoized('java.split_number_literal', NUMBER_LITERAL_CACHE_SIZE)
+def split_number_literal(possible_number):
+    """
+    :return: tuple of parts of the number or None if `possible_number` is not a number
+    """
     if is_number(possible_number) and possible_number not in tabs:
         parts_of_number = []
         if possible_number.startswith('-'):
@@ -244,24 +266,33 @@ def process_number_literal(possible_number):
                 parts_of_number.append(E())
             else:
                 parts_of_number.append(ch)
-        return Number(parts_of_number)
+        return tuple(parts_of_number)
+    else:
+        return None
+
+
+def process_number_literal(possible_number):
+    parts_of_number = split_number_literal(possible_number)
+    if parts_of_number is not None:
+        return Number(list(parts_of_number))
     else:
         return ParseableToken(possible_number)
 
 
-def process_numeric_literals(token_list, context):
-    res = []
+NUMBERS_SEPARATING_REGEX = regex.compile(
+    f'(?:^|(?<=[^[:lower:][:upper:][:digit:]_]))({NUMBER_REGEX})(?![[:lower:][:upper:][:digit:]_.]|$)')
+
+
+def process_numeric_literals_iter(token_list, context):
     for token in token_list:
         if isinstance(token, ParseableToken):
-            numbers_separated = list(
-                filter(None, regex.split(
-                    f'(?:^|(?<=[^[:lower:][:upper:][:digit:]_]))({NUMBER_REGEX})(?![[:lower:][:upper:][:digit:]_.]|$)',
-                    str(token))))
-            for possible_number in numbers_separated:
-               res.append(process_number_literal(possible_number))
+            for possible_number in filter(None, NUMBERS_SEPARATING_REGEX.split(str(token))):
+                yield process_number_literal(possible_number)
         elif isinstance(token, ProcessableTokenContainer):
-            for subtoken in token.get_subtokens():
-                res.extend(process_numeric_literals(subtoken))
+            yield from process_numeric_literals_iter(token.get_subtokens(), context)
         else:
-            res.append(token)
-    return res
+            yield token
+
+
+def process_numeric_literals(token_list, context):
+    return list(process_numeric_literals_iter(token_list, context))
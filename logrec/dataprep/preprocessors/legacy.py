@@ -1,10 +1,16 @@
+import itertools
 import logging
 import re
 
 #################   Multitoken list  level    #######
 from logrec.dataprep.preprocessors import java
-from logrec.dataprep.preprocessors.general import spl, spl_verbose
+from logrec.dataprep.model.chars import MultilineCommentStart, MultilineCommentEnd, OneLineCommentStart, Quote, \
+    Backslash, Tab
+from logrec.dataprep.model.containers import ProcessableTokenContainer
+from logrec.dataprep.model.word import ParseableToken
+from logrec.dataprep.preprocessors.general import spl_verbose, characters
 from logrec.dataprep.model.placeholders import placeholders
+from logrec.dataprep.util import create_regex_from_token_list
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +24,65 @@ def replace_variable_place_holders(multitoken_list):
         res.extend(changed)
     return res
 
+
+def spl(token_list, multiline_comments_tokens, two_char_delimiters, one_char_delimiters):
+    multiline_comments_regex = create_regex_from_token_list(multiline_comments_tokens)
+    two_char_regex = create_regex_from_token_list(two_char_delimiters)
+    one_char_regex = create_regex_from_token_list(one_char_delimiters)
+
+    split_nested_list = list(map(
+        lambda token: split_to_key_words_and_identifiers(token, multiline_comments_regex,
+                                                         two_char_regex, one_char_regex,
+                                                         java.delimiters_to_drop_verbose), token_list))
+    return [w for lst in split_nested_list for w in lst]
+
+
+def split_to_key_words_and_identifiers(token, multiline_comments_regex,
+                                       two_char_regex, one_char_regex, to_drop):
+    if isinstance(token, ParseableToken):
+        raw_result = []
+        result = []
+        comment_tokens_separated = re.split(multiline_comments_regex, str(token))
+        for st in comment_tokens_separated:
+            if re.fullmatch(multiline_comments_regex, st):
+                raw_result.append(st)
+            else:
+                two_char_tokens_separated = re.split(two_char_regex, st)
+                for st in two_char_tokens_separated:
+                    if re.fullmatch(two_char_regex, st):
+                        raw_result.append(st)
+                    else:
+                        one_char_token_separated = re.split(one_char_regex, st)
+                        raw_result.extend(list(filter(None, itertools.chain.from_iterable(
+                            [re.split(to_drop, st) for st in one_char_token_separated]
+                        ))))
+        for raw_str in raw_result:
+            if not raw_str in characters:
+                result.append(ParseableToken(raw_str))
+            elif raw_str == "/*":
+                result.append(MultilineCommentStart())
+            elif raw_str == "*/":
+                result.append(MultilineCommentEnd())
+            elif raw_str == "//":
+                result.append(OneLineCommentStart())
+            elif raw_str == "\"":
+                result.append(Quote())
+            elif raw_str == "\\":
+                result.append(Backslash())
+            elif raw_str == "\t":
+                result.append(Tab())
+            else:
+                result.append(raw_str)
+        return result
+    elif isinstance(token, ProcessableTokenContainer):
+        res = []
+        for subtoken in token.get_subtokens():
+            res.extend(split_to_key_words_and_identifiers(subtoken, multiline_comments_regex, two_char_regex, one_char_regex, to_drop))
+        return res
+    else:
+        return [token]
+
+
 def spl_non_verbose(multitokens, context):
     return spl(multitokens, java.multiline_comments_tokens, java.two_character_tokens, java.one_character_tokens)
 
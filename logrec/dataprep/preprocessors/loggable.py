@@ -3,7 +3,7 @@ from typing import List
 
 from logrec.dataprep.model.containers import SplitContainer
 from logrec.dataprep.model.logging import LoggableBlock
-from logrec.dataprep.model.word import Word
+from logrec.dataprep.model.word import Word, Capitalization
 from logrec.dataprep.prepconfig import PrepConfig
 from logrec.dataprep.split.ngram import NgramSplitConfig
 from logrec.dataprep.to_repr import to_repr
@@ -15,20 +15,25 @@ def to_repr_l(lst):
     return to_repr(PrepConfig.from_encoded_string('000010'), lst,
                    NgramSplitConfig())
 
+
 class State(object):
+    """
+    States hold no data, the block nestedness and the tokens built so far are passed to the handlers,
+    so a single instance of each state is shared (see the constants below the state classes).
+    """
     pass
 
 
 class WaitingForClassDefinition(State):
-    def on_open_bracket(self, block_nestedness: List[int], new_tokens: list) -> (State, list):
+    def on_open_bracket(self, block_nestedness: List[int], new_tokens: list) -> State:
         block_nestedness.append(0)
         new_tokens.append('{')
-        return NonLoggable(), new_tokens
+        return NON_LOGGABLE
 
-    def on_closing_bracket(self, block_nestedness: List[int], new_tokens: list) -> (State, list):
+    def on_closing_bracket(self, block_nestedness: List[int], new_tokens: list) -> State:
         raise ValueError(f"Closing bracket is not possible here: {to_repr_l(new_tokens)}")
 
-    def on_class_declaration(self, block_nestedness: List[int], new_tokens: list, token: str) -> (State, list):
+    def on_class_declaration(self, block_nestedness: List[int], new_tokens: list, token: str) -> State:
         raise ValueError(f"Closing bracket is not possible here: {to_repr_l(new_tokens)}!")
 
 
@@ -37,28 +42,28 @@ class Loggable(State):
         if not block_nestedness or block_nestedness[-1] == 0:
             raise AssertionError(f'Wrong block nestedness at this state: {block_nestedness}')
 
-    def on_open_bracket(self, block_nestedness: List[int], new_tokens: list) -> (State, list):
+    def on_open_bracket(self, block_nestedness: List[int], new_tokens: list) -> State:
         self._check_state_invariant(block_nestedness)
 
         block_nestedness[-1] += 1
         new_tokens[-1].add('{')
-        return Loggable(), new_tokens
+        return LOGGABLE
 
-    def on_closing_bracket(self, block_nestedness: List[int], new_tokens: list) -> (State, list):
+    def on_closing_bracket(self, block_nestedness: List[int], new_tokens: list) -> State:
         self._check_state_invariant(block_nestedness)
 
         block_nestedness[-1] -= 1
         new_tokens[-1].add('}')
         if block_nestedness[-1] > 0:
-            return Loggable(), new_tokens
+            return LOGGABLE
         else:
-            return NonLoggable(), new_tokens
+            return NON_LOGGABLE
 
-    def on_class_declaration(self, block_nestedness: List[int], new_tokens: list, token: str) -> (State, list):
+    def on_class_declaration(self, block_nestedness: List[int], new_tokens: list, token: str) -> State:
         self._check_state_invariant(block_nestedness)
 
         new_tokens.append(token)
-        return WaitingForClassDefinition(), new_tokens
+        return WAITING_FOR_CLASS_DEFINITION
 
 
 class NonLoggable(State):
@@ -66,20 +71,20 @@ class NonLoggable(State):
         if block_nestedness and block_nestedness[-1] > 0:
             raise AssertionError(f'Wrong block nestedness at this state: {block_nestedness}')
 
-    def on_open_bracket(self, block_nestedness: List[int], new_tokens: list) -> (State, list):
+    def on_open_bracket(self, block_nestedness: List[int], new_tokens: list) -> State:
         self._check_state_invariant(block_nestedness)
 
         if not block_nestedness:
             logger.warning(f"Strange location of opening bracket: {to_repr_l(new_tokens[-20:])}")
             block_nestedness.append(0)
             new_tokens.append('{')
-            return NonLoggable(), new_tokens
+            return NON_LOGGABLE
         else:
             block_nestedness[-1] += 1
             new_tokens.append(LoggableBlock(['{']))
-            return Loggable(), new_tokens
+            return LOGGABLE
 
-    def on_closing_bracket(self, block_nestedness: List[int], new_tokens: list) -> (State, list):
+    def on_closing_bracket(self, block_nestedness: List[int], new_tokens: list) -> State:
         self._check_state_invariant(block_nestedness)
 
         if not block_nestedness:
@@ -92,22 +97,40 @@ class NonLoggable(State):
 
         if block_nestedness and block_nestedness[-1] > 0:
             new_tokens.append(LoggableBlock(['}']))
-            return Loggable(), new_tokens
+            return LOGGABLE
         else:
             new_tokens.append('}')
-            return NonLoggable(), new_tokens
+            return NON_LOGGABLE
 
-    def on_class_declaration(self, block_nestedness: List[int], new_tokens: list, token: str) -> (State, list):
+    def on_class_declaration(self, block_nestedness: List[int], new_tokens: list, token: str) -> State:
         self._check_state_invariant(block_nestedness)
 
         new_tokens.append(token)
-        return WaitingForClassDefinition(), new_tokens
+        return WAITING_FOR_CLASS_DEFINITION
+
+
+WAITING_FOR_CLASS_DEFINITION = WaitingForClassDefinition()
+LOGGABLE = Loggable()
+NON_LOGGABLE = NonLoggable()
+
+CLASS_LIKE_KEYWORDS = frozenset(['class', 'enum', 'interface'])
+
+
+def is_class_like_keyword(token: SplitContainer) -> bool:
+    """
+    The same as comparing the token to `SplitContainer([Word.from_(keyword)])` for each of the keywords
+    but without building and structurally comparing the containers.
+    """
+    subtokens = token.subtokens
+    if len(subtokens) != 1:
+        return False
+    word = subtokens[0]
+    return word.__class__ is Word and word.capitalization is Capitalization.NONE \
+           and word.canonic_form in CLASS_LIKE_KEYWORDS
 
 
 def is_class_like_declaration(token, new_tokens):
-    if not token in [SplitContainer([Word.from_('class')]),
-                     SplitContainer([Word.from_('enum')]),
-                     SplitContainer([Word.from_('interface')])]:
+    if token.__class__ is not SplitContainer or not is_class_like_keyword(token):
         return False
 
     if new_tokens:
@@ -118,23 +141,37 @@ def is_class_like_declaration(token, new_tokens):
 
     return True
 
+
+def mark_into(new_tokens: list, token_list, state: State, block_nestedness: List[int]) -> State:
+    """
+    Marks the tokens starting in the given state and appends them to `new_tokens`, which can already contain
+    the tokens marked before (possibly with a loggable block still open), so that a token list can be marked
+    in chunks with the same result as at once.
+
+    :return: the state after the last token
+    :raises ValueError: if brackets do not match
+    """
+    for token in token_list:
+        # only str tokens can be brackets and only split containers can be keywords
+        kind = token.__class__
+        if kind is str and token == '{':
+            state = state.on_open_bracket(block_nestedness, new_tokens)
+        elif kind is str and token == '}':
+            state = state.on_closing_bracket(block_nestedness, new_tokens)
+        elif kind is SplitContainer and is_class_like_declaration(token, new_tokens):
+            state = state.on_class_declaration(block_nestedness, new_tokens, token)
+        elif state is LOGGABLE:
+            new_tokens[-1].add(token)
+        else:
+            new_tokens.append(token)
+    return state
+
+
 def mark(token_list, context):
     new_tokens = []
-    block_nestedness = []
-    state = NonLoggable()
-    for token in token_list:
-        try:
-            if token == '{':
-                state, new_tokens = state.on_open_bracket(block_nestedness, new_tokens)
-            elif token == '}':
-                state, new_tokens = state.on_closing_bracket(block_nestedness, new_tokens)
-            elif is_class_like_declaration(token, new_tokens):
-                state, new_tokens = state.on_class_declaration(block_nestedness, new_tokens, token)
-            elif isinstance(state, Loggable):
-                new_tokens[-1].add(token)
-            else:
-                new_tokens.append(token)
-        except ValueError as ex:
-            logger.warning(ex)
-            return token_list
+    try:
+        mark_into(new_tokens, token_list, NON_LOGGABLE, [])
+    except ValueError as ex:
+        logger.warning(ex)
+        return token_list
     return new_tokens
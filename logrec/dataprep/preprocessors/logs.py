@@ -1,9 +1,11 @@
 import re
-from enum import Enum, auto
+from typing import Tuple, Optional
 
 from logrec.dataprep.model.chars import NewLine, Tab
 from logrec.dataprep.model.containers import SplitContainer
 from logrec.dataprep.model.logging import LogStatement, LogLevel, TRACE, FATAL, ERROR, WARN, INFO, DEBUG, UNKNOWN
+from logrec.dataprep.model.word import Word
+from logrec.util.profiler import memoized
 
 LOGGER_REGEX = re.compile("[Ll]og|LOG|[Ll]ogger|LOGGER")
 
@@ -48,127 +50,144 @@ def get_log_level(token_str: str) -> LogLevel:
 METHOD_REGEX = re.compile(
     f'{TRACE_OPTIONS}|{DEBUG_OPTIONS}|{INFO_OPTIONS}|{WARN_OPTIONS}|{ERROR_OPTIONS}|{FATAL_OPTIONS}')
 
-class SearchResult(Enum):
-    NOT_FOUND = auto()
-    FAILED = auto()
-    IN_PROGRESS = auto()
-    BUILT = auto
+IDENTIFIER_VERDICT_CACHE_SIZE = 1 << 14
 
 
-class LogSearchState(object):
-    pass
+@memoized('logs.identifier_verdict', IDENTIFIER_VERDICT_CACHE_SIZE)
+def get_identifier_verdict(identifier: str) -> Tuple[bool, Optional[LogLevel]]:
+    """
+    :return: whether the identifier can be the name of a logger and the level of the log method it can be the name of
+    (None if it cannot be a log method)
+    """
+    is_logger = bool(LOGGER_REGEX.fullmatch(identifier))
+    level = get_log_level(identifier) if METHOD_REGEX.fullmatch(identifier) else None
+    return is_logger, level
 
 
-class Searching(LogSearchState):
-    def check(self, token):
-        if isinstance(token, SplitContainer) and LOGGER_REGEX.fullmatch(str(token)):
-            return SearchResult.IN_PROGRESS
-        else:
-            return SearchResult.NOT_FOUND
+def identifier_to_str(token: SplitContainer) -> str:
+    subtokens = token.subtokens
+    if len(subtokens) == 1 and subtokens[0].__class__ is Word:
+        # the same as str(token) but without going through torepr, the repr config is not used by words
+        return subtokens[0].non_preprocessed_repr(None)
+    return str(token)
 
-    def action(self, log_statement, token):
-        log_statement.object_name = token
-        return LoggerFound()
 
+# states of the log statement search
+SEARCHING = 0
+LOGGER_FOUND = 1
+DOT_FOUND = 2
+METHOD_FOUND = 3
+IN_BRACKETS = 4
+BRACKETS_CLOSED = 5
 
-class LoggerFound(LogSearchState):
-    def check(self, token):
-        return SearchResult.IN_PROGRESS if token == '.' else SearchResult.FAILED
+# states in which the only token that can continue the log statement is a fixed punctuation token:
+# state -> (expected token, next state)
+PUNCTUATION_TRANSITIONS = {
+    LOGGER_FOUND: ('.', DOT_FOUND),
+    METHOD_FOUND: ('(', IN_BRACKETS),
+}
 
-    def action(self, log_statement, token):
-        return DotFound()
+LOG_CONTENT_LENGTH_LIMIT = 40
 
 
-class DotFound(LogSearchState):
-    def check(self, token):
-        if isinstance(token, SplitContainer) and METHOD_REGEX.fullmatch(str(token)):
-            return SearchResult.IN_PROGRESS
-        else:
-            return SearchResult.FAILED
-
-    def action(self, log_statement: LogStatement, token):
-        log_statement.method_name = token
-        log_statement.level = get_log_level(str(token))
-        return MethodFound()
-
-
-class MethodFound(LogSearchState):
-    def check(self, token):
-        return SearchResult.IN_PROGRESS if token == '(' else SearchResult.FAILED
-
-    def action(self, log_statement, token):
-        return ClosingBracketFinder()
-
-
-class ClosingBracketFinder(LogSearchState):
-    LENGTH_LIMIT = 40
+class LogStatementMarker(object):
+    """
+    Tokens which might be a part of a log statement are held back until it is clear
+    whether the log statement is built or not.
 
+    The state of the search is kept between the calls of `mark_iter`, so a token list can be marked in chunks
+    (e.g. line by line) with the same result as at once. Tokens held back at the end of the last chunk are dropped.
+    """
     def __init__(self):
-        self.brackets_count = 1
-        self.found = False
-        self.current_length = 0
-
-    def check(self, token):
-        self.current_length += 1
-        if self.current_length > ClosingBracketFinder.LENGTH_LIMIT:
-            return SearchResult.FAILED
-        if token == ')':
-            if self.brackets_count == 1:
-                # Found!
-                self.found = True
+        self.suspected_log_tokens = []
+        self.state = SEARCHING
+        self.log_statement = LogStatement()
+        self.brackets_count = 0
+        self.content_length = 0
+
+    def is_clean(self) -> bool:
+        """
+        :return: True if no tokens are held back and the log statement being built has no content left
+        from a failed match, i.e. marking the rest of the tokens gives the same result as with a new marker
+        """
+        return self.state == SEARCHING and not self.log_statement.get_log_content_tokens() \
+               and not self.log_statement.get_tokens_before_final_semicolon()
+
+    def mark_iter(self, token_list):
+        suspected_log_tokens = self.suspected_log_tokens
+        state = self.state
+        log_statement = self.log_statement
+        brackets_count = self.brackets_count
+        content_length = self.content_length
+        for token in token_list:
+            if state == SEARCHING:
+                if isinstance(token, SplitContainer) and get_identifier_verdict(identifier_to_str(token))[0]:
+                    suspected_log_tokens.append(token)
+                    log_statement.object_name = token
+                    state = LOGGER_FOUND
+                else:
+                    yield token
+                continue
+
+            if state in PUNCTUATION_TRANSITIONS:
+                expected_token, next_state = PUNCTUATION_TRANSITIONS[state]
+                failed = token != expected_token
+                if not failed:
+                    state = next_state
+                    brackets_count, content_length = 1, 0
+            elif state == DOT_FOUND:
+                level = get_identifier_verdict(identifier_to_str(token))[1] \
+                    if isinstance(token, SplitContainer) else None
+                failed = level is None
+                if not failed:
+                    log_statement.method_name = token
+                    log_statement.level = level
+                    state = METHOD_FOUND
+            elif state == IN_BRACKETS:
+                content_length += 1
+                failed = content_length > LOG_CONTENT_LENGTH_LIMIT
+                if not failed:
+                    if token == ')':
+                        brackets_count -= 1
+                    elif token == '(':
+                        brackets_count += 1
+                    if brackets_count == 0:
+                        state = BRACKETS_CLOSED
+                    else:
+                        log_statement.add_to_log_content(token)
+            elif state == BRACKETS_CLOSED:
+                if token == ';':
+                    yield log_statement
+                    log_statement = LogStatement()
+                    suspected_log_tokens = []
+                    state = SEARCHING
+                    continue
+                # there can be some tabs or newlines before the semicolon
+                failed = not isinstance(token, (NewLine, Tab))
+                if not failed:
+                    log_statement.add_to_tokens_before_final_semicolon(token)
+            else:
+                raise AssertionError(f'Unknown state: {state}')
+
+            if failed:
+                # in case 'log statement' was found, but later wasn't marked as log statement.
+                # The log statement built so far is not reset, as it has always been
+                state = SEARCHING
+                yield from suspected_log_tokens
+                suspected_log_tokens = []
+                yield token
             else:
-                # there were some opening brackets after log statement start
-                self.brackets_count -= 1
-        elif token == '(':
-            self.brackets_count += 1
-        return SearchResult.IN_PROGRESS
-
-    def action(self, log_statement, token):
-        if not self.found:
-            log_statement.add_to_log_content(token)
-            return self
-        else:
-            return SemicolonFinder()
-
-
-class SemicolonFinder(LogSearchState):
-    def check(self, token):
-        if token == ';':
-            return SearchResult.BUILT
-        elif isinstance(token, NewLine) or isinstance(token, Tab):
-            # there can be some tabs or newlines before the semicolon
-            return SearchResult.IN_PROGRESS
-        else:  # something went wrong, no semicolon
-            return SearchResult.FAILED
-
-    def action(self, log_statement, token):
-        log_statement.add_to_tokens_before_final_semicolon(token)
-        return self
+                suspected_log_tokens.append(token)
+        self.suspected_log_tokens = suspected_log_tokens
+        self.state = state
+        self.log_statement = log_statement
+        self.brackets_count = brackets_count
+        self.content_length = content_length
+
+
+def mark_iter(token_list, context):
+    return LogStatementMarker().mark_iter(token_list)
 
 
 def mark(token_list, context):
-    new_tokens = []
-    suspected_log_tokens = []
-    state = Searching()
-    log_statement = LogStatement()
-    for token in token_list:
-        search_result = state.check(token)
-        if search_result == SearchResult.NOT_FOUND:
-            new_tokens.append(token)
-        elif search_result == SearchResult.IN_PROGRESS:
-            suspected_log_tokens.append(token)
-            state = state.action(log_statement, token)
-        elif search_result == SearchResult.FAILED:
-            state = Searching()
-            new_tokens.extend(suspected_log_tokens)  # in case 'log statement' was found,
-            # but later wasn't marked as log statement
-            suspected_log_tokens = []  # TODO come up with unit-tests that will fail without this line
-            new_tokens.append(token)
-        elif search_result == SearchResult.BUILT:
-            new_tokens.append(log_statement)
-            log_statement = LogStatement()
-            suspected_log_tokens = []
-            state = Searching()
-        else:
-            raise AssertionError()
-    return new_tokens
+    return list(mark_iter(token_list, context))
@@ -1,20 +1,42 @@
 import logging
 
-from logrec.dataprep import path_to_eng_dicts, path_to_non_eng_dicts
+from logrec.dataprep import path_to_eng_dicts, path_to_non_eng_dicts, artifacts
 from logrec.dataprep.lang.langchecker import LanguageChecker
 from logrec.dataprep.model.containers import ProcessableTokenContainer
 from logrec.dataprep.model.logging import LogStatement
 from logrec.dataprep.model.noneng import NonEng
 from logrec.dataprep.model.word import Word
+from logrec.properties import COMPACT_NON_ENG_WORD_SET, DEFAULT_ARTIFACTS_DIR
+from logrec.util.profiler import memoized
 
 logger = logging.getLogger(__name__)
 
-lang_checker = LanguageChecker(path_to_eng_dicts, path_to_non_eng_dicts)
+if COMPACT_NON_ENG_WORD_SET:
+    # built once and memory-mapped by every process importing this module
+    lang_checker = LanguageChecker.with_word_set(
+        artifacts.get_non_eng_word_set(DEFAULT_ARTIFACTS_DIR, path_to_eng_dicts, path_to_non_eng_dicts))
+else:
+    lang_checker = LanguageChecker(path_to_eng_dicts, path_to_non_eng_dicts)
+
+NON_ENG_CACHE_SIZE = 1 << 16
+
+
+@memoized('noneng.is_non_eng', NON_ENG_CACHE_SIZE)
+def is_non_eng(canonic_form: str) -> bool:
+    return lang_checker.is_non_eng(canonic_form)
+
+
+def mark_as_non_eng_if_needed(word, non_eng_class):
+    return non_eng_class(word) if is_non_eng(word.canonic_form) else word
+
+
+def mark_iter(token_list, context):
+    for token in token_list:
+        yield apply_operation_to_token(token, mark_as_non_eng_if_needed)
+
 
 def mark(token_list, context):
-    return [
-        apply_operation_to_token(token, lambda t, c: c(t) if lang_checker.is_non_eng(t.get_canonic_form()) else t)
-        for token in token_list]
+    return list(mark_iter(token_list, context))
 
 
 # TODO merge this with similar function in split.py
@@ -1,42 +1,112 @@
 import logging
-from typing import List
+from typing import List, Tuple, Callable, Type
 
+from logrec.dataprep.model.base import Immutable, Flyweight
 from logrec.dataprep.split.ngram import NgramSplitConfig
+from logrec.util.profiler import memoized
 
 logger = logging.getLogger(__name__)
 
+REPR_CACHE_SIZE = 1 << 16
+
 
 class ReprConfig(object):
+    """
+    The rendering of tokens with a config is memoized, so the config (including its `ngram_split_config`)
+    must not be changed after it has been used.
+    """
+
+    _empty = None
+
     def __init__(self, types_to_be_repr, ngram_split_config, dict_based_non_eng=True, should_lowercase=True):
         self.types_to_be_repr = types_to_be_repr
         self.ngram_split_config = ngram_split_config
         self.dict_based_non_eng = dict_based_non_eng
         self.should_lowercase = should_lowercase
+        # function rendering the tokens of a class, by class
+        self.renderers = {}
 
     @classmethod
     def empty(cls):
-        return cls([], NgramSplitConfig())
+        if cls._empty is None:
+            cls._empty = cls([], NgramSplitConfig())
+        return cls._empty
+
+    def get_renderer(self, clazz: Type) -> Callable:
+        renderer = self.renderers.get(clazz)
+        if renderer is None:
+            renderer = _choose_renderer(clazz, clazz in self.types_to_be_repr)
+            self.renderers[clazz] = renderer
+        return renderer
 
 
 def to_repr_list(token_list, repr_config) -> List[str]:
+    """
+    :param token_list: list of tokens or a `TokenStream`, which is rendered directly from its arrays
+    """
+    if type(token_list) is not list and hasattr(token_list, 'to_repr_list'):
+        return token_list.to_repr_list(repr_config)
     repr_res = []
+    renderers = repr_config.renderers
     for token in token_list:
-        repr_token = torepr(token, repr_config)
-        repr_res.extend(repr_token)
+        clazz = type(token)
+        render = renderers.get(clazz) or repr_config.get_renderer(clazz)
+        repr_res.extend(render(token, repr_config))
     return repr_res
 
 
 def torepr(token, repr_config) -> List[str]:
     clazz = type(token)
+    render = repr_config.renderers.get(clazz) or repr_config.get_renderer(clazz)
+    return render(token, repr_config)
+
+
+def _render_parseable(token, repr_config) -> List[str]:
+    raise AssertionError(f"Parseable token cannot be present in the final parsed model: {token}")
+
+
+def _render_str(token, repr_config) -> List[str]:
+    return [token]
+
+
+def _render_preprocessed(token, repr_config) -> List[str]:
+    return token.preprocessed_repr(repr_config)
+
+
+def _render_non_preprocessed(token, repr_config) -> List[str]:
+    non_prep = token.non_preprocessed_repr(repr_config)
+    return non_prep if isinstance(non_prep, list) else [non_prep]
+
+
+@memoized('repr.torepr', REPR_CACHE_SIZE)
+def _render_memoized(token, repr_config, render) -> Tuple[str, ...]:
+    return tuple(render(token, repr_config))
+
+
+def _memoize(render: Callable) -> Callable:
+    def render_memoized(token, repr_config) -> List[str]:
+        return list(_render_memoized(token, repr_config, render))
+
+    return render_memoized
+
+
+_render_preprocessed_memoized = _memoize(_render_preprocessed)
+_render_non_preprocessed_memoized = _memoize(_render_non_preprocessed)
+
+
+def _choose_renderer(clazz: Type, to_be_repr: bool) -> Callable:
+    """
+    The rendering of immutable tokens (except for flyweights, which are cheap to render) is memoized,
+    so that the tokens which occur many times, e.g. the same identifier, are split only once.
+    """
     if clazz.__name__ == 'ParseableToken':
-        raise AssertionError(f"Parseable token cannot be present in the final parsed model: {token}")
+        return _render_parseable
     if clazz == list:
-        return to_repr_list(token, repr_config)
+        return to_repr_list
     if clazz == str:
-        return [token]
-
-    if clazz in repr_config.types_to_be_repr:
-        return token.preprocessed_repr(repr_config)
+        return _render_str
+    memoize = issubclass(clazz, Immutable) and not issubclass(clazz, Flyweight)
+    if to_be_repr:
+        return _render_preprocessed_memoized if memoize else _render_preprocessed
     else:
-        non_prep = token.non_preprocessed_repr(repr_config)
-        return non_prep if isinstance(non_prep, list) else [non_prep]
+        return _render_non_preprocessed_memoized if memoize else _render_non_preprocessed
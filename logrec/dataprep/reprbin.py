@@ -0,0 +1,288 @@
+"""
+Numericalized, random-access format of repr files, an alternative to the text .repr files written by `to_repr`.
+
+A .repr file has a line of space-separated tokens for each source file of a project. In the repr bin format
+each line is an array of ids in the string table of the file, so the later stages (counting the vocabulary,
+creating the datasets) get the tokens without splitting the lines. The tokens are the same as the ones
+the lines of the .repr file are split into, so `ReprBinReader.line(k)` is the same as the k-th line of the .repr file.
+
+The ids are uint16 if the string table has at most 2^16 strings, uint32 otherwise. The vocabulary of a repr is
+only known after all of its files are written (see `vocabsize`), so each file has its own string table; a stage which
+needs ids in a common vocabulary maps the string table of each file once with `ReprBinReader.remap_ids`.
+
+File layout (native byte order, which is recorded in the header):
+
+    header
+    token ids (uint16 or uint32 * n_tokens), padding to 8 bytes
+    line index: offsets of the lines in the token ids (uint64 * (n_lines + 1))
+    string table: utf-8 blob, padding to 8 bytes, offsets (uint64 * (n_strings + 1))
+"""
+import mmap
+import os
+import struct
+from array import array
+from collections import Counter
+from typing import List, Iterator, Dict, Optional
+
+import numpy as np
+
+from logrec.dataprep.parsed_bin import StringTable, _byteorder_code
+from logrec.dataprep.preprocessors.general import to_token_list
+
+TEXT_EXTENSION = "repr"
+EXTENSION = "reprbin"
+NOT_FINISHED_EXTENSION = "part"
+
+MAGIC = b'LRRB'
+VERSION = 1
+
+# magic, version, byteorder, id size in bytes, n_lines, n_strings, n_tokens,
+# line index offset, string blob offset, string offsets offset
+HEADER = struct.Struct('<4sIBBxxIIQQQQ')
+
+MAX_UINT16_STRINGS = 1 << 16
+
+
+def to_repr_tokens(repr_list: List[str]) -> List[str]:
+    """
+    :return: the tokens the line written to the .repr file for the repr list is split into
+    """
+    return to_token_list(repr_list).rstrip('\n').split(' ')
+
+
+class ReprBinWriter(object):
+    """
+    Writes the file to `path` as it is, the caller is responsible for renaming it when it is complete.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.string_table = StringTable()
+        self.ids = array('I')
+        self.line_index = array('Q', [0])
+
+    def __enter__(self):
+        self.handle = open(self.path, 'wb')
+        return self
+
+    def write(self, repr_list: List[str]) -> None:
+        self.write_tokens(to_repr_tokens(repr_list))
+
+    def write_tokens(self, tokens: List[str]) -> None:
+        intern = self.string_table.intern
+        self.ids.extend([intern(token) for token in tokens])
+        self.line_index.append(len(self.ids))
+
+    def write_ids(self, ids: np.ndarray, line_lengths: np.ndarray) -> None:
+        """
+        Writes lines of ids which are already in the string table of the writer.
+        """
+        self.ids.frombytes(ids.astype(np.uint32).tobytes())
+        self.line_index.extend((np.cumsum(line_lengths, dtype=np.uint64) + self.line_index[-1]).tolist())
+
+    def _align(self, n: int) -> None:
+        padding = -self.handle.tell() % n
+        if padding:
+            self.handle.write(bytes(padding))
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.handle.close()
+            return
+
+        strings = self.string_table.strings
+        id_type = np.uint16 if len(strings) <= MAX_UINT16_STRINGS else np.uint32
+        self.handle.write(bytes(HEADER.size))
+        self.handle.write(np.frombuffer(self.ids, dtype=np.uint32).astype(id_type).tobytes())
+        self._align(8)
+        line_index_offset = self.handle.tell()
+        self.handle.write(self.line_index.tobytes())
+
+        encoded_strings = [s.encode('utf-8', 'surrogatepass') for s in strings]
+        string_offsets = array('Q', [0])
+        for s in encoded_strings:
+            string_offsets.append(string_offsets[-1] + len(s))
+        strings_offset = self.handle.tell()
+        self.handle.write(b''.join(encoded_strings))
+        self._align(8)
+        string_offsets_offset = self.handle.tell()
+        self.handle.write(string_offsets.tobytes())
+
+        self.handle.seek(0)
+        self.handle.write(HEADER.pack(MAGIC, VERSION, _byteorder_code(), np.dtype(id_type).itemsize,
+                                      len(self.line_index) - 1, len(strings), len(self.ids),
+                                      line_index_offset, strings_offset, string_offsets_offset))
+        self.handle.close()
+
+
+class ReprBinReader(object):
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, byteorder, id_size, self.n_lines, self.n_strings, n_tokens, line_index_offset, \
+        strings_offset, string_offsets_offset = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a repr bin file')
+        if version != VERSION:
+            raise ValueError(f'Unsupported version of {path}: {version}, expected: {VERSION}')
+        if byteorder != _byteorder_code():
+            raise ValueError(f'{path} was written on a machine with a different byte order')
+
+        self._ids = np.frombuffer(self._mm, dtype=np.uint16 if id_size == 2 else np.uint32, count=n_tokens,
+                                  offset=HEADER.size)
+        self._line_index = np.frombuffer(self._mm, dtype=np.uint64, count=self.n_lines + 1, offset=line_index_offset)
+        self._strings_blob = self._mm[strings_offset:string_offsets_offset]
+        self._string_offsets = np.frombuffer(self._mm, dtype=np.uint64, count=self.n_strings + 1,
+                                             offset=string_offsets_offset).tolist()
+        self._strings = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        self._ids = self._line_index = None
+        try:
+            self._mm.close()
+        except BufferError:
+            # arrays returned by `token_ids()` are still alive,
+            # the file gets unmapped when they are garbage collected
+            pass
+
+    def __len__(self) -> int:
+        return self.n_lines
+
+    @property
+    def strings(self) -> List[str]:
+        """
+        :return: the string table of the file, decoded on the first access
+        """
+        if self._strings is None:
+            offsets = self._string_offsets
+            self._strings = [self._strings_blob[offsets[i]:offsets[i + 1]].decode('utf-8', 'surrogatepass')
+                             for i in range(self.n_strings)]
+        return self._strings
+
+    def all_token_ids(self) -> np.ndarray:
+        """
+        :return: ids of the tokens of all the lines as a view into the mapped file
+        """
+        return self._ids
+
+    def line_lengths(self) -> np.ndarray:
+        return np.diff(self._line_index)
+
+    def token_ids(self, k: int) -> np.ndarray:
+        """
+        :return: ids of the tokens of the k-th line as a view into the mapped file
+        """
+        if not 0 <= k < self.n_lines:
+            raise IndexError(f'Line index out of range: {k}, number of lines: {self.n_lines}')
+        return self._ids[int(self._line_index[k]):int(self._line_index[k + 1])]
+
+    def tokens(self, k: int) -> List[str]:
+        strings = self.strings
+        return [strings[i] for i in self.token_ids(k).tolist()]
+
+    def line(self, k: int) -> str:
+        """
+        :return: the k-th line of the corresponding .repr file
+        """
+        return ' '.join(self.tokens(k)) + '\n'
+
+    def __iter__(self) -> Iterator[List[str]]:
+        for k in range(self.n_lines):
+            yield self.tokens(k)
+
+    def count_tokens(self) -> Counter:
+        """
+        :return: number of occurrences of each token in the file
+        """
+        counts = np.bincount(self._ids, minlength=self.n_strings).tolist()
+        return Counter({s: c for s, c in zip(self.strings, counts) if c})
+
+    def remap_ids(self, vocab: Dict[str, int], unk_id: int) -> np.ndarray:
+        """
+        :return: ids of the tokens of all the lines in the given vocabulary, `unk_id` for the tokens not in it
+        """
+        mapping = np.array([vocab.get(s, unk_id) for s in self.strings], dtype=np.int64)
+        return mapping[self._ids] if len(mapping) else np.zeros(len(self._ids), dtype=np.int64)
+
+
+def merge(src_paths: List[str], dest_path: str) -> None:
+    """
+    Writes the lines of the files one after another into a single file with a common string table.
+    """
+    with ReprBinWriter(dest_path) as writer:
+        for src_path in src_paths:
+            with ReprBinReader(src_path) as reader:
+                mapping = np.array([writer.string_table.intern(s) for s in reader.strings], dtype=np.uint32)
+                ids = mapping[reader.all_token_ids()] if len(mapping) else np.zeros(0, dtype=np.uint32)
+                writer.write_ids(ids, reader.line_lengths())
+
+
+def get_bin_path(path_to_repr_file: str) -> str:
+    return f'{os.path.splitext(path_to_repr_file)[0]}.{EXTENSION}'
+
+
+def is_repr_file(path: str) -> bool:
+    return path.endswith(f'.{TEXT_EXTENSION}') or path.endswith(f'.{EXTENSION}')
+
+
+def has_bin_version(file: str, files) -> bool:
+    """
+    :param files: names or paths of files, given in the same form as `file`
+    :return: True if the file is a text repr file and the same repr in the repr bin format is among the files,
+    in which case only the latter, faster to read, has to be read
+    """
+    return file.endswith(f'.{TEXT_EXTENSION}') and get_bin_path(file) in files
+
+
+def iter_repr_files(dir: str) -> Iterator[str]:
+    """
+    Yields paths to the repr files in the dir and its subdirs, a repr in both formats is yielded in the repr bin format
+    """
+    for root, dirs, files in os.walk(dir):
+        for file in files:
+            if is_repr_file(file) and not has_bin_version(file, files):
+                yield os.path.join(root, file)
+
+
+def iter_repr_lines(path: str) -> Iterator[str]:
+    """
+    Yields the lines of a repr file of any of the formats (text or repr bin)
+    """
+    if path.endswith(f'.{EXTENSION}'):
+        with ReprBinReader(path) as reader:
+            for k in range(len(reader)):
+                yield reader.line(k)
+    else:
+        with open(path, 'r') as f:
+            yield from f
+
+
+def iter_repr_tokens(path: str) -> Iterator[List[str]]:
+    """
+    Yields the tokens of the lines of a repr file of any of the formats (text or repr bin)
+    """
+    if path.endswith(f'.{EXTENSION}'):
+        with ReprBinReader(path) as reader:
+            yield from reader
+    else:
+        with open(path, 'r') as f:
+            for line in f:
+                yield line.rstrip('\n').split(' ')
+
+
+def count_repr_tokens(path: str, counter: Optional[Counter] = None) -> Counter:
+    counter = counter if counter is not None else Counter()
+    if path.endswith(f'.{EXTENSION}'):
+        with ReprBinReader(path) as reader:
+            counter.update(reader.count_tokens())
+    else:
+        for tokens in iter_repr_tokens(path):
+            counter.update(tokens)
+    return counter
@@ -0,0 +1,121 @@
+"""
+Persistent cache of bpe encodings of the words which are not in the merges cache of the bpe training vocabulary.
+
+There is a cache file for each list of merges, named after the hash of the merges, so that the words encoded
+when converting one dataset (or its train, test and validation parts) are not encoded again for the others.
+Each line of the file is a word and its space-separated subwords, separated with a tab.
+
+The file is only appended to: every process (e.g. every worker of a pool) keeps the words it has encoded in a buffer
+and appends them with a single write to the file opened with O_APPEND, so the lines written by several processes
+are not interleaved. A word encoded by several processes at the same time is written several times; such duplicates
+are removed by rewriting the file when it is loaded. A line which is not complete (the process was killed
+during the write) is skipped when the file is loaded.
+
+Only the last `max_size` encodings read or added are kept in memory of each process, repeated encodings of the same
+word are also memoized by `logrec.dataprep.split.ngram`.
+"""
+import hashlib
+import itertools
+import logging
+import os
+import re
+from typing import Dict, Tuple, List, Optional, Iterable
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+EXTENSION = "txt"
+
+# number of new encodings kept in memory before they are appended to the file
+DEFAULT_FLUSH_EVERY = 1000
+
+# number of encodings kept in memory
+DEFAULT_MAX_SIZE = 1 << 18
+
+WHITESPACE = re.compile(r'\s')
+
+
+def hash_merges(merges: Dict[Tuple[str, str], int]) -> str:
+    h = hashlib.sha1(f'{CACHE_VERSION}\n'.encode())
+    for (first, second), _ in sorted(merges.items(), key=lambda m: m[1]):
+        h.update(f'{first} {second}\n'.encode('utf-8', 'surrogatepass'))
+    return h.hexdigest()
+
+
+class BpeCache(object):
+    def __init__(self, cache_dir: str, merges: Dict[Tuple[str, str], int], flush_every: int = DEFAULT_FLUSH_EVERY,
+                 max_size: int = DEFAULT_MAX_SIZE):
+        self.path = os.path.join(cache_dir, f'{hash_merges(merges)}.{EXTENSION}')
+        self.flush_every = flush_every
+        self.max_size = max_size
+        self.subwords: Dict[str, List[str]] = {}
+        self.pending: List[str] = []
+        os.makedirs(cache_dir, exist_ok=True)
+        self.load()
+
+    def load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        lines = {}
+        n_lines = 0
+        with open(self.path, 'r', encoding='utf-8', errors='surrogatepass', newline='\n') as f:
+            for line in f:
+                n_lines += 1
+                word, tab, subwords = line.partition('\t')
+                if not tab or not line.endswith('\n'):
+                    logger.warning(f"Skipping broken line in bpe cache {self.path}: {line!r}")
+                    continue
+                # re-inserted, so that the words are in the order they were last written
+                lines.pop(word, None)
+                lines[word] = line
+        if n_lines > len(lines):
+            self.compact(lines.values())
+        for line in itertools.islice(lines.values(), max(0, len(lines) - self.max_size), None):
+            word, _, subwords = line.partition('\t')
+            self.subwords[word] = subwords[:-1].split(' ')
+        logger.info(f"Loaded {len(self.subwords)} of {len(lines)} bpe encodings from {self.path}")
+
+    def compact(self, lines: Iterable[str]) -> None:
+        """
+        Rewrites the file with the given lines. The lines appended by other processes in the meantime are lost,
+        their words are encoded again when they are needed.
+        """
+        tmp_path = f'{self.path}.{os.getpid()}'
+        with open(tmp_path, 'w', encoding='utf-8', errors='surrogatepass', newline='\n') as f:
+            f.writelines(lines)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self.subwords)
+
+    def get(self, word: str) -> Optional[List[str]]:
+        return self.subwords.get(word)
+
+    def put(self, word: str, subwords: List[str]) -> None:
+        self.subwords[word] = subwords
+        if len(self.subwords) > self.max_size:
+            del self.subwords[next(iter(self.subwords))]
+        if WHITESPACE.search(word):
+            # cannot be written as a line of the file
+            return
+        self.pending.append(f'{word}\t{" ".join(subwords)}\n')
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Appends the buffered encodings to the file, has to be called when the encoding is done
+        (by the pool workers after each task, as they exit without running the exit handlers).
+        """
+        if not self.pending:
+            return
+        data = ''.join(self.pending).encode('utf-8', 'surrogatepass')
+        self.pending = []
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            written = 0
+            while written < len(data):
+                written += os.write(fd, data[written:])
+        finally:
+            os.close(fd)
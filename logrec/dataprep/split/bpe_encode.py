@@ -1,33 +1,62 @@
 import argparse
+import heapq
 import logging
-import sys
-from typing import Optional, Tuple, Dict
+from typing import Optional, Tuple, Dict, List, Iterable
 
 logger = logging.getLogger(__name__)
 
 def encode(words, merges):
-    letters_list = {" ".join(k): v for k, v in words.items()}
-
-    new_letters_list = {}
-    for letters, freq in letters_list.items():
-        subwords = letters.split(" ")
-        while True:
-            merge_index = None
-            merge_candidate_priority = sys.maxsize
-            for i in range(len(subwords) - 1):
-                merge_candidate = (subwords[i], subwords[i + 1])
-                if merge_candidate in merges:
-                    if merges[merge_candidate] < merge_candidate_priority:
-                        merge_candidate_priority = merges[merge_candidate]
-                        merge_index = i
-            if merge_index is None:
-                break
-            concat_pair = ''.join([subwords[merge_index], subwords[merge_index + 1]])
-            del subwords[merge_index]
-            del subwords[merge_index]
-            subwords = subwords[:merge_index] + [concat_pair] + subwords[merge_index:]
-        new_letters_list[" ".join(subwords)] = freq
-    return new_letters_list
+    """
+    :param words: dict of words and their frequencies
+    :return: dict of the space-separated subwords of the words and their frequencies
+    """
+    return {" ".join(encode_word(word, merges)): freq for word, freq in words.items()}
+
+
+def _apply_merges(subwords: List[str], merges: Dict[Tuple[str, str], int]) -> List[str]:
+    """
+    Applies the merges to the subwords in the order of their priorities (the leftmost pair first among
+    the pairs with the same priority), until no pair of adjacent subwords can be merged.
+
+    The subwords are kept in a linked list and the candidate pairs in a heap keyed by the priority
+    and the position of the left subword. Merging a pair only adds the pairs it forms with its neighbours,
+    the pairs it breaks stay in the heap and are skipped when popped, as the subwords at their positions
+    have changed (a subword can only become longer, so a changed pair never becomes the same pair again).
+    """
+    n = len(subwords)
+    if n < 2 or not merges:
+        return subwords
+    following = list(range(1, n + 1))
+    preceding = list(range(-1, n - 1))
+    get_priority = merges.get
+    heap = []
+    for i in range(n - 1):
+        left, right = subwords[i], subwords[i + 1]
+        priority = get_priority((left, right))
+        if priority is not None:
+            heap.append((priority, i, left, right))
+    heapq.heapify(heap)
+    while heap:
+        _, i, left, right = heapq.heappop(heap)
+        j = following[i]
+        if subwords[i] != left or j == n or subwords[j] != right:
+            continue
+        merged = left + right
+        subwords[i] = merged
+        subwords[j] = None
+        k = following[j]
+        following[i] = k
+        if k < n:
+            preceding[k] = i
+            priority = get_priority((merged, subwords[k]))
+            if priority is not None:
+                heapq.heappush(heap, (priority, i, merged, subwords[k]))
+        p = preceding[i]
+        if p >= 0:
+            priority = get_priority((subwords[p], merged))
+            if priority is not None:
+                heapq.heappush(heap, (priority, p, subwords[p], merged))
+    return [subword for subword in subwords if subword is not None]
 
 
 def read_merges(merges_file: str, n_merges: Optional[int]=None) -> Dict[Tuple[str, str], int]:
@@ -42,12 +71,22 @@ def read_merges(merges_file: str, n_merges: Optional[int]=None) -> Dict[Tuple[st
 
 
 def encode_word(word, merges):
-    enc_word, _ = encode({word: 0}, merges).popitem()
-    subwords = enc_word.split(" ")
-    return subwords
+    # the word is split the same way as the words are split into the characters in the training of bpe
+    return _apply_merges(" ".join(word).split(" "), merges)
+
+
+def encode_words(words: Iterable[str], merges: Dict[Tuple[str, str], int]) -> Dict[str, List[str]]:
+    """
+    :return: subwords of each of the distinct words
+    """
+    encoded = {}
+    for word in words:
+        if word not in encoded:
+            encoded[word] = encode_word(word, merges)
+    return encoded
 
 
-__all__ = [read_merges, encode_word]
+__all__ = [read_merges, encode_word, encode_words]
 
 
 if __name__ == '__main__':
@@ -1,7 +1,9 @@
 from enum import Enum, auto
 
 from logrec.dataprep.split.bpe_encode import encode_word
+from logrec.util.profiler import memoized
 
+BPE_SUBWORDS_CACHE_SIZE = 1 << 16
 
 
 class NgramSplittingType(Enum):
@@ -11,11 +13,17 @@ class NgramSplittingType(Enum):
 
 
 class NgramSplitConfig(object):
-    def __init__(self, splitting_type=None, merges_cache=None, merges=None, sc_splittings=None):
+    def __init__(self, splitting_type=None, merges_cache=None, merges=None, sc_splittings=None, bpe_cache=None):
+        """
+        :param bpe_cache: persistent cache of the encodings of the words which are not in `merges_cache`
+        (see `logrec.dataprep.split.bpe_cache`). The encodings are memoized by the config,
+        so the merges must not be changed once the config is used
+        """
         self._splitting_type = splitting_type
         self._merges_cache = merges_cache
         self._merges = merges
         self._sc_splittings = sc_splittings
+        self._bpe_cache = bpe_cache
 
     @property
     def merges_cache(self):
@@ -29,6 +37,14 @@ class NgramSplitConfig(object):
     def sc_splittings(self):
         return self._sc_splittings
 
+    @property
+    def bpe_cache(self):
+        return self._bpe_cache
+
+    @bpe_cache.setter
+    def bpe_cache(self, c):
+        self._bpe_cache = c
+
     @merges.setter
     def merges(self, m):
         self._merges = m
@@ -50,12 +66,22 @@ class NgramSplitConfig(object):
 
 
 def get_bpe_subwords(word, config):
-    merges = config.merges
     cache = config.merges_cache
     if word in cache:
         return cache[word]
     else:
-        return encode_word(word, merges)
+        return list(_encode_word(word, config))
+
+
+@memoized('ngram.bpe_subwords', BPE_SUBWORDS_CACHE_SIZE)
+def _encode_word(word, config):
+    bpe_cache = config.bpe_cache
+    subwords = bpe_cache.get(word) if bpe_cache is not None else None
+    if subwords is None:
+        subwords = encode_word(word, config.merges)
+        if bpe_cache is not None:
+            bpe_cache.put(word, subwords)
+    return tuple(subwords)
 
 
 def get_sc_subwords(word, config):
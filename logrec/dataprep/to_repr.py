@@ -1,23 +1,31 @@
 import argparse
-import gzip
 import logging
 import os
-import pickle
+import shutil
+import tempfile
 from abc import ABCMeta, abstractmethod
+from functools import lru_cache, partial
 from multiprocessing.pool import Pool
-from typing import Optional, List
+from contextlib import ExitStack
+from typing import Optional, List, Dict, Tuple, Set
 
 import jsons
 from tqdm import tqdm
 
-from logrec.dataprep import base_project_dir, METADATA_DIR, BPE_DIR, PARSED_DIR
+from logrec.dataprep import base_project_dir, METADATA_DIR, BPE_DIR, PARSED_DIR, parsed_bin, artifacts, reprbin
+from logrec.dataprep.model.tokenstream import TokenStream
+from logrec.dataprep.parsed_bin import iter_token_lists, count_token_lists
 from logrec.dataprep.preprocessors.general import to_token_list
 from logrec.dataprep.prepconfig import PrepParam, get_types_to_be_repr, PrepConfig
 from logrec.dataprep.preprocessors.repr import to_repr_list, ReprConfig
+from logrec.dataprep.split.bpe_cache import BpeCache
 from logrec.dataprep.split.bpe_encode import read_merges
-from logrec.dataprep.split.ngram import NgramSplittingType, NgramSplitConfig
-from logrec.dataprep.util import read_dict_from_2_columns
-from logrec.properties import DEFAULT_PARSED_DATASETS_DIR, DEFAULT_TO_REPR_ARGS
+from logrec.dataprep.split.ngram import NgramSplittingType, NgramSplitConfig, get_bpe_subwords
+from logrec.dataprep.util import read_dict_from_2_columns, dump_dict_into_2_columns
+from logrec.util import frozen
+from logrec.util.frozen import FrozenStrMap
+from logrec.properties import DEFAULT_PARSED_DATASETS_DIR, DEFAULT_TO_REPR_ARGS, DEFAULT_ARTIFACTS_DIR, \
+    DEFAULT_BPE_CACHE_DIR
 
 logger = logging.getLogger(__name__)
 
@@ -25,15 +33,41 @@ PARSED_FILE_EXTENSION = "parsed"
 REPR_EXTENSION = "repr"
 NOT_FINISHED_EXTENSION = "part"
 
+# parsed bin files with more token lists (i.e. source files) than this are converted by several workers concurrently
+DEFAULT_TOKEN_LISTS_PER_CHUNK = 500
+
+# number of distinct words encoded with bpe by a worker at once when the words of the corpus are encoded in advance
+WORDS_PER_ENCODING_TASK = 10000
+
+# splittings of the words of a dataset written next to the merges cache (see `encode_unique_words`)
+WORD_SPLITTINGS_FILE_NAME = 'merges_cache_{dataset}_{repr}.txt'
+
+# splittings of the words of a dataset shared by the workers (see `encode_unique_words`)
+FROZEN_WORD_SPLITTINGS_FILE_NAME = 'word_splittings_{repr}.' + artifacts.EXTENSION
+
+# set by `init_splitting_config` in the main process and, unless inherited with fork, in each worker
+global_n_gramm_splitting_config = None
+# splitting configs of all the prep configs initialized with `init_splitting_config`, by encoded prep config
+global_n_gramm_splitting_configs: Dict[str, NgramSplitConfig] = {}
+
+
+def get_chunk_file_path(full_dest_name: str, chunk_index: int) -> str:
+    return f'{full_dest_name}.{NOT_FINISHED_EXTENSION}.{chunk_index}'
+
 
 class ReprWriter(metaclass=ABCMeta):
-    def __init__(self, dest_file, mode, extension):
+    def __init__(self, dest_file, mode, extension, chunk_index: Optional[int] = None):
+        """
+        :param chunk_index: if given, only this chunk of the file is written to a separate file,
+        the chunks are concatenated afterwards by `finish_chunked_file`
+        """
         self.dest_file = dest_file
         self.mode = mode
         self.extension = extension
+        self.chunk_index = chunk_index
 
     def __enter__(self):
-        self.handle = open(f'{self.get_full_dest_name()}.{NOT_FINISHED_EXTENSION}', self.mode)
+        self.handle = open(self.get_not_finished_name(), self.mode)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -42,110 +76,421 @@ class ReprWriter(metaclass=ABCMeta):
     def get_full_dest_name(self):
         return f'{self.dest_file}.{self.extension}'
 
+    def get_not_finished_name(self):
+        if self.chunk_index is not None:
+            return get_chunk_file_path(self.get_full_dest_name(), self.chunk_index)
+        return f'{self.get_full_dest_name()}.{NOT_FINISHED_EXTENSION}'
+
     @abstractmethod
     def write(self, token_list):
         '''Has to be implemented by subclasses'''
 
+    def concat_chunks(self, chunk_files: List[str]) -> None:
+        with open(self.get_not_finished_name(), 'wb') as out:
+            for chunk_file in chunk_files:
+                with open(chunk_file, 'rb') as f:
+                    shutil.copyfileobj(f, out)
+
 
 class FinalReprWriter(ReprWriter):
-    def __init__(self, dest_file):
-        super().__init__(dest_file, 'w', f'{REPR_EXTENSION}')
+    def __init__(self, dest_file, chunk_index: Optional[int] = None):
+        super().__init__(dest_file, 'w', f'{REPR_EXTENSION}', chunk_index)
 
     def write(self, token_list):
         self.handle.write(to_token_list(token_list))
 
 
-def get_global_n_gramm_splitting_config():
-    return global_n_gramm_splitting_config
+class BinReprWriter(ReprWriter):
+    """
+    Writes the repr in the numericalized repr bin format (see `logrec.dataprep.reprbin`)
+    """
+    def __init__(self, dest_file, chunk_index: Optional[int] = None):
+        super().__init__(dest_file, 'wb', f'{reprbin.EXTENSION}', chunk_index)
 
+    def __enter__(self):
+        self.writer = reprbin.ReprBinWriter(self.get_not_finished_name()).__enter__()
+        return self
 
-def to_repr(prep_config: PrepConfig, token_list: List, n_gramm_splitting_config: Optional[NgramSplitConfig] = None):
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.writer.__exit__(exc_type, exc_val, exc_tb)
+
+    def write(self, token_list):
+        self.writer.write(token_list)
+
+    def concat_chunks(self, chunk_files: List[str]) -> None:
+        reprbin.merge(chunk_files, self.get_not_finished_name())
+
+
+# writers of the output formats of the repr
+OUTPUT_FORMATS = {
+    'text': FinalReprWriter,
+    'bin': BinReprWriter,
+}
+DEFAULT_OUTPUT_FORMATS = ['text']
+
+
+def get_global_n_gramm_splitting_config(prep_config: Optional[PrepConfig] = None) -> NgramSplitConfig:
+    """
+    :return: the splitting config of the given prep config, the last initialized one if no prep config is given
+    """
+    if prep_config is None:
+        return global_n_gramm_splitting_config
+    return global_n_gramm_splitting_configs[str(prep_config)]
+
+
+@lru_cache(maxsize=16)
+def get_repr_config(prep_config_str: str, splitting_config: NgramSplitConfig) -> ReprConfig:
+    """
+    The same `ReprConfig` object is returned for the same prep config and splitting config (the latter is compared
+    by identity), so that the renderings memoized by `torepr` are reused across the files.
+    """
+    prep_config = PrepConfig.from_encoded_string(prep_config_str)
     types_to_be_repr = get_types_to_be_repr(prep_config)
-    splitting_config = n_gramm_splitting_config or get_global_n_gramm_splitting_config()
     dict_based_non_eng = (prep_config.get_param_value(PrepParam.EN_ONLY) != 3)
     lowercase = (prep_config.get_param_value(PrepParam.CAPS) == 1)
-    repr_list = to_repr_list(token_list, ReprConfig(types_to_be_repr, splitting_config, dict_based_non_eng, lowercase))
+    return ReprConfig(types_to_be_repr, splitting_config, dict_based_non_eng, lowercase)
+
+
+def to_repr(prep_config: PrepConfig, token_list: List, n_gramm_splitting_config: Optional[NgramSplitConfig] = None):
+    splitting_config = n_gramm_splitting_config or get_global_n_gramm_splitting_config()
+    repr_list = to_repr_list(token_list, get_repr_config(str(prep_config), splitting_config))
     return repr_list
 
 
+def to_reprs(prep_configs: List[PrepConfig], token_list: List,
+             n_gramm_splitting_configs: Optional[List[NgramSplitConfig]] = None) -> List[List[str]]:
+    """
+    Converts the token list to several representations, e.g. to compare them without reading the parsed files again.
+
+    :param n_gramm_splitting_configs: splitting config of each prep config, by default the global ones
+    (see `init_splitting_configs`)
+    """
+    if n_gramm_splitting_configs is None:
+        n_gramm_splitting_configs = [get_global_n_gramm_splitting_config(prep_config) for prep_config in prep_configs]
+    return [to_repr(prep_config, token_list, splitting_config)
+            for prep_config, splitting_config in zip(prep_configs, n_gramm_splitting_configs)]
+
+
 def preprocess_and_write(params):
-    src_file, dest_file, prep_config = params
+    """
+    Reads the parsed file (or a chunk of it) once and writes its representation for each of the prep configs.
+
+    :param params: path to the parsed file, the list of the destination files with their prep configs,
+    the chunk to convert: its index and the range of the token lists (None to convert the whole file)
+    and the output formats (keys of `OUTPUT_FORMATS`).
+    The chunks of a file are written to separate files, which are concatenated by `finish_chunked_file`
+    :return: the path to the parsed file and the index of the chunk
+    """
+    src_file, targets, chunk, output_formats = params
     if not os.path.exists(src_file):
         logger.error(f"File {src_file} does not exist")
         exit(2)
 
-    logger.debug(f"Preprocessing parsed file {src_file}")
-    with gzip.GzipFile(src_file, 'rb') as i:
-        preprocessing_param_dict = pickle.load(i)
-        writer = FinalReprWriter(dest_file)
-
-        if os.path.exists(writer.get_full_dest_name()):
-            logger.warning(f"File {writer.get_full_dest_name()} already exists! Doing nothing.")
-            return
-        with writer as w:
-            while True:
-                try:
-                    token_list = pickle.load(i)
-                    repr = to_repr(prep_config, token_list, global_n_gramm_splitting_config)
-                    w.write(repr)
-                except EOFError:
-                    break
-    # remove .part to show that all raw files in this chunk have been preprocessed
-    os.rename(f'{writer.get_full_dest_name()}.{NOT_FINISHED_EXTENSION}', f'{writer.get_full_dest_name()}')
+    chunk_index, start, end = chunk if chunk is not None else (None, 0, None)
+    logger.debug(f"Preprocessing parsed file {src_file}" + (f", token lists {start}-{end}" if chunk else ""))
+    # writers of each of the prep configs which have files to be written
+    writers = []
+    prep_configs = []
+    for dest_file, prep_config in targets:
+        target_writers = []
+        for output_format in output_formats:
+            writer = OUTPUT_FORMATS[output_format](dest_file, chunk_index)
+            if os.path.exists(writer.get_full_dest_name()):
+                logger.warning(f"File {writer.get_full_dest_name()} already exists! Doing nothing.")
+                continue
+            target_writers.append(writer)
+        if target_writers:
+            writers.append(target_writers)
+            prep_configs.append(prep_config)
+
+    if writers:
+        with ExitStack() as stack:
+            for target_writers in writers:
+                for writer in target_writers:
+                    stack.enter_context(writer)
+            for token_list in iter_token_lists(src_file, token_streams=True, start=start, end=end):
+                for target_writers, repr in zip(writers, to_reprs(prep_configs, token_list)):
+                    for writer in target_writers:
+                        writer.write(repr)
+        flush_bpe_caches()
+        if chunk is None:
+            for target_writers in writers:
+                for writer in target_writers:
+                    # remove .part to show that all raw files in this chunk have been preprocessed
+                    os.rename(writer.get_not_finished_name(), writer.get_full_dest_name())
+    return src_file, chunk_index
+
+
+def collect_words(params) -> Dict[bool, Set[str]]:
+    """
+    Collects the distinct words of the parsed file (or a chunk of it) to be encoded with bpe in advance.
+
+    :param params: path to the parsed file, the chunk to read (see `preprocess_and_write`)
+    and the forms of the words to collect: lowercased (True) and/or with their capitalization (False)
+    :return: the words in each of the forms
+    """
+    src_file, chunk, forms = params
+    _, start, end = chunk if chunk is not None else (None, 0, None)
+    words = {lowercase: set() for lowercase in forms}
+    for token_list in iter_token_lists(src_file, token_streams=True, start=start, end=end):
+        token_stream = token_list if isinstance(token_list, TokenStream) else TokenStream.from_token_list(token_list)
+        for lowercase in forms:
+            words[lowercase].update(token_stream.words(lowercase))
+    return words
+
+
+def encode_words(params) -> List[Tuple[str, List[str]]]:
+    """
+    :param params: encoded prep config and the words to encode with its splitting config
+    """
+    prep_config_str, words = params
+    splitting_config = global_n_gramm_splitting_configs[prep_config_str]
+    encoded = [(word, get_bpe_subwords(word, splitting_config)) for word in words]
+    flush_bpe_caches()
+    return encoded
+
+
+def is_lowercased(prep_config: PrepConfig) -> bool:
+    return prep_config.get_param_value(PrepParam.CAPS) == 1
+
+
+def encode_unique_words(pool: Pool, src_files_with_chunks: List[Tuple[str, Optional[Tuple[int, int, int]]]],
+                        prep_configs: List[PrepConfig], word_splittings_dir: str,
+                        word_splittings_files: Optional[List[str]] = None) -> Dict[str, str]:
+    """
+    Splits each distinct word of the corpus with bpe once instead of at each of its occurrences:
+    the words are collected from the parsed files and encoded by the workers of the pool,
+    then the splittings are added to the merges caches of the splitting configs of the prep configs
+    (see `add_word_splittings`), which are inherited by the workers of the pools created afterwards with fork.
+    Only Words are collected, other tokens split with bpe (numbers) are still encoded when the repr is written.
+
+    :param prep_configs: prep configs with bpe splitting
+    :param word_splittings_dir: dir the splittings are saved to as frozen maps, which are read by the workers
+    started with spawn, so it must not be removed before the pools created afterwards are done
+    :param word_splittings_files: if given, the splittings of the words of each of the prep configs
+    are also written to the file
+    :return: paths to the frozen maps by encoded prep config, to be passed to `init_worker_splitting_configs`
+    """
+    forms = sorted({is_lowercased(prep_config) for prep_config in prep_configs})
+    words = {lowercase: set() for lowercase in forms}
+    it = pool.imap_unordered(collect_words, [(src_file, chunk, forms) for src_file, chunk in src_files_with_chunks])
+    for file_words in tqdm(it, total=len(src_files_with_chunks), desc='Collecting words'):
+        for lowercase in forms:
+            words[lowercase].update(file_words[lowercase])
+
+    word_splittings_paths = {}
+    for i, prep_config in enumerate(prep_configs):
+        word_list = sorted(words[is_lowercased(prep_config)])
+        logger.info(f"Encoding {len(word_list)} distinct words for {prep_config}")
+        tasks = [(str(prep_config), word_list[start:start + WORDS_PER_ENCODING_TASK])
+                 for start in range(0, len(word_list), WORDS_PER_ENCODING_TASK)]
+        splittings = {}
+        for encoded in tqdm(pool.imap_unordered(encode_words, tasks), total=len(tasks), desc='Encoding words'):
+            splittings.update(encoded)
+        if word_splittings_files:
+            dump_dict_into_2_columns(splittings, word_splittings_files[i], val_type=list)
+        path = os.path.join(word_splittings_dir, FROZEN_WORD_SPLITTINGS_FILE_NAME.format(repr=str(prep_config)))
+        # the values of a frozen map cannot contain spaces, such words are encoded at their occurrences
+        FrozenStrMap({word: subwords for word, subwords in splittings.items() if ' ' not in word}).save(path)
+        word_splittings_paths[str(prep_config)] = path
+        add_word_splittings(str(prep_config), splittings)
+    return word_splittings_paths
+
+
+def add_word_splittings(prep_config_str: str, splittings: Dict[str, List[str]]) -> None:
+    """
+    Adds the splittings of the words encoded by `encode_unique_words` to the merges cache of the splitting config,
+    so that each occurrence of a word is a single dict lookup.
+    """
+    splitting_config = global_n_gramm_splitting_configs[prep_config_str]
+    merges_cache = splitting_config.merges_cache
+    if not isinstance(merges_cache, dict):
+        # a frozen map shared between processes (see `logrec.dataprep.artifacts`) cannot be changed
+        # and is slower to look up, so it is copied into a dict
+        merges_cache = dict(merges_cache.items())
+        splitting_config.merges_cache = merges_cache
+    merges_cache.update(splittings)
+
+
+def split_into_chunks(src_file: str, token_lists_per_chunk: int) -> List[Optional[Tuple[int, int, int]]]:
+    """
+    :return: chunks of the parsed file to be converted concurrently: their indices and ranges of token lists,
+    a single None (the whole file) if the file is not larger than a chunk or is in the format without random access
+    """
+    n_token_lists = count_token_lists(src_file)
+    if n_token_lists is None or n_token_lists <= token_lists_per_chunk:
+        return [None]
+    return [(i, start, min(start + token_lists_per_chunk, n_token_lists))
+            for i, start in enumerate(range(0, n_token_lists, token_lists_per_chunk))]
+
+
+def finish_chunked_file(targets: List[Tuple[str, PrepConfig]], n_chunks: int,
+                        output_formats: List[str] = DEFAULT_OUTPUT_FORMATS) -> None:
+    for dest_file, _ in targets:
+        for output_format in output_formats:
+            writer = OUTPUT_FORMATS[output_format](dest_file)
+            chunk_files = [get_chunk_file_path(writer.get_full_dest_name(), i) for i in range(n_chunks)]
+            if not os.path.exists(chunk_files[0]):
+                # the repr existed before, so the chunks were not written
+                continue
+            writer.concat_chunks(chunk_files)
+            for chunk_file in chunk_files:
+                os.remove(chunk_file)
+            # remove .part to show that all raw files in this chunk have been preprocessed
+            os.rename(writer.get_not_finished_name(), writer.get_full_dest_name())
 
 
 def init_splitting_config(dataset: str, prep_config: PrepConfig,
-                          bpe_base_repr: Optional[str], bpe_n_merges: Optional[int], splitting_file: Optional[str], merges_file):
+                          bpe_base_repr: Optional[str], bpe_n_merges: Optional[int], splitting_file: Optional[str], merges_file,
+                          artifacts_dir: Optional[str] = None, bpe_cache_dir: Optional[str] = None):
+    """
+    :param artifacts_dir: if given, the bpe merges cache and the splittings are memory-mapped from shared artifacts
+    (see `logrec.dataprep.artifacts`) instead of being read into a dict by every process
+    :param bpe_cache_dir: if given, the bpe encodings of the words which are not in the merges cache
+    are loaded from and added to a persistent cache in this dir (see `logrec.dataprep.split.bpe_cache`)
+    """
     global global_n_gramm_splitting_config
-    global_n_gramm_splitting_config = NgramSplitConfig()
+    global_n_gramm_splitting_config = create_splitting_config(dataset, prep_config, bpe_base_repr, bpe_n_merges,
+                                                              splitting_file, merges_file, artifacts_dir,
+                                                              bpe_cache_dir)
+    global_n_gramm_splitting_configs[str(prep_config)] = global_n_gramm_splitting_config
+
+
+def init_splitting_configs(dataset: str, prep_configs: List[PrepConfig], *args) -> None:
+    """
+    Initializes the splitting config of each of the prep configs, the other arguments are the same
+    as of `init_splitting_config` and are used for all of them.
+    """
+    for prep_config in prep_configs:
+        init_splitting_config(dataset, prep_config, *args)
+
+
+def get_path_to_merges_dir(dataset: str, prep_config: PrepConfig, bpe_base_repr: Optional[str],
+                           bpe_n_merges: Optional[int]) -> str:
+    """
+    :return: dir with the bpe merges and the merges cache the words are split with, if no merges file is given
+    """
+    if not bpe_base_repr:
+        bpe_base_repr = prep_config.get_base_bpe_prep_config()
+
+    if prep_config.get_param_value(PrepParam.SPLIT) == 9:
+        if not bpe_n_merges:
+            raise ValueError("--bpe-n-merges must be specified for repr **9**")
+    else:
+        bpe_n_merges_dict = {4: 5000, 5: 1000, 6: 10000, 7: 20000, 8: 0}
+        bpe_n_merges = bpe_n_merges_dict[prep_config.get_param_value(PrepParam.SPLIT)]
+
+    if bpe_base_repr.find("/") == -1:
+        bpe_base_dataset = dataset
+    else:
+        bpe_base_dataset, bpe_base_repr = bpe_base_repr.split("/")
+    logger.info(f'Using bpe base dataset: {bpe_base_dataset}')
+    logger.info(f'Using bpe base repr: {bpe_base_repr}')
+    logger.info(f'Using bpe_n_merges: {bpe_n_merges}')
+    return os.path.join(DEFAULT_PARSED_DATASETS_DIR, bpe_base_dataset, METADATA_DIR, bpe_base_repr, BPE_DIR,
+                        str(bpe_n_merges))
+
+
+def create_splitting_config(dataset: str, prep_config: PrepConfig,
+                            bpe_base_repr: Optional[str], bpe_n_merges: Optional[int], splitting_file: Optional[str],
+                            merges_file, artifacts_dir: Optional[str] = None,
+                            bpe_cache_dir: Optional[str] = None) -> NgramSplitConfig:
+    splitting_config = NgramSplitConfig()
     if prep_config.get_param_value(PrepParam.SPLIT) in [4, 5, 6, 7, 8, 9]:
         if merges_file:
             logger.info(f'Using bpe merges file: {merges_file}')
-            global_n_gramm_splitting_config.merges_cache = []
-            global_n_gramm_splitting_config.merges = read_merges(merges_file, bpe_n_merges)
+            splitting_config.merges_cache = {}
+            splitting_config.merges = read_merges(merges_file, bpe_n_merges)
             if bpe_n_merges:
                 logger.info(f'Using first {bpe_n_merges} merges.')
         else:
-            if not bpe_base_repr:
-                bpe_base_repr = prep_config.get_base_bpe_prep_config()
-
-            if prep_config.get_param_value(PrepParam.SPLIT) == 9:
-                if not bpe_n_merges:
-                    raise ValueError("--bpe-n-merges must be specified for repr **9**")
-            else:
-                bpe_n_merges_dict = {4: 5000, 5: 1000, 6: 10000, 7: 20000, 8: 0}
-                bpe_n_merges = bpe_n_merges_dict[prep_config.get_param_value(PrepParam.SPLIT)]
-
-            if bpe_base_repr.find("/") == -1:
-                bpe_base_dataset = dataset
-            else:
-                bpe_base_dataset, bpe_base_repr = bpe_base_repr.split("/")
-            logger.info(f'Using bpe base dataset: {bpe_base_dataset}')
-            logger.info(f'Using bpe base repr: {bpe_base_repr}')
-            logger.info(f'Using bpe_n_merges: {bpe_n_merges}')
-            path_to_merges_dir = os.path.join(DEFAULT_PARSED_DATASETS_DIR, bpe_base_dataset, METADATA_DIR, bpe_base_repr,
-                                              BPE_DIR,
-                                              str(bpe_n_merges))
+            path_to_merges_dir = get_path_to_merges_dir(dataset, prep_config, bpe_base_repr, bpe_n_merges)
             bpe_merges_file = os.path.join(path_to_merges_dir, 'merges.txt')
             bpe_merges_cache = os.path.join(path_to_merges_dir, 'merges_cache.txt')
 
-            global_n_gramm_splitting_config.merges_cache = read_dict_from_2_columns(bpe_merges_cache, val_type=list)
-            global_n_gramm_splitting_config.merges = read_merges(bpe_merges_file)
-        global_n_gramm_splitting_config.set_splitting_type(NgramSplittingType.BPE)
+            if artifacts_dir:
+                splitting_config.merges_cache = artifacts.get_word_splittings(artifacts_dir, bpe_merges_cache)
+            else:
+                splitting_config.merges_cache = read_dict_from_2_columns(bpe_merges_cache, val_type=list)
+            splitting_config.merges = read_merges(bpe_merges_file)
+        if bpe_cache_dir:
+            splitting_config.bpe_cache = BpeCache(bpe_cache_dir, splitting_config.merges)
+        splitting_config.set_splitting_type(NgramSplittingType.BPE)
     elif prep_config.get_param_value(PrepParam.SPLIT) == 3:
         if not splitting_file:
             raise ValueError("--splitting-file must be specified")
 
-        splittings = read_dict_from_2_columns(splitting_file, val_type=list, delim='|')
-        global_n_gramm_splitting_config.sc_splittings = splittings
-        global_n_gramm_splitting_config.set_splitting_type(NgramSplittingType.NUMBERS_AND_CUSTOM)
+        if artifacts_dir:
+            splittings = artifacts.get_word_splittings(artifacts_dir, splitting_file, delim='|')
+        else:
+            splittings = read_dict_from_2_columns(splitting_file, val_type=list, delim='|')
+        splitting_config.sc_splittings = splittings
+        splitting_config.set_splitting_type(NgramSplittingType.NUMBERS_AND_CUSTOM)
     elif prep_config.get_param_value(PrepParam.SPLIT) == 2:
-        global_n_gramm_splitting_config.set_splitting_type(NgramSplittingType.ONLY_NUMBERS)
-
-
-def run(dataset: str, preprocessing_params: str, bpe_base_repr: Optional[str],
-        bpe_n_merges: Optional[int], splitting_file: Optional[str], merges_file):
-    path_to_dataset = os.path.join(DEFAULT_PARSED_DATASETS_DIR, args.dataset)
+        splitting_config.set_splitting_type(NgramSplittingType.ONLY_NUMBERS)
+    return splitting_config
+
+
+def flush_bpe_caches() -> None:
+    """
+    Writes the new bpe encodings to the persistent caches, pool workers have to call it after each task
+    """
+    for splitting_config in global_n_gramm_splitting_configs.values():
+        if splitting_config.bpe_cache is not None:
+            splitting_config.bpe_cache.flush()
+
+
+def init_worker_splitting_config(*args) -> None:
+    """
+    Pool initializer: workers started with fork inherit the splitting config of the main process,
+    workers started with spawn build their own (attaching the shared artifacts, if they are used).
+    """
+    if global_n_gramm_splitting_config is None:
+        init_splitting_config(*args)
+
+
+def init_worker_splitting_configs(*args, word_splittings_paths: Optional[Dict[str, str]] = None) -> None:
+    """
+    The same as `init_worker_splitting_config` for `init_splitting_configs`.
+
+    :param word_splittings_paths: splittings of the words saved by `encode_unique_words`,
+    which workers started with spawn add to the splitting configs they build
+    """
+    if not global_n_gramm_splitting_configs:
+        init_splitting_configs(*args)
+        for prep_config_str, path in (word_splittings_paths or {}).items():
+            add_word_splittings(prep_config_str, dict(frozen.load(path).items()))
+
+
+def get_repr_dir_name(repr: str, bpe_n_merges: Optional[int], merges_file: Optional[str]) -> str:
+    if not bpe_n_merges and not merges_file:
+        return repr
+    return f'{repr}_{bpe_n_merges if bpe_n_merges else ""}_{os.path.basename(merges_file) if merges_file else ""}'
+
+
+class ChunkedFile(object):
+    def __init__(self, targets: List[Tuple[str, PrepConfig]], n_chunks: int):
+        self.targets = targets
+        self.n_chunks = n_chunks
+        self.chunks_left = n_chunks
+
+
+def run(dataset: str, preprocessing_params: List[str], bpe_base_repr: Optional[str],
+        bpe_n_merges: Optional[int], splitting_file: Optional[str], merges_file, artifacts_dir: Optional[str] = None,
+        token_lists_per_chunk: int = DEFAULT_TOKEN_LISTS_PER_CHUNK,
+        output_formats: List[str] = DEFAULT_OUTPUT_FORMATS, bpe_cache_dir: Optional[str] = None,
+        unique_words: bool = False, save_word_splittings: bool = False):
+    """
+    :param preprocessing_params: encoded prep configs, the parsed files are read once for all of them
+    :param token_lists_per_chunk: large parsed bin files are split into chunks of this many token lists,
+    which are converted concurrently
+    :param output_formats: formats the repr is written in, keys of `OUTPUT_FORMATS`
+    :param bpe_cache_dir: dir with the persistent caches of the bpe encodings, None not to use them
+    :param unique_words: encode the distinct words of the corpus in advance for the prep configs with bpe splitting
+    (see `encode_unique_words`)
+    :param save_word_splittings: write the splittings of the distinct words next to the merges cache
+    """
+    path_to_dataset = os.path.join(DEFAULT_PARSED_DATASETS_DIR, dataset)
     full_src_dir = os.path.join(path_to_dataset, PARSED_DIR)
 
     if not os.path.exists(full_src_dir):
@@ -153,53 +498,120 @@ def run(dataset: str, preprocessing_params: str, bpe_base_repr: Optional[str],
         exit(3)
     logger.info(f"Reading parsed files from: {os.path.abspath(full_src_dir)}")
 
-    preprocessing_params = PrepConfig.from_encoded_string(preprocessing_params)
-    init_splitting_config(dataset, preprocessing_params, bpe_base_repr, bpe_n_merges, splitting_file, merges_file)
-
-    repr = str(preprocessing_params)
-
-    full_dest_dir = os.path.join(path_to_dataset, REPR_EXTENSION, f'{repr}_{bpe_n_merges if bpe_n_merges else ""}_{os.path.basename(merges_file)}')
-    full_metadata_dir = os.path.join(path_to_dataset, METADATA_DIR, repr)
-    logger.info(f"Writing preprocessed files to {os.path.abspath(full_dest_dir)}")
-    if not os.path.exists(full_dest_dir):
-        os.makedirs(full_dest_dir)
-    if not os.path.exists(full_metadata_dir):
-        os.makedirs(full_metadata_dir)
-
-    with open(os.path.join(full_dest_dir, 'preprocessing_types.json'), "w") as f:
-        json_str = jsons.dumps(preprocessing_params)
-        f.write(json_str)
+    prep_configs = [PrepConfig.from_encoded_string(p) for p in preprocessing_params]
+    splitting_config_args = (dataset, prep_configs, bpe_base_repr, bpe_n_merges, splitting_file, merges_file,
+                             artifacts_dir, bpe_cache_dir)
+    init_splitting_configs(*splitting_config_args)
+
+    full_dest_dirs = []
+    for prep_config in prep_configs:
+        repr = str(prep_config)
+        full_dest_dir = os.path.join(path_to_dataset, REPR_EXTENSION,
+                                     get_repr_dir_name(repr, bpe_n_merges, merges_file))
+        full_metadata_dir = os.path.join(path_to_dataset, METADATA_DIR, repr)
+        logger.info(f"Writing preprocessed files to {os.path.abspath(full_dest_dir)}")
+        if not os.path.exists(full_dest_dir):
+            os.makedirs(full_dest_dir)
+        if not os.path.exists(full_metadata_dir):
+            os.makedirs(full_metadata_dir)
+
+        with open(os.path.join(full_dest_dir, 'preprocessing_types.json'), "w") as f:
+            json_str = jsons.dumps(prep_config)
+            f.write(json_str)
+        full_dest_dirs.append(full_dest_dir)
 
     params = []
+    chunked_files = {}
     for root, dirs, files in os.walk(full_src_dir):
         for file in files:
-            if file.endswith(f".{PARSED_FILE_EXTENSION}"):
-
-                full_dest_dir_with_sub_dir = os.path.join(full_dest_dir, os.path.relpath(root, full_src_dir))
-                if not os.path.exists(full_dest_dir_with_sub_dir):
-                    os.makedirs(full_dest_dir_with_sub_dir)
-                params.append((os.path.join(root, file),
-                               os.path.join(full_dest_dir_with_sub_dir, file),
-                               preprocessing_params))
-    files_total = len(params)
-    with Pool() as pool:
-        it = pool.imap_unordered(preprocess_and_write, params)
-        for _ in tqdm(it, total=files_total):
-            pass
+            if file.endswith(f".{PARSED_FILE_EXTENSION}") or file.endswith(f".{parsed_bin.EXTENSION}"):
+                project, ext = os.path.splitext(file)
+                if ext == f".{PARSED_FILE_EXTENSION}" and f'{project}.{parsed_bin.EXTENSION}' in files:
+                    # the same project converted to the parsed bin format, which is faster to read
+                    continue
+
+                targets = []
+                for full_dest_dir, prep_config in zip(full_dest_dirs, prep_configs):
+                    full_dest_dir_with_sub_dir = os.path.join(full_dest_dir, os.path.relpath(root, full_src_dir))
+                    if not os.path.exists(full_dest_dir_with_sub_dir):
+                        os.makedirs(full_dest_dir_with_sub_dir)
+                    targets.append((os.path.join(full_dest_dir_with_sub_dir, f'{project}.{PARSED_FILE_EXTENSION}'),
+                                    prep_config))
+                src_file = os.path.join(root, file)
+                chunks = split_into_chunks(src_file, token_lists_per_chunk)
+                if len(chunks) > 1:
+                    chunked_files[src_file] = ChunkedFile(targets, len(chunks))
+                params.extend((src_file, targets, chunk, output_formats) for chunk in chunks)
+    # the chunks of the large files are converted before the small files, so that they are not left to the end
+    params.sort(key=lambda p: p[2] is None)
+    bpe_prep_configs = [prep_config for prep_config in prep_configs
+                        if get_global_n_gramm_splitting_config(prep_config).splitting_type == NgramSplittingType.BPE]
+    with ExitStack() as stack:
+        word_splittings_paths = None
+        if unique_words and bpe_prep_configs:
+            word_splittings_files = None
+            if save_word_splittings:
+                word_splittings_files = [os.path.join(os.path.dirname(merges_file) if merges_file
+                                                      else get_path_to_merges_dir(dataset, prep_config, bpe_base_repr,
+                                                                                  bpe_n_merges),
+                                                      WORD_SPLITTINGS_FILE_NAME.format(dataset=dataset,
+                                                                                       repr=str(prep_config)))
+                                         for prep_config in bpe_prep_configs]
+            if artifacts_dir:
+                os.makedirs(artifacts_dir, exist_ok=True)
+            word_splittings_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix='word_splittings_',
+                                                                                  dir=artifacts_dir))
+            with Pool(initializer=init_worker_splitting_configs, initargs=splitting_config_args) as pool:
+                src_files_with_chunks = [(src_file, chunk) for src_file, _, chunk, _ in params]
+                word_splittings_paths = encode_unique_words(pool, src_files_with_chunks, bpe_prep_configs,
+                                                            word_splittings_dir, word_splittings_files)
+        initializer = partial(init_worker_splitting_configs, word_splittings_paths=word_splittings_paths)
+        with Pool(initializer=initializer, initargs=splitting_config_args) as pool:
+            it = pool.imap_unordered(preprocess_and_write, params)
+            for src_file, chunk_index in tqdm(it, total=len(params)):
+                if chunk_index is not None:
+                    chunked_file = chunked_files[src_file]
+                    chunked_file.chunks_left -= 1
+                    if chunked_file.chunks_left == 0:
+                        finish_chunked_file(chunked_file.targets, chunked_file.n_chunks, output_formats)
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('dataset', action='store', help=f'path to the parsed dataset')
-    parser.add_argument('repr', action='store', help='preprocessing params line, \n Example: 101011')
+    parser.add_argument('repr', action='store', nargs='+',
+                        help='preprocessing params lines, the parsed files are read once for all of them, \n '
+                             'Example: 101011')
     parser.add_argument('--merges-file', action='store')
 
     parser.add_argument('--bpe-base-repr', action='store', help='TODO')
     parser.add_argument('--bpe-n-merges', action='store', type=int, help='TODO')
     parser.add_argument('--splitting-file', action='store', help='Full path to the file with sc split words',
                         default=os.path.join(base_project_dir, 'splittings.txt'))
+    parser.add_argument('--shared-artifacts', action='store_true',
+                        help='memory-map the merges cache and splittings shared by the workers instead of reading '
+                             'them into memory of each worker (less memory, but slower lookups)')
+    parser.add_argument('--artifacts-dir', action='store', default=DEFAULT_ARTIFACTS_DIR,
+                        help='with --shared-artifacts, directory with the merges caches and splittings')
+    parser.add_argument('--token-lists-per-chunk', action='store', type=int, default=DEFAULT_TOKEN_LISTS_PER_CHUNK,
+                        help='parsed bin files with more token lists (source files) are split into chunks '
+                             'of this size converted concurrently')
+    parser.add_argument('--output-format', action='store', nargs='+', choices=list(OUTPUT_FORMATS),
+                        default=DEFAULT_OUTPUT_FORMATS,
+                        help='text .repr files, numericalized .reprbin files or both')
+    parser.add_argument('--bpe-cache-dir', action='store', default=DEFAULT_BPE_CACHE_DIR,
+                        help='directory with the bpe encodings of the words not in the merges cache, '
+                             'shared by the workers and the runs')
+    parser.add_argument('--no-bpe-cache', action='store_true', help='encode the words without the persistent cache')
+    parser.add_argument('--unique-words', action='store_true',
+                        help='collect the distinct words of the corpus and encode each of them with bpe once '
+                             'before writing the repr')
+    parser.add_argument('--save-word-splittings', action='store_true',
+                        help='with --unique-words, write the splittings of the words next to the merges cache')
 
     args = parser.parse_known_args(*DEFAULT_TO_REPR_ARGS)
     args = args[0]
 
-    run(args.dataset, args.repr, args.bpe_base_repr, args.bpe_n_merges, args.splitting_file, args.merges_file)
+    run(args.dataset, args.repr, args.bpe_base_repr, args.bpe_n_merges, args.splitting_file, args.merges_file,
+        args.artifacts_dir if args.shared_artifacts else None, args.token_lists_per_chunk, args.output_format,
+        None if args.no_bpe_cache else args.bpe_cache_dir, args.unique_words, args.save_word_splittings)
@@ -16,7 +16,7 @@ from multiprocessing.pool import Pool
 from torchtext.data import Field
 from tqdm import tqdm
 
-from logrec.dataprep import TRAIN_DIR, METADATA_DIR, REPR_DIR, TEXT_FIELD_FILE
+from logrec.dataprep import TRAIN_DIR, METADATA_DIR, REPR_DIR, TEXT_FIELD_FILE, reprbin
 from logrec.dataprep.model.placeholders import placeholders
 from logrec.dataprep.parse_projects import read_file_contents
 from logrec.dataprep.to_repr import REPR_EXTENSION
@@ -212,6 +212,8 @@ class VocabMerger(multiprocessing.Process):
 
 
 def get_vocab(path_to_file: str) -> Counter:
+    if path_to_file.endswith(f'.{reprbin.EXTENSION}'):
+        return reprbin.count_repr_tokens(path_to_file)
     vocab = Counter()
     lines, _ = read_file_contents(path_to_file)
     for line in lines:
@@ -313,7 +315,11 @@ def run(full_src_dir: str, full_metadata_dir: str, max_vocab_threshold: int, per
 
     logger.info(f"Reading files from: {os.path.abspath(full_src_dir)}")
 
-    all_files = [file for file in file_generator(full_src_dir, REPR_EXTENSION, percent, start_from)]
+    all_files = [file for file in file_generator(full_src_dir, (f'.{REPR_EXTENSION}', f'.{reprbin.EXTENSION}'),
+                                                 percent, start_from)]
+    # the same repr in the repr bin format is counted without splitting the lines
+    all_files_set = set(all_files)
+    all_files = [file for file in all_files if not reprbin.has_bin_version(file, all_files_set)]
     if not all_files:
         logger.warning("No preprocessed files found.")
         exit(4)
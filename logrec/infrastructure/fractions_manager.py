@@ -4,7 +4,7 @@ from typing import Callable, Generator
 
 import pandas
 
-from logrec.util.files import file_mapper
+from logrec.dataprep import reprbin
 
 logger = logging.getLogger(__name__)
 
@@ -83,27 +83,29 @@ def reverse_line(line):
 def create_df_gen(dir: str, percent: float, start_from: float, backwards: bool) \
         -> Generator[pandas.DataFrame, None, None]:
     lines = []
-    files_total = sum(f for f in file_mapper(dir, included_in_fraction_tester(percent, start_from),
-                                             lambda fi: not fi.startswith("_")))
+    files_total = sum(1 for root, dirs, files in os.walk(dir) for file in files
+                      if not reprbin.has_bin_version(file, files) and included_in_fraction(file, percent, start_from))
 
     DATAFRAME_LINES_THRESHOLD = 3000
     cur_file = 0
     at_least_one_frame_created = False
     for root, dirs, files in os.walk(dir):
         for file in files:
-            with open(os.path.join(root, file), 'r') as f:
-                if included_in_fraction(file, percent, start_from):
-                    cur_file += 1
-                    logger.debug(f'Adding {os.path.join(root, file)} to dataframe [{cur_file} out of {files_total}]')
-                    for line in f:
-                        if backwards:
-                            line = reverse_line(line)
-                        lines.append(line)
-                    if len(lines) > DATAFRAME_LINES_THRESHOLD:
-                        logger.debug("Submitting dataFrame...")
-                        yield pandas.DataFrame(lines)
-                        lines = []
-                        at_least_one_frame_created = True
+            if reprbin.has_bin_version(file, files):
+                # the lines are read from the same repr in the repr bin format
+                continue
+            if included_in_fraction(file, percent, start_from):
+                cur_file += 1
+                logger.debug(f'Adding {os.path.join(root, file)} to dataframe [{cur_file} out of {files_total}]')
+                for line in reprbin.iter_repr_lines(os.path.join(root, file)):
+                    if backwards:
+                        line = reverse_line(line)
+                    lines.append(line)
+                if len(lines) > DATAFRAME_LINES_THRESHOLD:
+                    logger.debug("Submitting dataFrame...")
+                    yield pandas.DataFrame(lines)
+                    lines = []
+                    at_least_one_frame_created = True
     if lines:
         yield pandas.DataFrame(lines)
         at_least_one_frame_created = True
@@ -12,3 +12,10 @@ elif os.environ['HOME'] == '/home/travis':
 else:
     logger.info(f'$HOME is {os.environ["HOME"]}, using vsc_properties.py')
     from logrec.vsc_properties import *
+
+# defaults of the properties which not every properties file defines (e.g. local_properties.py)
+_home = os.environ['HOME']
+DEFAULT_PARSE_CACHE_DIR = globals().get('DEFAULT_PARSE_CACHE_DIR', os.path.join(_home, 'parse_cache'))
+DEFAULT_BPE_CACHE_DIR = globals().get('DEFAULT_BPE_CACHE_DIR', os.path.join(_home, 'bpe_cache'))
+DEFAULT_ARTIFACTS_DIR = globals().get('DEFAULT_ARTIFACTS_DIR', os.path.join(_home, 'artifacts'))
+COMPACT_NON_ENG_WORD_SET = globals().get('COMPACT_NON_ENG_WORD_SET', False)
@@ -14,6 +14,13 @@ REWRITE_PARSED_FILE = False
 
 DEFAULT_RAW_DATASETS_DIR = os.path.join(base_project_dir, 'nn-data', 'test', 'raw')
 DEFAULT_PARSED_DATASETS_DIR = os.path.join(base_project_dir, 'nn-data', 'test')
+DEFAULT_PARSE_CACHE_DIR = os.path.join(base_dir, 'parse_cache')
+DEFAULT_BPE_CACHE_DIR = os.path.join(base_dir, 'bpe_cache')
+DEFAULT_ARTIFACTS_DIR = os.path.join(base_dir, 'artifacts')
+
+# keep the non-english dictionaries in a sorted word array instead of a set (less memory, slower lookups),
+# memory-mapped from DEFAULT_ARTIFACTS_DIR and shared by all the processes
+COMPACT_NON_ENG_WORD_SET = False
 
 DEFAULT_DATASET = 'test1'
 DEFAULT_BPE_N_MERGES = '50'
@@ -14,7 +14,7 @@ def get_two_levels_subdirs(dir):
             yield dir, subdir, subsubdir
 
 
-def file_mapper(dir: str, func: Callable, predicate: Callable[[str], bool] = lambda: True):
+def file_mapper(dir: str, func: Callable, predicate: Callable[[str], bool] = lambda file: True):
     import os
     if not os.path.exists(dir):
         raise ValueError(f"Directory doesnt exist: {dir}")
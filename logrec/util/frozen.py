@@ -0,0 +1,236 @@
+"""
+Compact immutable collections for large vocabularies that are only queried after they are built.
+
+The collections can be saved to a file and memory-mapped back with `attach`. All the processes that attach the same
+file share its pages through the page cache, and a collection attached from a file is pickled as its path, so passing
+it to a worker (with any multiprocessing start method) does not copy the data.
+"""
+import mmap
+import os
+import struct
+from array import array
+from typing import Iterable, Iterator, List, Dict, Tuple, Optional, Union
+
+MAGIC = b'LRFROZEN'
+FORMAT_VERSION = 1
+
+# magic, format version, kind of the collection, number of string arrays
+HEADER = struct.Struct('<8sQ8sQ')
+# number of strings, length of the blob
+ARRAY_HEADER = struct.Struct('<QQ')
+
+ALIGNMENT = 8
+
+
+def _padding(position: int) -> int:
+    return -position % ALIGNMENT
+
+
+def _encode(s: str) -> bytes:
+    return s.encode('utf-8', 'surrogatepass')
+
+
+def _decode(b: bytes) -> str:
+    return b.decode('utf-8', 'surrogatepass')
+
+
+class StrArray(object):
+    """
+    Sequence of strings stored as a single utf-8 blob and an array of offsets of the strings in the blob.
+    The blob is either a bytes object or a region of a memory-mapped file starting at `blob_start`.
+    """
+
+    def __init__(self, offsets, buffer: Union[bytes, mmap.mmap], blob_start: int = 0):
+        self._offsets = offsets
+        self._buffer = buffer
+        self._blob_start = blob_start
+
+    @classmethod
+    def from_bytes(cls, encoded_strings: Iterable[bytes]) -> 'StrArray':
+        encoded_strings = list(encoded_strings)
+        offsets = array('q', [0])
+        position = 0
+        for encoded_string in encoded_strings:
+            position += len(encoded_string)
+            offsets.append(position)
+        return cls(offsets, b''.join(encoded_strings))
+
+    def item(self, index: int) -> bytes:
+        return self._buffer[self._blob_start + self._offsets[index]:self._blob_start + self._offsets[index + 1]]
+
+    def __getitem__(self, index: int) -> str:
+        return _decode(self.item(index))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def blob_length(self) -> int:
+        return self._offsets[len(self._offsets) - 1]
+
+    def nbytes(self) -> int:
+        return self.blob_length() + 8 * len(self._offsets)
+
+    def write(self, f) -> None:
+        f.write(ARRAY_HEADER.pack(len(self), self.blob_length()))
+        f.write(array('q', self._offsets).tobytes())
+        f.write(self._buffer[self._blob_start:self._blob_start + self.blob_length()])
+        f.write(b'\0' * _padding(self.blob_length()))
+
+    @classmethod
+    def read(cls, buffer: mmap.mmap, position: int) -> Tuple['StrArray', int]:
+        """
+        :return: the array backed by the buffer and the position of the next array in the buffer
+        """
+        n_strings, blob_length = ARRAY_HEADER.unpack_from(buffer, position)
+        position += ARRAY_HEADER.size
+        offsets_length = 8 * (n_strings + 1)
+        offsets = memoryview(buffer)[position:position + offsets_length].cast('q')
+        position += offsets_length
+        return cls(offsets, buffer, position), position + blob_length + _padding(blob_length)
+
+
+class FrozenCollection(object):
+    KIND = None
+
+    def __init__(self, arrays: List[StrArray], path: Optional[str] = None):
+        self._arrays = arrays
+        self._path = path
+
+    def save(self, path: str) -> None:
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, self.KIND, len(self._arrays)))
+            for arr in self._arrays:
+                arr.write(f)
+
+    def nbytes(self) -> int:
+        return sum(arr.nbytes() for arr in self._arrays)
+
+    @property
+    def path(self) -> Optional[str]:
+        """
+        :return: path of the file the collection is attached to, None if the collection is in memory
+        """
+        return self._path
+
+    def __reduce__(self):
+        if self._path is not None:
+            return attach, (self._path,)
+        return _from_arrays, (self.__class__, [StrArray.from_bytes(arr.item(i) for i in range(len(arr)))
+                                               for arr in self._arrays])
+
+
+def _from_arrays(cls, arrays: List[StrArray]) -> FrozenCollection:
+    return cls(arrays=arrays)
+
+
+def _bisect(sorted_array: StrArray, key: bytes) -> int:
+    lo, hi = 0, len(sorted_array)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if sorted_array.item(mid) < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class SortedWordArray(FrozenCollection):
+    """
+    Immutable set of strings stored as a single utf-8 blob of the sorted words and an array of their offsets.
+    Takes a few bytes per word on top of the word itself instead of a str object and a hash table slot
+    of a python set, membership is checked with a binary search.
+    """
+    KIND = b'WORDSET\0'
+
+    def __init__(self, words: Iterable[str] = (), arrays: Optional[List[StrArray]] = None, path: Optional[str] = None):
+        # the order of utf-8 byte strings is the order of code points, so queries can be compared as bytes
+        super().__init__(arrays or [StrArray.from_bytes(sorted({_encode(word) for word in words}))], path)
+        self._words = self._arrays[0]
+
+    def __contains__(self, word: str) -> bool:
+        key = _encode(word)
+        index = _bisect(self._words, key)
+        return index < len(self._words) and self._words.item(index) == key
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self._words)):
+            yield self._words[index]
+
+
+class FrozenStrMap(FrozenCollection):
+    """
+    Immutable mapping from strings to lists of strings (e.g. words to their splittings into subwords).
+    The keys are kept as in `SortedWordArray` and the values as the space-joined lists in the order of the keys,
+    so the values must not contain spaces.
+    """
+    KIND = b'STRMAP\0\0'
+
+    def __init__(self, mapping: Optional[Dict[str, List[str]]] = None, arrays: Optional[List[StrArray]] = None,
+                 path: Optional[str] = None):
+        if arrays is None:
+            items = sorted((_encode(k), _encode(' '.join(v))) for k, v in (mapping or {}).items())
+            arrays = [StrArray.from_bytes(k for k, _ in items), StrArray.from_bytes(v for _, v in items)]
+        super().__init__(arrays, path)
+        self._keys, self._values = self._arrays
+
+    def _index(self, key: str) -> int:
+        encoded_key = _encode(key)
+        index = _bisect(self._keys, encoded_key)
+        return index if index < len(self._keys) and self._keys.item(index) == encoded_key else -1
+
+    def get(self, key: str, default=None):
+        index = self._index(key)
+        return self._values[index].split(' ') if index >= 0 else default
+
+    def __getitem__(self, key: str) -> List[str]:
+        index = self._index(key)
+        if index < 0:
+            raise KeyError(key)
+        return self._values[index].split(' ')
+
+    def __contains__(self, key: str) -> bool:
+        return self._index(key) >= 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self._keys)):
+            yield self._keys[index]
+
+    def items(self) -> Iterator[Tuple[str, List[str]]]:
+        for index in range(len(self._keys)):
+            yield self._keys[index], self._values[index].split(' ')
+
+
+COLLECTIONS_BY_KIND = {cls.KIND: cls for cls in [SortedWordArray, FrozenStrMap]}
+
+# collections attached by this process, by absolute path
+_attached = {}
+
+
+def load(path: str) -> FrozenCollection:
+    """
+    Memory-maps a collection saved with `FrozenCollection.save`. Prefer `attach`, which maps each file once per process.
+    """
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, kind, n_arrays = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != FORMAT_VERSION or kind not in COLLECTIONS_BY_KIND:
+        raise ValueError(f'{path} is not a frozen collection of version {FORMAT_VERSION}')
+    position = HEADER.size
+    arrays = []
+    for _ in range(n_arrays):
+        arr, position = StrArray.read(buffer, position)
+        arrays.append(arr)
+    return COLLECTIONS_BY_KIND[kind](arrays=arrays, path=path)
+
+
+def attach(path: str) -> FrozenCollection:
+    path = os.path.abspath(path)
+    if path not in _attached:
+        _attached[path] = load(path)
+    return _attached[path]
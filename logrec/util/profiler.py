@@ -1,7 +1,11 @@
 # https://stackoverflow.com/questions/3620943/measuring-elapsed-time-with-the-time-module#answer-3620972
+import json
 import logging
+import math
 import time
-from functools import wraps
+from collections import OrderedDict, Counter
+from functools import wraps, lru_cache
+from typing import Optional, Dict, Any
 
 logger = logging.getLogger(__name__)
 
@@ -38,3 +42,177 @@ def print_prof_data():
 def clear_prof_data():
     global PROF_DATA
     PROF_DATA = {}
+
+
+MEMOS = OrderedDict()
+
+
+def memoized(name: str, maxsize: int):
+    """
+    Bounded LRU memo (one per process) whose hits and misses are reported by `get_memo_counters`.
+    Memoized functions must return immutable values as they are shared between the callers.
+    """
+    def decorator(fn):
+        memo = lru_cache(maxsize=maxsize)(fn)
+        MEMOS[name] = memo
+        return memo
+
+    return decorator
+
+
+def get_memo_counters() -> Counter:
+    counters = Counter()
+    for name, memo in MEMOS.items():
+        cache_info = memo.cache_info()
+        counters[f'{name}.hits'] = cache_info.hits
+        counters[f'{name}.misses'] = cache_info.misses
+    return counters
+
+
+class Histogram(object):
+    """
+    Histogram with logarithmic buckets: each bucket is `GROWTH` times wider than the previous one,
+    so percentiles are estimated with a relative error below `GROWTH - 1` using constant memory.
+    Histograms from different processes can be merged.
+    """
+    GROWTH = 1.05
+    MIN_VALUE = 1e-9
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value: float) -> None:
+        bucket = int(math.floor(math.log(max(value, self.MIN_VALUE) / self.MIN_VALUE, self.GROWTH)))
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: 'Histogram') -> None:
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        if q >= 100:
+            return self.max
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                # middle of the bucket, but never outside of the observed range
+                value = self.MIN_VALUE * self.GROWTH ** (bucket + 0.5)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+
+class StageStats(object):
+    def __init__(self):
+        self.time = Histogram()
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.allocated = Histogram()
+
+    def merge(self, other: 'StageStats') -> None:
+        self.time.merge(other.time)
+        self.tokens_in += other.tokens_in
+        self.tokens_out += other.tokens_out
+        self.allocated.merge(other.allocated)
+
+    def to_dict(self) -> Dict[str, Any]:
+        total_time = self.time.total
+        res = {
+            'time': self.time.to_dict(),
+            'tokens_in': self.tokens_in,
+            'tokens_out': self.tokens_out,
+            'tokens_in_per_second': self.tokens_in / total_time if total_time else None,
+        }
+        if self.allocated.count:
+            res['allocated_bytes'] = self.allocated.to_dict()
+        return res
+
+
+class PipelineStats(object):
+    """
+    Timings, token counts and (if tracemalloc is tracing) allocations of each stage of a pipeline per processed item.
+    Stats are collected in each worker and merged in the main process.
+    """
+    def __init__(self):
+        self.stages = OrderedDict()
+        self.counters = Counter()
+        self.memo_counters = Counter()
+
+    def record(self, stage: str, elapsed: float, tokens_in: int, tokens_out: int,
+               allocated: Optional[int] = None) -> None:
+        if stage not in self.stages:
+            self.stages[stage] = StageStats()
+        stage_stats = self.stages[stage]
+        stage_stats.time.add(elapsed)
+        stage_stats.tokens_in += tokens_in
+        stage_stats.tokens_out += tokens_out
+        if allocated is not None:
+            stage_stats.allocated.add(allocated)
+
+    def merge(self, other: 'PipelineStats') -> None:
+        for stage, stage_stats in other.stages.items():
+            if stage not in self.stages:
+                self.stages[stage] = StageStats()
+            self.stages[stage].merge(stage_stats)
+        self.counters.update(other.counters)
+        self.memo_counters.update(other.memo_counters)
+
+    def add_memo_counters(self, before: Counter, after: Counter) -> None:
+        """
+        Memo counters are cumulative in each process, only the difference since `before` is added.
+        """
+        for key, value in after.items():
+            self.memo_counters[key] += value - before[key]
+
+    def _memos_to_dict(self) -> Dict[str, Any]:
+        res = OrderedDict()
+        for key in self.memo_counters:
+            name = key[:key.rindex('.')]
+            if name not in res:
+                hits, misses = self.memo_counters[f'{name}.hits'], self.memo_counters[f'{name}.misses']
+                res[name] = {'hits': hits, 'misses': misses,
+                             'hit_rate': hits / (hits + misses) if hits + misses else None}
+        return res
+
+    def to_dict(self) -> Dict[str, Any]:
+        total_time = sum(stage_stats.time.total for stage_stats in self.stages.values())
+        return {
+            'total_time': total_time,
+            'counters': dict(self.counters),
+            'memos': self._memos_to_dict(),
+            'stages': {stage: dict(stage_stats.to_dict(),
+                                   time_share=stage_stats.time.total / total_time if total_time else None)
+                       for stage, stage_stats in self.stages.items()}
+        }
+
+    def dump(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
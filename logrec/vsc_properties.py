@@ -19,6 +19,13 @@ with open(os.path.join(base_project_dir, 'VERSION'), 'r') as f:
 
 DEFAULT_RAW_DATASETS_DIR = os.path.join(base_dir, 'raw_datasets', 'allamanis')
 DEFAULT_PARSED_DATASETS_DIR = os.path.join(base_dir, 'prep_datasets', f'v{major_version}')
+DEFAULT_PARSE_CACHE_DIR = os.path.join(base_dir, 'parse_cache')
+DEFAULT_BPE_CACHE_DIR = os.path.join(base_dir, 'bpe_cache')
+DEFAULT_ARTIFACTS_DIR = os.path.join(base_dir, 'artifacts')
+
+# keep the non-english dictionaries in a sorted word array instead of a set (less memory, slower lookups),
+# memory-mapped from DEFAULT_ARTIFACTS_DIR and shared by all the processes
+COMPACT_NON_ENG_WORD_SET = False
 
 DEFAULT_DATASET = 'nodup_en_only'
 DEFAULT_BPE_N_MERGES = '5000'
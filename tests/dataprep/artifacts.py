@@ -0,0 +1,58 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+from logrec.dataprep import artifacts
+from logrec.util.frozen import FrozenStrMap
+
+
+def get_splitting(params):
+    splittings, word = params
+    return splittings.path, splittings[word]
+
+
+class ArtifactsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.artifacts_dir = os.path.join(self.tmp_dir, 'artifacts')
+        self.splitting_file = os.path.join(self.tmp_dir, 'splittings.txt')
+        self.__write_splittings('logger|log ger\nüberall|über all\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def __write_splittings(self, content):
+        with open(self.splitting_file, 'w') as f:
+            f.write(content)
+
+    def test_built_once(self):
+        splittings = artifacts.get_word_splittings(self.artifacts_dir, self.splitting_file, delim='|')
+
+        self.assertIsInstance(splittings, FrozenStrMap)
+        self.assertEqual({'logger': ['log', 'ger'], 'überall': ['über', 'all']}, dict(splittings.items()))
+        self.assertEqual([os.path.basename(splittings.path)], os.listdir(self.artifacts_dir))
+        self.assertIs(splittings, artifacts.get_word_splittings(self.artifacts_dir, self.splitting_file, delim='|'))
+
+    def test_rebuilt_when_source_changes(self):
+        splittings = artifacts.get_word_splittings(self.artifacts_dir, self.splitting_file, delim='|')
+        self.__write_splittings('logger|lo gger\n')
+        os.utime(self.splitting_file, ns=(0, 0))
+
+        new_splittings = artifacts.get_word_splittings(self.artifacts_dir, self.splitting_file, delim='|')
+
+        self.assertNotEqual(splittings.path, new_splittings.path)
+        self.assertEqual({'logger': ['lo', 'gger']}, dict(new_splittings.items()))
+
+    def test_spawned_workers_attach(self):
+        splittings = artifacts.get_word_splittings(self.artifacts_dir, self.splitting_file, delim='|')
+
+        with multiprocessing.get_context('spawn').Pool(2) as pool:
+            results = pool.map(get_splitting, [(splittings, 'logger'), (splittings, 'überall')])
+
+        self.assertEqual([(splittings.path, ['log', 'ger']), (splittings.path, ['über', 'all'])], results)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from logrec.dataprep.split.bpe_cache import BpeCache
+from logrec.dataprep.split.ngram import NgramSplitConfig, NgramSplittingType, get_bpe_subwords
+from logrec.util.profiler import get_memo_counters
+
+MERGES = {('w', 'h'): 0, ('wh', 'i'): 1}
+
+
+class BpeCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_loaded_by_next_run(self):
+        cache = BpeCache(self.cache_dir, MERGES)
+        cache.put('while', ['whi', 'l', 'e'])
+        self.assertIsNone(BpeCache(self.cache_dir, MERGES).get('while'))
+
+        cache.flush()
+
+        self.assertEqual(['whi', 'l', 'e'], BpeCache(self.cache_dir, MERGES).get('while'))
+
+    def test_flushed_when_buffer_is_full(self):
+        cache = BpeCache(self.cache_dir, MERGES, flush_every=2)
+        cache.put('while', ['whi', 'l', 'e'])
+        cache.put('when', ['wh', 'e', 'n'])
+
+        self.assertEqual(2, len(BpeCache(self.cache_dir, MERGES)))
+
+    def test_different_merges(self):
+        cache = BpeCache(self.cache_dir, MERGES)
+        cache.put('while', ['whi', 'l', 'e'])
+        cache.flush()
+
+        self.assertIsNone(BpeCache(self.cache_dir, {('w', 'h'): 0}).get('while'))
+
+    def test_appended_by_several_caches(self):
+        first, second = BpeCache(self.cache_dir, MERGES), BpeCache(self.cache_dir, MERGES)
+        first.put('while', ['whi', 'l', 'e'])
+        second.put('when', ['wh', 'e', 'n'])
+        second.flush()
+        first.flush()
+
+        cache = BpeCache(self.cache_dir, MERGES)
+        self.assertEqual(['whi', 'l', 'e'], cache.get('while'))
+        self.assertEqual(['wh', 'e', 'n'], cache.get('when'))
+
+    def test_incomplete_line_is_skipped(self):
+        cache = BpeCache(self.cache_dir, MERGES)
+        cache.put('while', ['whi', 'l', 'e'])
+        cache.flush()
+        with open(cache.path, 'a') as f:
+            f.write('when\twh e')
+
+        cache = BpeCache(self.cache_dir, MERGES)
+        self.assertEqual(['whi', 'l', 'e'], cache.get('while'))
+        self.assertIsNone(cache.get('when'))
+
+    def test_duplicates_are_removed_on_load(self):
+        first, second = BpeCache(self.cache_dir, MERGES), BpeCache(self.cache_dir, MERGES)
+        for cache in [first, second]:
+            cache.put('while', ['whi', 'l', 'e'])
+            cache.flush()
+        second.put('when', ['wh', 'e', 'n'])
+        second.flush()
+
+        cache = BpeCache(self.cache_dir, MERGES)
+
+        self.assertEqual(['whi', 'l', 'e'], cache.get('while'))
+        with open(cache.path) as f:
+            self.assertEqual(['while\twhi l e\n', 'when\twh e n\n'], f.readlines())
+
+    def test_number_of_encodings_in_memory_is_bounded(self):
+        cache = BpeCache(self.cache_dir, MERGES, max_size=2)
+        cache.put('while', ['whi', 'l', 'e'])
+        cache.put('when', ['wh', 'e', 'n'])
+        cache.put('whale', ['wh', 'a', 'l', 'e'])
+        cache.flush()
+
+        self.assertEqual([None, ['wh', 'e', 'n'], ['wh', 'a', 'l', 'e']],
+                         [cache.get(word) for word in ['while', 'when', 'whale']])
+        cache = BpeCache(self.cache_dir, MERGES, max_size=2)
+        self.assertEqual([None, ['wh', 'e', 'n'], ['wh', 'a', 'l', 'e']],
+                         [cache.get(word) for word in ['while', 'when', 'whale']])
+        self.assertEqual(3, len(BpeCache(self.cache_dir, MERGES)))
+
+    def test_word_with_whitespace_is_not_written(self):
+        cache = BpeCache(self.cache_dir, MERGES)
+        cache.put('wh\tile', ['wh', '\t', 'i', 'l', 'e'])
+        cache.flush()
+
+        self.assertEqual(['wh', '\t', 'i', 'l', 'e'], cache.get('wh\tile'))
+        self.assertEqual(0, len(BpeCache(self.cache_dir, MERGES)))
+
+
+class GetBpeSubwordsTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def create_config(self):
+        return NgramSplitConfig(splitting_type=NgramSplittingType.BPE, merges=MERGES, merges_cache={},
+                                bpe_cache=BpeCache(self.cache_dir, MERGES))
+
+    def test_encoded_once(self):
+        config = self.create_config()
+        before = get_memo_counters()
+        first = get_bpe_subwords('whale', config)
+        first.append('changed')
+        second = get_bpe_subwords('whale', config)
+        after = get_memo_counters()
+
+        self.assertEqual(['wh', 'a', 'l', 'e'], second)
+        self.assertEqual(1, after['ngram.bpe_subwords.misses'] - before['ngram.bpe_subwords.misses'])
+        self.assertEqual(1, after['ngram.bpe_subwords.hits'] - before['ngram.bpe_subwords.hits'])
+
+    def test_encodings_are_persisted(self):
+        config = self.create_config()
+        get_bpe_subwords('whiskey', config)
+        config.bpe_cache.flush()
+
+        cache = BpeCache(self.cache_dir, MERGES)
+        self.assertEqual(['whi', 's', 'k', 'e', 'y'], cache.get('whiskey'))
+        self.assertTrue(os.path.exists(cache.path))
+
+    def test_persisted_encodings_are_used(self):
+        cache = BpeCache(self.cache_dir, MERGES)
+        cache.put('while', ['w', 'hile'])
+        cache.flush()
+
+        self.assertEqual(['w', 'hile'], get_bpe_subwords('while', self.create_config()))
+
+    def test_merges_cache_comes_first(self):
+        config = self.create_config()
+        config.merges_cache = {'while': ['while']}
+
+        self.assertEqual(['while'], get_bpe_subwords('while', config))
+        self.assertIsNone(config.bpe_cache.get('while'))
+
+
+if __name__ == '__main__':
+    unittest.main()
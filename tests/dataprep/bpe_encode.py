@@ -0,0 +1,84 @@
+import os
+import random
+import sys
+import unittest
+
+from logrec.dataprep import base_project_dir
+from logrec.dataprep.split.bpe_encode import encode_word, encode_words, encode, read_merges
+
+MERGES_FILE = os.path.join(base_project_dir, 'nn-data', 'test', 'test1', 'metadata', '001001', 'bpe', '5000',
+                           'merges.txt')
+
+
+def encode_word_by_rescanning(word, merges):
+    """
+    Reference implementation: merges the leftmost pair with the highest priority until there are no pairs to merge
+    """
+    subwords = " ".join(word).split(" ")
+    while True:
+        merge_index = None
+        merge_candidate_priority = sys.maxsize
+        for i in range(len(subwords) - 1):
+            priority = merges.get((subwords[i], subwords[i + 1]))
+            if priority is not None and priority < merge_candidate_priority:
+                merge_candidate_priority = priority
+                merge_index = i
+        if merge_index is None:
+            return subwords
+        subwords[merge_index:merge_index + 2] = [subwords[merge_index] + subwords[merge_index + 1]]
+
+
+class EncodeWordTest(unittest.TestCase):
+    def test_priorities(self):
+        merges = {('e', 'r'): 0, ('h', 'e'): 1, ('w', 'h'): 2, ('wh', 'er'): 3}
+
+        self.assertEqual(['wher', 'e'], encode_word('where', merges))
+
+    def test_leftmost_pair_first(self):
+        merges = {('a', 'a'): 0, ('aa', 'a'): 1}
+
+        self.assertEqual(['aa', 'aaa'], encode_word('aaaaa', merges))
+        self.assertEqual(['aaa'], encode_word('aaa', merges))
+
+    def test_no_merges(self):
+        self.assertEqual(['i', 'f'], encode_word('if', {}))
+        self.assertEqual(['x'], encode_word('x', {('x', 'x'): 0}))
+        self.assertEqual([''], encode_word('', {}))
+
+    def test_same_as_rescanning_with_random_merges(self):
+        rnd = random.Random(24)
+        for _ in range(200):
+            alphabet = rnd.choice(['ab', 'abc'])
+            merges = {}
+            for priority in range(rnd.randint(1, 30)):
+                pair = tuple(''.join(rnd.choice(alphabet) for _ in range(rnd.randint(1, 3))) for _ in range(2))
+                merges.setdefault(pair, priority)
+            for _ in range(20):
+                word = ''.join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 30)))
+                self.assertEqual(encode_word_by_rescanning(word, merges), encode_word(word, merges), word)
+
+    def test_same_as_rescanning_with_merges_file(self):
+        merges = read_merges(MERGES_FILE)
+        rnd = random.Random(24)
+        letters = sorted({letter for first, second in merges for letter in first + second})
+        words = ['getLogger', 'LoggerFactory', 'toString', 'ArrayIndexOutOfBoundsException'] + \
+                [''.join(rnd.choice(letters) for _ in range(rnd.randint(1, 100))) for _ in range(200)]
+        for word in words:
+            self.assertEqual(encode_word_by_rescanning(word, merges), encode_word(word, merges), word)
+
+
+class EncodeWordsTest(unittest.TestCase):
+    def test_encode_words(self):
+        merges = {('w', 'h'): 0, ('wh', 'i'): 1}
+
+        self.assertEqual({'while': ['whi', 'l', 'e'], 'if': ['i', 'f']},
+                         encode_words(iter(['while', 'if', 'while']), merges))
+
+    def test_encode(self):
+        merges = {('w', 'h'): 0, ('wh', 'i'): 1}
+
+        self.assertEqual({'whi l e': 3, 'i f': 2}, encode({'while': 3, 'if': 2}, merges))
+
+
+if __name__ == '__main__':
+    unittest.main()
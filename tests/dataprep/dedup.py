@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from logrec.dataprep.dedup import fingerprint, find_duplicate_groups, get_skip_list
+
+JAVA_FILE = '''package org.example;
+
+public class Calculator {
+    private static final Logger LOG = LoggerFactory.getLogger(Calculator.class);
+
+    public int add(int first, int second) {
+        LOG.debug("Adding {} and {}", first, second);
+        return first + second;
+    }
+
+    public int subtract(int first, int second) {
+        LOG.debug("Subtracting {} from {}", second, first);
+        return first - second;
+    }
+
+    public int multiply(int first, int second) {
+        LOG.debug("Multiplying {} and {}", first, second);
+        return first * second;
+    }
+}
+'''
+
+
+class DedupTest(unittest.TestCase):
+    def setUp(self):
+        self.dataset_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dataset_dir)
+
+    def __fingerprint(self, rel_path, content):
+        path = os.path.join(self.dataset_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+        return fingerprint((self.dataset_dir, path, 5))
+
+    def test_find_duplicate_groups(self):
+        fingerprints = [
+            self.__fingerprint('train/proj2/Calculator.java', JAVA_FILE),
+            self.__fingerprint('train/proj1/Calculator.java', JAVA_FILE),
+            self.__fingerprint('test/proj3/Calculator.java', JAVA_FILE.replace('org.example', 'com.example')),
+            self.__fingerprint('train/proj1/Other.java', 'class Other {\n    int a;\n}\n'),
+            self.__fingerprint('train/proj1/Short.java', '}'),
+            self.__fingerprint('train/proj2/Short.java', '}'),
+        ]
+
+        groups = find_duplicate_groups(fingerprints)
+
+        expected = [
+            ['test/proj3/Calculator.java', 'train/proj1/Calculator.java', 'train/proj2/Calculator.java'],
+            ['train/proj1/Short.java', 'train/proj2/Short.java']
+        ]
+        self.assertEqual(expected, groups)
+        self.assertEqual(['train/proj1/Calculator.java', 'train/proj2/Calculator.java', 'train/proj2/Short.java'],
+                         get_skip_list(groups))
+
+
+if __name__ == '__main__':
+    unittest.main()
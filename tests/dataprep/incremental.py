@@ -0,0 +1,173 @@
+import random
+import unittest
+
+from logrec.dataprep.incremental import IncrementalPreprocessor, split_lines
+from logrec.dataprep.preprocessors.core import apply_preprocessors
+from logrec.dataprep.preprocessors.general import from_file
+from logrec.dataprep.preprocessors.preprocessor_list import pp_params
+
+JAVA_SOURCE = '''package org.example;
+
+/* A multiline
+ * comment with "quotes" and { brackets }
+ */
+public class Example {
+    private static final Logger LOG = LoggerFactory.getLogger(Example.class);
+
+    // one-line comment with a quote "
+    public void run(int n) {
+        if (n > 0x10) {
+            LOG.info("Running with n = " + n);
+        }
+        logger.debug("done");
+    }
+
+    interface Callback {
+        void call();
+    }
+
+    private String name() {
+        return "name { with } brackets";
+    }
+}
+'''
+
+EDIT_LINES = [
+    '',
+    '    }',
+    '    {',
+    '/*',
+    ' */',
+    '    " unterminated',
+    '    String s = "a /* not a comment */ string";',
+    '    // comment /*',
+    '    log.warn("warning " + x);',
+    '    LOG.error(',
+    '        "error");',
+    '    class Inner {',
+    '    enum Kind { A, B }',
+    '    int x = 3.5e10;',
+    '    private void method() { foo(); }',
+]
+
+
+def preprocess(text):
+    return apply_preprocessors(from_file(split_lines(text)), pp_params['preprocessors'], {})
+
+
+def to_text(lines):
+    return ''.join(line + '\n' for line in lines)
+
+
+def random_edit(lines, rnd):
+    start = rnd.randint(0, len(lines))
+    end = min(len(lines), start + rnd.randint(0, 3))
+    new_lines = [rnd.choice(EDIT_LINES) for _ in range(rnd.randint(0, 3))]
+    return start, end, new_lines
+
+
+
+class CountingIncrementalPreprocessor(IncrementalPreprocessor):
+    """
+    Counts the lines which are lexed and the lines which are passed to the stateful preprocessors
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.n_lexed_lines = 0
+        self.n_processed_lines = 0
+
+    def _lex(self, line):
+        self.n_lexed_lines += 1
+        return super()._lex(line)
+
+    def _get_tokens(self, start_line, end_line):
+        self.n_processed_lines += min(end_line, len(self.lines)) - start_line
+        return super()._get_tokens(start_line, end_line)
+
+class IncrementalPreprocessorTest(unittest.TestCase):
+    def assert_same_as_batch(self, incremental_preprocessor, text):
+        self.assertEqual(repr(preprocess(text)), repr(incremental_preprocessor.token_list))
+
+    def test_set_text(self):
+        incremental_preprocessor = IncrementalPreprocessor()
+        incremental_preprocessor.set_text(JAVA_SOURCE)
+        self.assert_same_as_batch(incremental_preprocessor, JAVA_SOURCE)
+
+    def test_empty_text(self):
+        incremental_preprocessor = IncrementalPreprocessor()
+        self.assertEqual([], incremental_preprocessor.set_text(''))
+
+    def test_update_inside_method(self):
+        incremental_preprocessor = IncrementalPreprocessor()
+        incremental_preprocessor.set_text(JAVA_SOURCE)
+        lines = split_lines(JAVA_SOURCE)
+        lines[11] = '            LOG.warn("Running with " + n);'
+        incremental_preprocessor.update(11, 12, lines[11] + '\n')
+        self.assert_same_as_batch(incremental_preprocessor, to_text(lines))
+
+    def test_unterminated_string_literal_and_fix(self):
+        incremental_preprocessor = IncrementalPreprocessor()
+        incremental_preprocessor.set_text(JAVA_SOURCE)
+        lines = split_lines(JAVA_SOURCE)
+
+        lines.insert(13, '        String s = "unterminated;')
+        incremental_preprocessor.update(13, 13, lines[13])
+        self.assertIsNone(incremental_preprocessor.checkpoints)
+        self.assert_same_as_batch(incremental_preprocessor, to_text(lines))
+
+        lines[13] = '        String s = "terminated";'
+        incremental_preprocessor.update(13, 14, lines[13])
+        self.assertIsNotNone(incremental_preprocessor.checkpoints)
+        self.assert_same_as_batch(incremental_preprocessor, to_text(lines))
+
+    def test_update_text(self):
+        incremental_preprocessor = IncrementalPreprocessor()
+        incremental_preprocessor.set_text(JAVA_SOURCE)
+        new_text = JAVA_SOURCE.replace('interface Callback', 'class Callback')
+        incremental_preprocessor.update_text(new_text)
+        self.assertEqual(split_lines(new_text), incremental_preprocessor.lines)
+        self.assert_same_as_batch(incremental_preprocessor, new_text)
+
+    def test_random_edits(self):
+        rnd = random.Random(17)
+        incremental_preprocessor = IncrementalPreprocessor()
+        incremental_preprocessor.set_text(JAVA_SOURCE)
+        lines = split_lines(JAVA_SOURCE)
+        for _ in range(300):
+            start, end, new_lines = random_edit(lines, rnd)
+            lines[start:end] = new_lines
+            incremental_preprocessor.update(start, end, to_text(new_lines))
+            self.assertEqual(lines, incremental_preprocessor.lines)
+            self.assert_same_as_batch(incremental_preprocessor, to_text(lines))
+
+    def test_invalid_line_range(self):
+        incremental_preprocessor = IncrementalPreprocessor()
+        incremental_preprocessor.set_text(JAVA_SOURCE)
+        with self.assertRaises(ValueError):
+            incremental_preprocessor.update(5, 4, '')
+
+    def test_stateful_preprocessors_must_be_together(self):
+        with self.assertRaises(ValueError):
+            IncrementalPreprocessor(['java.process_comments_and_str_literals', 'loggable.mark'])
+
+    def test_edit_reprocesses_only_nearby_lines(self):
+        text = JAVA_SOURCE * 100
+        incremental_preprocessor = CountingIncrementalPreprocessor()
+        incremental_preprocessor.set_text(text)
+        lines = split_lines(text)
+        self.assertEqual(len(lines), incremental_preprocessor.n_lexed_lines)
+        self.assertGreaterEqual(incremental_preprocessor.n_processed_lines, len(lines))
+
+        edited_line = len(lines) // 2 + 11
+        lines[edited_line] = '            LOG.warn("edited");'
+        incremental_preprocessor.n_lexed_lines = 0
+        incremental_preprocessor.n_processed_lines = 0
+        incremental_preprocessor.update(edited_line, edited_line + 1, lines[edited_line])
+
+        self.assert_same_as_batch(incremental_preprocessor, to_text(lines))
+        self.assertEqual(1, incremental_preprocessor.n_lexed_lines)
+        self.assertLess(incremental_preprocessor.n_processed_lines, len(lines) // 50)
+
+if __name__ == '__main__':
+    unittest.main()
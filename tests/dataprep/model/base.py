@@ -0,0 +1,109 @@
+import pickle
+import unittest
+
+from logrec.dataprep.model.chars import NewLine, Tab, Quote
+from logrec.dataprep.model.containers import SplitContainer, StringLiteral
+from logrec.dataprep.model.logging import LogStatement, INFO, LogLevel
+from logrec.dataprep.model.noneng import NonEng
+from logrec.dataprep.model.numeric import Number, DecimalPoint, E, L, HexStart
+from logrec.dataprep.model.word import Word, Capitalization, ParseableToken, Underscore
+
+
+class FlyweightTest(unittest.TestCase):
+    def test_same_instance(self):
+        self.assertIs(NewLine(), NewLine())
+        self.assertIs(E(), E())
+        self.assertIsNot(NewLine(), Tab())
+
+    def test_unpickled_to_same_instance(self):
+        self.assertIs(NewLine(), pickle.loads(pickle.dumps(NewLine(), pickle.HIGHEST_PROTOCOL)))
+        self.assertIs(DecimalPoint(), pickle.loads(pickle.dumps(DecimalPoint(), pickle.HIGHEST_PROTOCOL)))
+
+
+class SlottedObjectTest(unittest.TestCase):
+    def test_no_dict(self):
+        tokens = [Word.from_('Foo'), ParseableToken('bar'), Number([E()]), NewLine(),
+                  SplitContainer.from_single_token('baz'), StringLiteral([Quote()]), LogStatement()]
+        for token in tokens:
+            self.assertFalse(hasattr(token, '__dict__'), token.__class__)
+
+    def test_pickle_round_trip(self):
+        tokens = [Word.from_('Foo'), Number([Word.from_('1'), DecimalPoint(), Word.from_('5')]),
+                  StringLiteral([Word.from_('str'), Tab()]),
+                  LogStatement(SplitContainer.from_single_token('log'), SplitContainer.from_single_token('info'),
+                               INFO, [StringLiteral([Word.from_('text')])], [])]
+        unpickled = pickle.loads(pickle.dumps(tokens, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(tokens, unpickled)
+        self.assertIs(unpickled[1].parts_of_number[1], DecimalPoint())
+
+    def test_state_pickled_before_slots(self):
+        word = Word.__new__(Word)
+        word.__setstate__({'canonic_form': 'foo', 'capitalization': Capitalization.FIRST_LETTER})
+        self.assertEqual(Word.from_('Foo'), word)
+
+        string_literal = StringLiteral.__new__(StringLiteral)
+        string_literal.__setstate__({'subtokens': [Word.from_('a')], 'non_eng_percent': 0.0, 'non_eng_qty': 0})
+        self.assertEqual(StringLiteral([Word.from_('a')]), string_literal)
+
+    def test_log_statement_eq(self):
+        def log_statement(level):
+            return LogStatement(SplitContainer.from_single_token('log'), SplitContainer.from_single_token('info'),
+                                level, [Word.from_('a')], [])
+
+        self.assertEqual(log_statement(INFO), log_statement(LogLevel(2, INFO.repr)))
+        self.assertNotEqual(log_statement(INFO), log_statement(LogLevel(3, INFO.repr)))
+
+
+class ImmutableTest(unittest.TestCase):
+    def test_cannot_be_changed(self):
+        word = Word.from_('Foo')
+        with self.assertRaises(AttributeError):
+            word.canonic_form = 'bar'
+        split_container = SplitContainer.from_single_token('foo')
+        with self.assertRaises(AttributeError):
+            split_container.add(Word.from_('bar'))
+        with self.assertRaises(AttributeError):
+            NewLine().foo = 1
+
+    def test_hashable(self):
+        tokens = [SplitContainer([Word.from_('get'), Word.from_('Foo')]), Number([Word.from_('1'), L()]),
+                  NonEng(Word.from_('bar')), Word.from_('Baz'), ParseableToken('qux'), NewLine(), E()]
+        equal_tokens = [SplitContainer([Word.from_('get'), Word.from_('Foo')]), Number([Word.from_('1'), L()]),
+                        NonEng(Word.from_('bar')), Word.from_('Baz'), ParseableToken('qux'), NewLine(), E()]
+        counts = {}
+        for token in tokens + equal_tokens:
+            counts[token] = counts.get(token, 0) + 1
+        self.assertEqual({token: 2 for token in tokens}, counts)
+        self.assertNotEqual(hash(SplitContainer.from_single_token('foo')), hash(SplitContainer.from_single_token('Foo')))
+
+    def test_str_is_cached(self):
+        split_container = SplitContainer([Word.from_('get'), Underscore(), NonEng(Word.from_('Foo'))])
+        self.assertEqual('get_Foo', str(split_container))
+        self.assertIs(str(split_container), str(split_container))
+        self.assertEqual('0x1fl', str(Number([HexStart(), Word.from_('1'), Word.from_('f'), L()])))
+
+    def test_list_of_caller_is_copied(self):
+        subtokens = [Word.from_('get'), Word.from_('Foo')]
+        split_container = SplitContainer(subtokens)
+        hash_before = hash(split_container)
+        parts_of_number = [Word.from_('1'), L()]
+        number = Number(parts_of_number)
+        subtokens.append(Word.from_('Bar'))
+        parts_of_number.append(E())
+
+        self.assertEqual('getFoo', str(split_container))
+        self.assertEqual(hash_before, hash(split_container))
+        self.assertEqual(SplitContainer([Word.from_('get'), Word.from_('Foo')]), split_container)
+        self.assertEqual('1l', str(number))
+
+    def test_cache_is_not_pickled(self):
+        split_container = SplitContainer([Word.from_('get'), Word.from_('Foo')])
+        hash(split_container), str(split_container)
+        unpickled = pickle.loads(pickle.dumps(split_container, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(([Word.from_('get'), Word.from_('Foo')],), unpickled.__getstate__())
+        self.assertEqual('getFoo', str(unpickled))
+        self.assertEqual(hash(split_container), hash(unpickled))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import itertools
+import unittest
+
+import numpy as np
+
+from logrec.dataprep.model.chars import NewLine
+from logrec.dataprep.model.containers import SplitContainer, StringLiteral, OneLineComment
+from logrec.dataprep.model.noneng import NonEng
+from logrec.dataprep.model.word import Word, Capitalization
+from logrec.dataprep.model.tokenstream import TokenStream
+from logrec.dataprep.parsed_bin import Kind, StringTable
+from logrec.dataprep.prepconfig import PrepConfig
+from logrec.dataprep.preprocessors.core import apply_preprocessors
+from logrec.dataprep.preprocessors.general import from_file
+from logrec.dataprep.preprocessors.preprocessor_list import pp_params
+from logrec.dataprep.split.ngram import NgramSplitConfig
+from logrec.dataprep.to_repr import to_repr
+
+JAVA_SOURCE = '''package org.example;
+
+/* Описание класса на другом языке, который не английский */
+public class Example {
+    private static final Logger LOG = LoggerFactory.getLogger(Example.class);
+
+    // комментарий на другом языке, который не английский
+    public void run(int n) {
+        if (n > 0x10 && n < 3.5e10) {
+            LOG.info("Running with n = " + n + " строка на другом языке, не английский");
+        }
+        logger.debug("done");
+        String s = "a /* not a comment */ string";
+    }
+
+    interface Callback {
+        void call();
+    }
+}
+'''
+
+
+def preprocess(text):
+    return apply_preprocessors(from_file(text.split('\n')), pp_params['preprocessors'], {})
+
+
+class TokenStreamTest(unittest.TestCase):
+    def test_round_trip(self):
+        token_list = preprocess(JAVA_SOURCE)
+        self.assertEqual(repr(token_list), repr(TokenStream.from_token_list(token_list).to_token_list()))
+
+    def test_to_repr_list_same_as_for_token_list(self):
+        token_list = preprocess(JAVA_SOURCE)
+        token_stream = TokenStream.from_token_list(token_list)
+        for params in itertools.product('023', '0123', '0123', '01', '01', '01'):
+            try:
+                prep_config = PrepConfig.from_encoded_string(''.join(params))
+            except ValueError:
+                # unsupported combination of params
+                continue
+            self.assertEqual(to_repr(prep_config, token_list, NgramSplitConfig()),
+                             to_repr(prep_config, token_stream, NgramSplitConfig()), prep_config)
+
+    def test_to_repr_list_of_non_eng_content(self):
+        non_eng_words = [NonEng(Word.from_(w)) for w in ['описание', 'класса', 'на', 'другом']]
+        token_list = [StringLiteral(non_eng_words), OneLineComment(non_eng_words + [Word.from_('a')]), NewLine()]
+        token_stream = TokenStream.from_token_list(token_list)
+        for encoded_prep_config in ['201100', '211100', '101100']:
+            prep_config = PrepConfig.from_encoded_string(encoded_prep_config)
+            self.assertEqual(to_repr(prep_config, token_list, NgramSplitConfig()),
+                             to_repr(prep_config, token_stream, NgramSplitConfig()))
+
+    def test_ends_and_depths(self):
+        token_stream = TokenStream.from_token_list(['a', SplitContainer([Word.from_('b'), Word.from_('C')]), 'd'])
+        self.assertEqual([0, 4, 2, 3, 4, 5], token_stream.ends.tolist())
+        self.assertEqual([0, 0, 1, 1, 1, 0], token_stream.depths().tolist())
+        self.assertEqual([True, True, False, False, False, True], token_stream.top_level_mask().tolist())
+
+    def test_counts(self):
+        string_table = StringTable()
+        token_stream = TokenStream.from_token_list([Word.from_('Foo'), Word.from_('foo'), NewLine(), 'bar',
+                                                    Word.from_('baz')], string_table)
+        self.assertEqual(2, token_stream.count_kinds()[Kind.WORD_NONE])
+        self.assertEqual(1, token_stream.count_kinds()[Kind.NEW_LINE])
+        counts = token_stream.count_strings()
+        self.assertEqual(2, counts[string_table.ids['foo']])
+        self.assertEqual(0, counts[string_table.ids['bar']])
+        self.assertEqual(1, counts[string_table.ids['baz']])
+
+    def test_lowercased(self):
+        token_stream = TokenStream.from_token_list([Word.from_('Foo'), Word.from_('BAR'), Word.from_('baz')])
+        self.assertEqual([Word('foo', Capitalization.NONE), Word('bar', Capitalization.NONE),
+                          Word('baz', Capitalization.NONE)], token_stream.lowercased().to_token_list())
+        self.assertEqual(np.uint8, token_stream.lowercased().kinds.dtype)
+
+    def test_words(self):
+        token_stream = TokenStream.from_token_list([Word.from_('Foo'), SplitContainer([Word.from_('foo'),
+                                                                                       Word.from_('BAR')]),
+                                                    NewLine(), 'baz', Word.from_('foo')])
+        self.assertEqual({'foo', 'bar'}, token_stream.words(lowercase=True))
+        self.assertEqual({'Foo', 'foo', 'BAR'}, token_stream.words(lowercase=False))
+        self.assertEqual(set(), TokenStream.from_token_list([]).words(lowercase=False))
+
+
+if __name__ == '__main__':
+    unittest.main()
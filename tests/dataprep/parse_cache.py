@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from logrec.dataprep.model.containers import SplitContainer
+from logrec.dataprep.model.word import Word
+from logrec.dataprep.parse_cache import ParseCache, hash_content, hash_sources, prune
+
+
+class ParseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_hit_and_miss(self):
+        cache = ParseCache(self.cache_dir, ['general.spl_verbose'])
+        content_hash = hash_content(['class A {\n', '}\n'])
+        token_list = [SplitContainer.from_single_token('class'), SplitContainer([Word.from_('A')]), '{', '}']
+
+        self.assertIsNone(cache.get(content_hash))
+        cache.put(content_hash, token_list)
+
+        self.assertEqual(token_list, cache.get(content_hash))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(1, cache.misses)
+
+    def test_different_preprocessors(self):
+        content_hash = hash_content(['}\n'])
+        ParseCache(self.cache_dir, ['general.spl_verbose']).put(content_hash, ['}'])
+
+        self.assertIsNone(ParseCache(self.cache_dir, ['general.spl_verbose', 'split.simple_split']).get(content_hash))
+
+    def test_broken_entry(self):
+        cache = ParseCache(self.cache_dir, ['general.spl_verbose'])
+        content_hash = hash_content(['}\n'])
+        cache.put(content_hash, ['}'])
+        with open(os.path.join(cache.path, content_hash[:2], content_hash), 'wb') as f:
+            f.write(b'garbage')
+
+        self.assertIsNone(cache.get(content_hash))
+
+    def test_prune_removes_least_recently_used(self):
+        cache = ParseCache(self.cache_dir, ['general.spl_verbose'])
+        content_hashes = [hash_content([f'class A{i} {{}}\n']) for i in range(3)]
+        for i, content_hash in enumerate(content_hashes):
+            # does not compress, so each entry takes more than half a megabyte
+            cache.put(content_hash, [os.urandom(600 * 1024)])
+            mtime = time.time() - 100 + i
+            os.utime(os.path.join(cache.path, content_hash[:2], content_hash), (mtime, mtime))
+        self.assertIsNotNone(cache.get(content_hashes[0]))
+
+        prune(self.cache_dir, max_size_mb=1)
+
+        self.assertEqual([True, False, False], [cache.get(content_hash) is not None for content_hash in content_hashes])
+
+class HashSourcesTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.dir, 'preprocessors'))
+        self.write('preprocessors/java.py', 'def f(): pass\n')
+        self.write('langchecker.py', 'x = 1\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, path, text):
+        with open(os.path.join(self.dir, path), 'w') as f:
+            f.write(text)
+
+    def test_changed_when_source_changes(self):
+        sources = ['preprocessors', 'langchecker.py']
+        before = hash_sources(self.dir, sources)
+        self.write('preprocessors/notes.txt', 'not a module')
+        self.assertEqual(before, hash_sources(self.dir, sources))
+
+        self.write('preprocessors/java.py', 'def f(): return 1\n')
+        self.assertNotEqual(before, hash_sources(self.dir, sources))
+
+
+if __name__ == '__main__':
+    unittest.main()
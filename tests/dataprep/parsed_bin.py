@@ -0,0 +1,128 @@
+import gzip
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from logrec.dataprep import base_project_dir
+from logrec.dataprep.model.chars import NewLine, Tab
+from logrec.dataprep.model.containers import SplitContainer, StringLiteral, OneLineComment
+from logrec.dataprep.model.logging import LogStatement, LoggableBlock, INFO
+from logrec.dataprep.model.noneng import NonEng
+from logrec.dataprep.model.numeric import Number, HexStart, L
+from logrec.dataprep.model.word import Word, Underscore
+from logrec.dataprep.parsed_bin import ParsedBinWriter, ParsedBinReader, convert, iter_token_lists, \
+    encode_token_list, StringTable, merge
+from logrec.dataprep.preprocessors import apply_preprocessors
+from logrec.dataprep.preprocessors.general import from_file
+from logrec.dataprep.preprocessors.preprocessor_list import pp_params
+
+PATH_TO_RAW_PROJECT = os.path.join(base_project_dir, 'nn-data', 'test', 'raw', 'test1', 'train', '0_proj1')
+
+
+def preprocess_test_project():
+    token_lists = []
+    for file in sorted(os.listdir(PATH_TO_RAW_PROJECT)):
+        with open(os.path.join(PATH_TO_RAW_PROJECT, file), 'r') as f:
+            token_lists.append(apply_preprocessors(from_file([line for line in f]), pp_params['preprocessors'],
+                                                   {'interesting_context_words': []}))
+    return token_lists
+
+
+def _strings_of(token_list):
+    string_table = StringTable()
+    encode_token_list(token_list, string_table)
+    return string_table.strings
+
+
+class ParsedBinTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def __write(self, token_lists, name='proj', preprocessing_param_dict=None):
+        path = os.path.join(self.tmp_dir, f'{name}.parsedbin')
+        with ParsedBinWriter(path, preprocessing_param_dict or {'param': None}) as writer:
+            for token_list in token_lists:
+                writer.write(token_list)
+        return path
+
+    def test_all_token_types(self):
+        token_lists = [
+            [NewLine(), SplitContainer([Underscore(), Word.from_('my'), NonEng(Word.from_('Wirklich'))]), '{', Tab(),
+             Number(['-', HexStart(), '3', 'a', L()]),
+             LoggableBlock([LogStatement(SplitContainer.from_single_token('LOG'),
+                                         SplitContainer.from_single_token('info'), INFO,
+                                         [StringLiteral([SplitContainer.from_single_token('Hi')])], [NewLine()])]),
+             OneLineComment([SplitContainer.from_single_token('ÜBER')]), '}'],
+            [],
+            ['}']
+        ]
+
+        path = self.__write(token_lists)
+
+        with ParsedBinReader(path) as reader:
+            self.assertEqual(3, len(reader))
+            self.assertEqual({'param': None}, reader.preprocessing_param_dict)
+            self.assertEqual(token_lists, list(reader))
+
+    def test_random_access(self):
+        token_lists = preprocess_test_project()
+
+        path = self.__write(token_lists)
+
+        with ParsedBinReader(path) as reader:
+            self.assertEqual(token_lists[3], reader.token_list(3))
+            self.assertEqual(token_lists[0], reader.token_list(0))
+            kinds, values = reader.token_arrays(1)
+            expected_kinds, _ = encode_token_list(token_lists[1], StringTable())
+            self.assertEqual(expected_kinds.tobytes(), kinds.tobytes())
+            self.assertEqual(len(kinds), len(values))
+            with self.assertRaises(IndexError):
+                reader.token_arrays(len(token_lists))
+
+    def test_convert(self):
+        token_lists = preprocess_test_project()
+        parsed_file = os.path.join(self.tmp_dir, 'proj.parsed')
+        with gzip.GzipFile(parsed_file, 'wb') as f:
+            pickle.dump({'param': None}, f, pickle.HIGHEST_PROTOCOL)
+            for token_list in token_lists:
+                pickle.dump(token_list, f, pickle.HIGHEST_PROTOCOL)
+
+        bin_file = convert(parsed_file)
+
+        self.assertEqual(os.path.join(self.tmp_dir, 'proj.parsedbin'), bin_file)
+        self.assertEqual(list(iter_token_lists(parsed_file)), list(iter_token_lists(bin_file)))
+
+    def test_merge(self):
+        token_lists = preprocess_test_project()
+        batches = [self.__write(token_lists[:2], 'batch0'), self.__write([], 'batch1'),
+                   self.__write(token_lists[2:], 'batch2', {'param': 'other'})]
+        path = os.path.join(self.tmp_dir, 'merged.parsedbin')
+
+        merge(batches, path)
+
+        with ParsedBinReader(path) as reader:
+            self.assertEqual({'param': None}, reader.preprocessing_param_dict)
+            self.assertEqual(token_lists, list(reader))
+            self.assertEqual(len({s for token_list in token_lists for s in _strings_of(token_list)}),
+                             reader.n_strings)
+
+    def test_token_streams_outlive_reader(self):
+        token_lists = preprocess_test_project()
+        path = self.__write(token_lists)
+
+        token_streams = list(iter_token_lists(path, token_streams=True))
+
+        self.assertEqual(token_lists, [token_stream.to_token_list() for token_stream in token_streams])
+        reader = token_streams[0].get_string.__self__.reader
+        self.assertFalse(reader._mm.closed)
+        del token_streams
+        self.assertTrue(reader._mm.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
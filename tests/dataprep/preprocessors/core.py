@@ -1,5 +1,7 @@
+import os
 import unittest
 
+from logrec.dataprep import base_project_dir
 from logrec.dataprep.model.noneng import NonEng
 from logrec.dataprep.model.word import Word, Underscore
 from logrec.dataprep.preprocessors.preprocessor_list import pp_params
@@ -340,5 +342,19 @@ MyClass Class CONSTANT VAR_WITH_UNDERSCORES
         self.__test_apply_preprocessors(text, expected_result)
 
 
+class StreamingTest(unittest.TestCase):
+    def test_same_as_not_streaming(self):
+        path_to_corpus = os.path.join(base_project_dir, 'nn-data', 'test', 'raw')
+        for root, dirs, files in os.walk(path_to_corpus):
+            for file in files:
+                with open(os.path.join(root, file), 'r', encoding='ISO-8859-1') as f:
+                    lines = [line for line in f]
+                expected = apply_preprocessors(from_file(lines), pp_params["preprocessors"],
+                                               {'interesting_context_words': []})
+                actual = apply_preprocessors(from_file(lines), pp_params["preprocessors"],
+                                             {'interesting_context_words': []}, streaming=True)
+                self.assertEqual(repr(expected), repr(actual), file)
+
+
 if __name__ == '__main__':
     unittest.main()
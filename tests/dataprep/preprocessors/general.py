@@ -1,11 +1,26 @@
+import os
 import unittest
 
+from logrec.dataprep import base_project_dir
+from logrec.dataprep.preprocessors import java
 from logrec.dataprep.preprocessors.general import spl_verbose
+from logrec.dataprep.preprocessors.legacy import spl
 from logrec.dataprep.model.chars import MultilineCommentStart, MultilineCommentEnd, OneLineCommentStart, \
     Quote, Backslash, Tab
 from logrec.dataprep.model.word import ParseableToken
 
 
+def spl_verbose_legacy(token_list, context):
+    '''
+    Reference implementation of `spl_verbose`: the cascade of splits by the multiline comment tokens,
+    then by the two-char and the one-char tokens
+    '''
+    return spl(token_list,
+               java.multiline_comments_tokens,
+               java.two_character_tokens + java.two_char_verbose,
+               java.one_character_tokens + java.one_char_verbose)
+
+
 class GeneralTest(unittest.TestCase):
     def test_split_verbose1(self):
         text = '''
@@ -132,6 +147,23 @@ logger.info("The value is " + val);
 
         self.assertEqual(expected, actual)
 
+    def __assert_same_as_legacy(self, lines):
+        for line in lines:
+            actual = spl_verbose([ParseableToken(line)], None)
+            expected = spl_verbose_legacy([ParseableToken(line)], None)
+            self.assertEqual([(type(t), str(t)) for t in expected], [(type(t), str(t)) for t in actual], repr(line))
+
+    def test_split_verbose_overlapping_comment_tokens(self):
+        self.__assert_same_as_legacy(['//*', '**/', '/**/', '***/', '*/*', 'a///*b', '+++=', 'x <<= 1;', '\t\t a \t'])
+
+    def test_split_verbose_same_as_legacy_on_test_corpus(self):
+        path_to_corpus = os.path.join(base_project_dir, 'nn-data')
+        for root, dirs, files in os.walk(path_to_corpus):
+            for file in files:
+                if file.endswith('.java'):
+                    with open(os.path.join(root, file), 'r', encoding='ISO-8859-1') as f:
+                        self.__assert_same_as_legacy([line.rstrip('\n') for line in f])
+
 
 if __name__ == '__main__':
     unittest.main()
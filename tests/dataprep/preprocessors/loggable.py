@@ -1,3 +1,6 @@
+import os
+import time
+import tracemalloc
 import unittest
 
 from logrec.dataprep.preprocessors import loggable
@@ -5,6 +8,25 @@ from logrec.dataprep.model.chars import NewLine
 from logrec.dataprep.model.containers import MultilineComment, StringLiteral, SplitContainer
 from logrec.dataprep.model.logging import LoggableBlock
 
+N_METHODS_IN_SYNTHETIC_CLASS = 2000
+
+# the benchmarks depend on the speed of the machine, so they are only run if this environment variable is set
+RUN_BENCHMARKS = bool(os.environ.get('LOGREC_BENCHMARKS'))
+
+
+def synthetic_class_body(n_methods):
+    tokens = [SplitContainer.from_single_token('class'), SplitContainer.from_single_token('A'), '{']
+    for i in range(n_methods):
+        tokens.extend([SplitContainer.from_single_token('void'), SplitContainer.from_single_token(f'method{i}'),
+                       '(', ')', '{',
+                       SplitContainer.from_single_token('if'), '(', SplitContainer.from_single_token('a'), ')', '{',
+                       SplitContainer.from_single_token('a'), '.', SplitContainer.from_single_token('b'), '(',
+                       StringLiteral([SplitContainer.from_single_token('class')]), ')', ';', NewLine(),
+                       '}', SplitContainer.from_single_token('a'), '.', SplitContainer.from_single_token('class'),
+                       ';', '}'])
+    tokens.append('}')
+    return tokens
+
 
 class MarkLogTest(unittest.TestCase):
     def test_nested_data_class(self):
@@ -100,6 +122,37 @@ class MarkLogTest(unittest.TestCase):
 
         actual = loggable.mark(input, None)
 
+    def test_synthetic_class_body(self):
+        actual = loggable.mark(synthetic_class_body(N_METHODS_IN_SYNTHETIC_CLASS), None)
+
+        self.assertEqual(3 + 5 * N_METHODS_IN_SYNTHETIC_CLASS + 1, len(actual))
+        self.assertTrue(all(isinstance(actual[i], LoggableBlock) for i in range(7, len(actual) - 1, 5)))
+
+
+@unittest.skipUnless(RUN_BENCHMARKS, 'set LOGREC_BENCHMARKS to run the benchmarks')
+class MarkBenchmarkTest(unittest.TestCase):
+    # generous bounds, the fast path allocates nothing per token apart from the slots of the output lists
+    MAX_ALLOCATED_BYTES_PER_TOKEN = 32
+    MAX_SECONDS_PER_TOKEN = 5e-6
+
+    def test_synthetic_class_body(self):
+        input = synthetic_class_body(N_METHODS_IN_SYNTHETIC_CLASS)
+
+        tracemalloc.start()
+        try:
+            allocated_before, _ = tracemalloc.get_traced_memory()
+            loggable.mark(input, None)
+            allocated_after, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        start = time.perf_counter()
+        loggable.mark(input, None)
+        elapsed = time.perf_counter() - start
+
+        self.assertLess((peak - allocated_before) / len(input), self.MAX_ALLOCATED_BYTES_PER_TOKEN)
+        self.assertLess(elapsed / len(input), self.MAX_SECONDS_PER_TOKEN)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -176,6 +176,18 @@ class MarkLogTest(unittest.TestCase):
 
         self.assertEqual(input, actual)
 
+    def test_identifier_verdict(self):
+        self.assertEqual((True, None), logs.get_identifier_verdict('LOGGER'))
+        self.assertEqual((False, DEBUG), logs.get_identifier_verdict('logD'))
+        self.assertEqual((False, FATAL), logs.get_identifier_verdict('f'))
+        self.assertEqual((False, None), logs.get_identifier_verdict('logs'))
+
+    def test_identifier_to_str(self):
+        for token in [SplitContainer.from_single_token('Logger'),
+                      SplitContainer([Word.from_('log'), Word.from_('V')]),
+                      SplitContainer([Underscore(), Word.from_('LOG')])]:
+            self.assertEqual(str(token), logs.identifier_to_str(token))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -7,10 +7,12 @@ from logrec.dataprep.model.logging import INFO, LogStatement, LoggableBlock
 from logrec.dataprep.model.noneng import NonEng
 from logrec.dataprep.model.numeric import DecimalPoint, Number
 from logrec.dataprep.model.placeholders import placeholders
-from logrec.dataprep.model.word import Word, Underscore
+from logrec.dataprep.model.word import Word, Underscore, ParseableToken
 from logrec.dataprep.prepconfig import PrepParam, PrepConfig
 from logrec.dataprep.split.ngram import NgramSplittingType, NgramSplitConfig
-from logrec.dataprep.to_repr import to_repr
+from logrec.dataprep.preprocessors.repr import torepr, to_repr_list, ReprConfig
+from logrec.dataprep.to_repr import to_repr, get_repr_config
+from logrec.util.profiler import get_memo_counters
 
 pl = placeholders
 
@@ -604,5 +606,55 @@ class TeprTest(unittest.TestCase):
         self.assertEqual(expected, actual)
 
 
+class MemoizedReprTest(unittest.TestCase):
+    def setUp(self):
+        self.prep_config = PrepConfig.from_encoded_string('011101')
+        self.ngram_split_config = NgramSplitConfig(splitting_type=NgramSplittingType.BPE,
+                                                   merges={('w', 'h'): 0}, merges_cache={})
+
+    def test_same_token_is_rendered_once(self):
+        token = SplitContainer.from_single_token("While")
+        before = get_memo_counters()
+        first = to_repr(self.prep_config, [token], self.ngram_split_config)
+        middle = get_memo_counters()
+        second = to_repr(self.prep_config, [SplitContainer.from_single_token("While")], self.ngram_split_config)
+        after = get_memo_counters()
+
+        self.assertEqual(first, second)
+        self.assertLess(before['repr.torepr.misses'], middle['repr.torepr.misses'])
+        self.assertEqual(middle['repr.torepr.misses'], after['repr.torepr.misses'])
+        self.assertEqual(1, after['repr.torepr.hits'] - middle['repr.torepr.hits'])
+
+    def test_memoized_result_is_not_shared(self):
+        repr_config = get_repr_config(str(self.prep_config), self.ngram_split_config)
+        token = SplitContainer.from_single_token("While")
+        torepr(token, repr_config).append("changed")
+
+        self.assertEqual([pl['word_start'], pl['capital'], "wh", "i", "l", "e", pl["word_end"]],
+                         torepr(token, repr_config))
+
+    def test_configs_are_memoized_separately(self):
+        token = [SplitContainer.from_single_token("While")]
+        no_splitting = PrepConfig.from_encoded_string('010100')
+
+        self.assertEqual([pl['word_start'], pl['capital'], "wh", "i", "l", "e", pl["word_end"]],
+                         to_repr(self.prep_config, token, self.ngram_split_config))
+        self.assertEqual(["While"], to_repr(no_splitting, token, self.ngram_split_config))
+
+    def test_dispatch_table(self):
+        repr_config = get_repr_config(str(self.prep_config), self.ngram_split_config)
+        to_repr_list([Word.from_("a"), NewLine(), "b"], repr_config)
+
+        self.assertTrue({Word, NewLine, str} <= set(repr_config.renderers))
+        self.assertIs(repr_config, get_repr_config(str(self.prep_config), self.ngram_split_config))
+
+    def test_parseable_token(self):
+        with self.assertRaises(AssertionError):
+            torepr(ParseableToken("a"), ReprConfig.empty())
+
+    def test_empty_config_is_shared(self):
+        self.assertIs(ReprConfig.empty(), ReprConfig.empty())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+from collections import Counter
+
+import numpy as np
+
+from logrec.dataprep.model.placeholders import placeholders
+from logrec.dataprep.preprocessors.general import to_token_list
+from logrec.dataprep.reprbin import ReprBinWriter, ReprBinReader, merge, iter_repr_lines, iter_repr_tokens, \
+    iter_repr_files, count_repr_tokens
+
+REPR_LISTS = [
+    ['public', 'class', 'A', '{', 'String', 's', '=', '"', "it's", '\n', '"', ';', '}'],
+    [],
+    ['A', 'a', '=', 'new', 'A', '(', ')', ';', 'ц', '\\'],
+]
+
+
+class ReprBinTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def __write(self, name, repr_lists):
+        path = os.path.join(self.tmp_dir, f'{name}.parsed.reprbin')
+        with ReprBinWriter(path) as writer:
+            for repr_list in repr_lists:
+                writer.write(repr_list)
+        return path
+
+    def __write_text(self, name, repr_lists):
+        path = os.path.join(self.tmp_dir, f'{name}.parsed.repr')
+        with open(path, 'w') as f:
+            for repr_list in repr_lists:
+                f.write(to_token_list(repr_list))
+        return path
+
+    def test_same_lines_as_text(self):
+        path = self.__write('a', REPR_LISTS)
+        text_path = self.__write_text('b', REPR_LISTS)
+
+        self.assertEqual(list(iter_repr_lines(text_path)), list(iter_repr_lines(path)))
+        self.assertEqual(list(iter_repr_tokens(text_path)), list(iter_repr_tokens(path)))
+        self.assertEqual(count_repr_tokens(text_path), count_repr_tokens(path))
+
+    def test_reader(self):
+        path = self.__write('a', REPR_LISTS)
+        with ReprBinReader(path) as reader:
+            self.assertEqual(3, len(reader))
+            self.assertEqual(np.uint16, reader.token_ids(0).dtype)
+            self.assertEqual(['A', 'a', '=', 'new', 'A', '(', ')', ';', 'ц', '\\\\', placeholders['ect']],
+                             reader.tokens(2))
+            self.assertEqual(reader.token_ids(2)[0], reader.token_ids(2)[4])
+            self.assertEqual([14, 2, 11], reader.line_lengths().tolist())
+            with self.assertRaises(IndexError):
+                reader.token_ids(3)
+
+    def test_large_string_table(self):
+        repr_lists = [[str(i) for i in range(70000)], ['0', '69999']]
+        with ReprBinReader(self.__write('a', repr_lists)) as reader:
+            self.assertEqual(np.uint32, reader.token_ids(0).dtype)
+            self.assertEqual(['0', '69999', placeholders['ect']], reader.tokens(1))
+
+    def test_merge(self):
+        paths = [self.__write('a', REPR_LISTS[:2]), self.__write('b', REPR_LISTS[2:]), self.__write('c', [])]
+        merged_path = os.path.join(self.tmp_dir, 'merged.reprbin')
+
+        merge(paths, merged_path)
+
+        self.assertEqual(list(iter_repr_lines(self.__write('d', REPR_LISTS))), list(iter_repr_lines(merged_path)))
+
+    def test_remap_ids(self):
+        with ReprBinReader(self.__write('a', REPR_LISTS[2:])) as reader:
+            ids = reader.remap_ids({'<unk>': 0, 'A': 1, '=': 2}, 0)
+        self.assertEqual([1, 0, 2, 0, 1, 0, 0, 0, 0, 0, 0], ids.tolist())
+
+    def test_count_tokens(self):
+        with ReprBinReader(self.__write('a', REPR_LISTS[2:])) as reader:
+            self.assertEqual(Counter({'A': 2, 'a': 1, '=': 1, 'new': 1, '(': 1, ')': 1, ';': 1, 'ц': 1, '\\\\': 1,
+                                      placeholders['ect']: 1}), reader.count_tokens())
+
+    def test_iter_repr_files_prefers_bin(self):
+        self.__write('a', REPR_LISTS)
+        self.__write_text('a', REPR_LISTS)
+        self.__write_text('b', REPR_LISTS)
+
+        self.assertEqual(['a.parsed.reprbin', 'b.parsed.repr'],
+                         sorted(os.path.basename(path) for path in iter_repr_files(self.tmp_dir)))
+
+
+if __name__ == '__main__':
+    unittest.main()
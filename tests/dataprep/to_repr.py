@@ -0,0 +1,229 @@
+import gzip
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from functools import partial
+from multiprocessing.pool import ThreadPool
+
+from logrec.dataprep.model.chars import NewLine
+from logrec.dataprep.model.containers import SplitContainer, StringLiteral
+from logrec.dataprep.model.word import Word
+from logrec.dataprep.preprocessors.general import to_token_list
+from logrec.dataprep.prepconfig import PrepConfig
+from logrec.dataprep.split.ngram import NgramSplitConfig
+from logrec.dataprep import reprbin
+from logrec.dataprep.parsed_bin import convert, iter_token_lists
+from logrec.dataprep.reprbin import iter_repr_lines
+from logrec.dataprep.to_repr import to_repr, to_reprs, preprocess_and_write, init_splitting_configs, \
+    get_global_n_gramm_splitting_config, split_into_chunks, finish_chunked_file, REPR_EXTENSION, collect_words, \
+    encode_unique_words, init_worker_splitting_configs, global_n_gramm_splitting_configs
+from logrec.dataprep.util import read_dict_from_2_columns
+from logrec.util.frozen import FrozenStrMap
+
+TOKEN_LISTS = [
+    [SplitContainer.from_single_token("getName"), NewLine(), StringLiteral([SplitContainer([Word.from_("Hi")])])],
+    [SplitContainer.from_single_token("SetValue"), "=", NewLine()],
+]
+
+PREP_CONFIGS = [PrepConfig.from_encoded_string(s) for s in ['000000', '011101', '101110']]
+
+SPLIT_TOKEN_LISTS = [
+    [SplitContainer([Word.from_("get"), Word.from_("Name")]), NewLine(),
+     StringLiteral([SplitContainer([Word.from_("Hi")])])],
+    [SplitContainer([Word.from_("Set"), Word.from_("Value")]), "=", NewLine()],
+]
+
+
+class ToReprsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.parsed_file = os.path.join(self.dir, 'project.parsed')
+        with gzip.GzipFile(self.parsed_file, 'wb') as f:
+            pickle.dump({}, f)
+            for token_list in TOKEN_LISTS:
+                pickle.dump(token_list, f)
+        init_splitting_configs('dataset', PREP_CONFIGS, None, None, None, None)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_to_reprs(self):
+        splitting_config = NgramSplitConfig()
+        for token_list in TOKEN_LISTS:
+            self.assertEqual([to_repr(prep_config, token_list, splitting_config) for prep_config in PREP_CONFIGS],
+                             to_reprs(PREP_CONFIGS, token_list, [splitting_config] * len(PREP_CONFIGS)))
+
+    def test_global_splitting_configs(self):
+        splitting_configs = [get_global_n_gramm_splitting_config(prep_config) for prep_config in PREP_CONFIGS]
+
+        self.assertEqual(len(PREP_CONFIGS), len(set(map(id, splitting_configs))))
+        self.assertIs(splitting_configs[-1], get_global_n_gramm_splitting_config())
+
+    def test_preprocess_and_write(self):
+        dest_files = [os.path.join(self.dir, str(prep_config)) for prep_config in PREP_CONFIGS]
+
+        preprocess_and_write((self.parsed_file, list(zip(dest_files, PREP_CONFIGS)), None, ['text']))
+
+        for dest_file, prep_config in zip(dest_files, PREP_CONFIGS):
+            with open(f'{dest_file}.{REPR_EXTENSION}') as f:
+                expected = ''.join(to_token_list(to_repr(prep_config, token_list, NgramSplitConfig()))
+                                   for token_list in TOKEN_LISTS)
+                self.assertEqual(expected, f.read())
+
+    def test_existing_repr_is_not_rewritten(self):
+        dest_files = [os.path.join(self.dir, str(prep_config)) for prep_config in PREP_CONFIGS]
+        with open(f'{dest_files[0]}.{REPR_EXTENSION}', 'w') as f:
+            f.write('existing')
+
+        preprocess_and_write((self.parsed_file, list(zip(dest_files, PREP_CONFIGS)), None, ['text']))
+
+        with open(f'{dest_files[0]}.{REPR_EXTENSION}') as f:
+            self.assertEqual('existing', f.read())
+        self.assertTrue(os.path.exists(f'{dest_files[1]}.{REPR_EXTENSION}'))
+
+
+class ChunkTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        parsed_file = os.path.join(self.dir, 'project.parsed')
+        with gzip.GzipFile(parsed_file, 'wb') as f:
+            pickle.dump({}, f)
+            for token_list in TOKEN_LISTS * 3:
+                pickle.dump(token_list, f)
+        self.parsed_file = parsed_file
+        self.parsed_bin_file = convert(parsed_file)
+        init_splitting_configs('dataset', PREP_CONFIGS, None, None, None, None)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_split_into_chunks(self):
+        self.assertEqual([(0, 0, 4), (1, 4, 6)], split_into_chunks(self.parsed_bin_file, 4))
+        self.assertEqual([None], split_into_chunks(self.parsed_bin_file, 6))
+        self.assertEqual([None], split_into_chunks(self.parsed_file, 4))
+
+    def test_iter_token_lists_range(self):
+        for path in [self.parsed_file, self.parsed_bin_file]:
+            self.assertEqual(list(map(repr, (TOKEN_LISTS * 3)[1:4])),
+                             list(map(repr, iter_token_lists(path, start=1, end=4))))
+
+    def test_chunks_are_concatenated_in_order(self):
+        targets = [(os.path.join(self.dir, f'whole{prep_config}'), prep_config) for prep_config in PREP_CONFIGS]
+        chunked_targets = [(os.path.join(self.dir, f'chunked{prep_config}'), prep_config)
+                           for prep_config in PREP_CONFIGS]
+        preprocess_and_write((self.parsed_bin_file, targets, None, ['text']))
+        chunks = split_into_chunks(self.parsed_bin_file, 4)
+        for chunk in reversed(chunks):
+            self.assertEqual((self.parsed_bin_file, chunk[0]),
+                             preprocess_and_write((self.parsed_bin_file, chunked_targets, chunk, ['text'])))
+        finish_chunked_file(chunked_targets, len(chunks))
+
+        self.assertEqual(sorted([f'{name}{prep_config}.{REPR_EXTENSION}' for prep_config in PREP_CONFIGS
+                                 for name in ['whole', 'chunked']] + ['project.parsed', 'project.parsedbin']),
+                         sorted(os.listdir(self.dir)))
+        for (dest_file, _), (chunked_dest_file, _) in zip(targets, chunked_targets):
+            with open(f'{dest_file}.{REPR_EXTENSION}') as f, open(f'{chunked_dest_file}.{REPR_EXTENSION}') as g:
+                self.assertEqual(f.read(), g.read())
+
+    def test_bin_output(self):
+        targets = [(os.path.join(self.dir, f'whole{prep_config}'), prep_config) for prep_config in PREP_CONFIGS]
+        chunked_targets = [(os.path.join(self.dir, f'chunked{prep_config}'), prep_config)
+                           for prep_config in PREP_CONFIGS]
+        preprocess_and_write((self.parsed_bin_file, targets, None, ['text', 'bin']))
+        chunks = split_into_chunks(self.parsed_bin_file, 4)
+        for chunk in chunks:
+            preprocess_and_write((self.parsed_bin_file, chunked_targets, chunk, ['bin']))
+        finish_chunked_file(chunked_targets, len(chunks), ['bin'])
+
+        for (dest_file, _), (chunked_dest_file, _) in zip(targets, chunked_targets):
+            text_lines = list(iter_repr_lines(f'{dest_file}.{REPR_EXTENSION}'))
+            self.assertEqual(text_lines, list(iter_repr_lines(f'{dest_file}.{reprbin.EXTENSION}')))
+            self.assertEqual(text_lines, list(iter_repr_lines(f'{chunked_dest_file}.{reprbin.EXTENSION}')))
+
+
+class UniqueWordsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        parsed_file = os.path.join(self.dir, 'project.parsed')
+        with gzip.GzipFile(parsed_file, 'wb') as f:
+            pickle.dump({}, f)
+            for token_list in SPLIT_TOKEN_LISTS * 3:
+                pickle.dump(token_list, f)
+        self.parsed_file = parsed_file
+        self.parsed_bin_file = convert(parsed_file)
+        merges_file = os.path.join(self.dir, 'merges.txt')
+        with open(merges_file, 'w') as f:
+            f.write('g e 10\nn a 9\nna m 8\nS e 7\nv a 6\n')
+        self.prep_configs = [PrepConfig.from_encoded_string(s) for s in ['014101', '014100']]
+        init_splitting_configs('dataset', self.prep_configs, None, None, None, merges_file)
+        self.merges_file = merges_file
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_reprs(self, name):
+        targets = [(os.path.join(self.dir, f'{name}{prep_config}'), prep_config) for prep_config in self.prep_configs]
+        preprocess_and_write((self.parsed_bin_file, targets, None, ['text']))
+        reprs = []
+        for dest_file, _ in targets:
+            with open(f'{dest_file}.{REPR_EXTENSION}') as f:
+                reprs.append(f.read())
+        return reprs
+
+    def test_collect_words(self):
+        for path in [self.parsed_file, self.parsed_bin_file]:
+            self.assertEqual({True: {'get', 'name', 'hi', 'set', 'value'},
+                              False: {'get', 'Name', 'Hi', 'Set', 'Value'}},
+                             collect_words((path, None, [True, False])))
+        self.assertEqual({True: {'set', 'value'}}, collect_words((self.parsed_bin_file, (1, 1, 2), [True])))
+
+    def test_same_reprs(self):
+        expected = self.write_reprs('occurrences')
+        splittings_files = [os.path.join(self.dir, f'splittings{prep_config}') for prep_config in self.prep_configs]
+        splitting_config = get_global_n_gramm_splitting_config(self.prep_configs[0])
+        splitting_config.merges_cache = {'getter': ['getter'], 'get': ['ge', 't']}
+        with ThreadPool(2) as pool:
+            encode_unique_words(pool, [(self.parsed_file, None)], self.prep_configs, self.dir, splittings_files)
+
+        self.assertEqual(expected, self.write_reprs('unique'))
+        lowercased_splittings = read_dict_from_2_columns(splittings_files[0], val_type=list)
+        self.assertEqual(['ge', 't'], lowercased_splittings['get'])
+        self.assertEqual(['s', 'e', 't'], lowercased_splittings['set'])
+        self.assertEqual(['Se', 't'], read_dict_from_2_columns(splittings_files[1], val_type=list)['Set'])
+        merges_cache = splitting_config.merges_cache
+        self.assertIsInstance(merges_cache, dict)
+        self.assertEqual(['ge', 't'], merges_cache['get'])
+        self.assertEqual(['s', 'e', 't'], merges_cache['set'])
+        self.assertEqual(['getter'], merges_cache['getter'])
+        self.assertNotIn('Set', merges_cache)
+
+    def test_frozen_merges_cache_is_copied_into_dict(self):
+        splitting_config = get_global_n_gramm_splitting_config(self.prep_configs[0])
+        splitting_config.merges_cache = FrozenStrMap({'getter': ['getter']})
+        with ThreadPool(2) as pool:
+            encode_unique_words(pool, [(self.parsed_file, None)], self.prep_configs, self.dir)
+
+        self.assertEqual({'getter': ['getter'], 'get': ['ge', 't'], 'name': ['nam', 'e'], 'hi': ['h', 'i'],
+                          'set': ['s', 'e', 't'], 'value': ['va', 'l', 'u', 'e']}, splitting_config.merges_cache)
+
+    def test_splittings_passed_to_spawned_workers(self):
+        expected = self.write_reprs('occurrences')
+        with ThreadPool(2) as pool:
+            word_splittings_paths = encode_unique_words(pool, [(self.parsed_file, None)], self.prep_configs, self.dir)
+        initializer = pickle.loads(pickle.dumps(
+            partial(init_worker_splitting_configs, word_splittings_paths=word_splittings_paths)))
+        global_n_gramm_splitting_configs.clear()
+
+        initializer('dataset', self.prep_configs, None, None, None, self.merges_file)
+
+        merges_cache = get_global_n_gramm_splitting_config(self.prep_configs[0]).merges_cache
+        self.assertIsInstance(merges_cache, dict)
+        self.assertEqual(['ge', 't'], merges_cache['get'])
+        self.assertEqual(['Se', 't'], get_global_n_gramm_splitting_config(self.prep_configs[1]).merges_cache['Set'])
+        self.assertEqual(expected, self.write_reprs('unique'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,10 @@
+import os
+import shutil
+import tempfile
 import unittest
 
-from logrec.infrastructure.fractions_manager import included_in_fraction
+from logrec.dataprep.reprbin import ReprBinWriter, get_bin_path
+from logrec.infrastructure.fractions_manager import included_in_fraction, create_df_gen
 
 
 class FractionsManagerTest(unittest.TestCase):
@@ -46,5 +50,27 @@ class FractionsManagerTest(unittest.TestCase):
             included_in_fraction('file', 0.1, 99.9)
 
 
+class CreateDfGenTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_repr_in_both_formats_is_read_and_counted_once(self):
+        for name in ['0_both.parsed.repr', '1_text.parsed.repr']:
+            with open(os.path.join(self.dir, name), 'w') as f:
+                f.write('a b <ect>\n')
+        with ReprBinWriter(get_bin_path(os.path.join(self.dir, '0_both.parsed.repr'))) as writer:
+            writer.write(['a', 'b'])
+
+        with self.assertLogs('logrec.infrastructure.fractions_manager', 'DEBUG') as logs:
+            frames = list(create_df_gen(self.dir, 100.0, 0.0, False))
+
+        self.assertEqual(2, sum(len(frame) for frame in frames))
+        self.assertEqual(2, len(logs.output))
+        self.assertTrue(all('out of 2]' in message for message in logs.output), logs.output)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,90 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from logrec.util.frozen import SortedWordArray, FrozenStrMap, attach
+
+
+class SortedWordArrayTest(unittest.TestCase):
+    def test_contains(self):
+        words = ['über', 'zebra', 'a', 'ab', 'abc', 'b', '', 'ünd', 'ab']
+
+        word_array = SortedWordArray(words)
+
+        self.assertEqual(8, len(word_array))
+        for word in words:
+            self.assertIn(word, word_array)
+        for word in ['abcd', 'aa', 'ü', 'zebras', 'c', 'A']:
+            self.assertNotIn(word, word_array)
+
+    def test_iter_sorted(self):
+        words = ['über', 'zebra', 'a', 'ab', 'b']
+
+        self.assertEqual(sorted(words), list(SortedWordArray(words)))
+
+    def test_empty(self):
+        word_array = SortedWordArray([])
+
+        self.assertEqual(0, len(word_array))
+        self.assertNotIn('a', word_array)
+
+
+class FrozenStrMapTest(unittest.TestCase):
+    def test_get(self):
+        mapping = {'logger': ['log', 'ger'], 'über': ['über'], 'a': ['a'], 'zz': ['z', 'z']}
+
+        frozen_map = FrozenStrMap(mapping)
+
+        self.assertEqual(4, len(frozen_map))
+        self.assertEqual(mapping, dict(frozen_map.items()))
+        self.assertEqual(['log', 'ger'], frozen_map['logger'])
+        self.assertEqual(['z', 'z'], frozen_map.get('zz'))
+        self.assertIsNone(frozen_map.get('log'))
+        self.assertNotIn('b', frozen_map)
+        with self.assertRaises(KeyError):
+            frozen_map['b']
+
+
+class AttachTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_save_attach(self):
+        words = ['über', 'zebra', 'a', 'ab', 'b']
+        mapping = {'logger': ['log', 'ger'], 'über': ['über']}
+        SortedWordArray(words).save(os.path.join(self.tmp_dir, 'words'))
+        FrozenStrMap(mapping).save(os.path.join(self.tmp_dir, 'map'))
+
+        word_array = attach(os.path.join(self.tmp_dir, 'words'))
+        frozen_map = attach(os.path.join(self.tmp_dir, 'map'))
+
+        self.assertIsInstance(word_array, SortedWordArray)
+        self.assertEqual(sorted(words), list(word_array))
+        self.assertIn('über', word_array)
+        self.assertNotIn('c', word_array)
+        self.assertEqual(mapping, dict(frozen_map.items()))
+        self.assertIs(word_array, attach(os.path.join(self.tmp_dir, 'words')))
+
+    def test_pickled_as_path(self):
+        path = os.path.join(self.tmp_dir, 'words')
+        words = [f'word{i}' for i in range(1000)]
+        SortedWordArray(words).save(path)
+
+        pickled = pickle.dumps(attach(path))
+
+        self.assertLess(len(pickled), 200)
+        self.assertIs(attach(path), pickle.loads(pickled))
+
+    def test_pickled_in_memory(self):
+        word_array = SortedWordArray(['a', 'b'])
+
+        self.assertEqual(['a', 'b'], list(pickle.loads(pickle.dumps(word_array))))
+
+
+if __name__ == '__main__':
+    unittest.main()
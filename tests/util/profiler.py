@@ -0,0 +1,68 @@
+import unittest
+
+from logrec.util.profiler import Histogram, PipelineStats, memoized, get_memo_counters
+
+
+class HistogramTest(unittest.TestCase):
+    def test_percentiles(self):
+        histogram = Histogram()
+        for i in range(1, 1001):
+            histogram.add(i / 1000)
+
+        self.assertEqual(1000, histogram.count)
+        self.assertAlmostEqual(0.5, histogram.percentile(50), delta=0.5 * (Histogram.GROWTH - 1))
+        self.assertAlmostEqual(0.99, histogram.percentile(99), delta=0.99 * (Histogram.GROWTH - 1))
+        self.assertEqual(1.0, histogram.percentile(100))
+
+    def test_merge(self):
+        first, second, all = Histogram(), Histogram(), Histogram()
+        for i in range(1, 100):
+            (first if i % 2 else second).add(i)
+            all.add(i)
+
+        first.merge(second)
+
+        self.assertEqual(all.to_dict(), first.to_dict())
+
+
+class PipelineStatsTest(unittest.TestCase):
+    def test_merge(self):
+        first = PipelineStats()
+        first.record('split', 0.5, 10, 20)
+        first.counters['files'] += 1
+        second = PipelineStats()
+        second.record('split', 1.5, 5, 5)
+        second.record('mark', 1.0, 5, 3, allocated=100)
+        second.counters['files'] += 1
+
+        first.merge(second)
+
+        actual = first.to_dict()
+        self.assertEqual(3.0, actual['total_time'])
+        self.assertEqual({'files': 2}, actual['counters'])
+        self.assertEqual(['split', 'mark'], list(actual['stages'].keys()))
+        self.assertEqual(15, actual['stages']['split']['tokens_in'])
+        self.assertEqual(25, actual['stages']['split']['tokens_out'])
+        self.assertEqual(2, actual['stages']['split']['time']['count'])
+        self.assertNotIn('allocated_bytes', actual['stages']['split'])
+        self.assertEqual(100, actual['stages']['mark']['allocated_bytes']['total'])
+
+
+    def test_memo_counters(self):
+        @memoized('test.double', 2)
+        def double(x):
+            return 2 * x
+
+        stats = PipelineStats()
+        double(1)
+        before = get_memo_counters()
+        double(1)
+        double(1)
+        double(2)
+        stats.add_memo_counters(before, get_memo_counters())
+
+        self.assertEqual({'hits': 2, 'misses': 1, 'hit_rate': 2 / 3}, stats.to_dict()['memos']['test.double'])
+
+
+if __name__ == '__main__':
+    unittest.main()